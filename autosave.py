@@ -0,0 +1,179 @@
+import json
+import os
+import queue
+import tempfile
+import threading
+from perf_monitor import timed
+
+AUTOSAVE_DELAY_MS = 1500  # Quiet period after the last edit before saving
+POLL_MS = 100
+
+# mkstemp creates 0600 files; new notes get the usual 0666 minus the umask instead
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write_json(path, content):
+    """
+    Writes JSON so that the target is either the old or the new file, never
+    a truncated one: temp file in the same folder, fsync, then os.replace.
+    The file keeps the permissions of the one it replaces.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(content, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # Persist the rename itself (not supported on Windows)
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class SaveJob:
+    def __init__(self, name, doc, change_count, generation):
+        self.name = name
+        self.doc = doc
+        self.change_count = change_count
+        self.generation = generation
+        self.error = None
+
+
+class AutoSaver:
+    """
+    Debounced background saving for a RichTextEditor.
+    schedule() is called on every edit; once edits go quiet the document is
+    snapshotted on the Tk thread and handed to a writer thread, which does
+    the JSON serialization and writes it through the NoteStore. A newer
+    snapshot replaces a pending one, so bursts of edits coalesce into a
+    single write.
+    """
+    def __init__(self, root, editor, store, get_name, on_saved=None, on_error=None, on_status=None, on_written=None,
+                 before_save=None):
+        self.root = root
+        self.editor = editor
+        self.store = store
+        self.get_name = get_name  # Returns the note name, or None if the note has no name yet
+        self.on_saved = on_saved
+        self.on_error = on_error
+        self.on_status = on_status
+        self.on_written = on_written  # Called on the writer thread with (name, doc, content), e.g. for indexing
+        self.before_save = before_save  # Called with the name before snapshotting; False skips the save (conflicts)
+        self.after_id = None
+        self.poll_id = None
+        self.pending = None
+        self.in_flight = 0
+        self.results = queue.Queue()
+        self.lock = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def schedule(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+        self.after_id = self.root.after(AUTOSAVE_DELAY_MS, self._autosave)
+
+    def cancel(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def _autosave(self):
+        self.after_id = None
+        if self.editor.is_modified():
+            self.save_now()
+
+    @timed("autosave.snapshot")
+    def save_now(self, name=None):
+        """Snapshots the editor and queues the write. Returns False if there is nowhere to save."""
+        self.cancel()
+        name = name or self.get_name()
+        if name is None:
+            return False
+        if self.before_save is not None:
+            if not self.before_save(name):
+                return False
+            self.cancel()  # The hook may have edited the note (merge), which schedules another save
+        job = SaveJob(name, self.editor.get_document().snapshot(),
+                      self.editor.change_count, self.editor.generation)
+        with self.lock:
+            if self.pending is None:
+                self.in_flight += 1
+            self.pending = job
+            self.lock.notify()
+        if self.on_status:
+            self.on_status("Saving...")
+        if self.poll_id is None:
+            self.poll_id = self.root.after(POLL_MS, self._poll)
+        return True
+
+    def flush(self):
+        """Blocks until every queued write is on disk (before rename/delete/exit)."""
+        if self.after_id is not None and self.editor.is_modified():
+            self.save_now()
+        self.cancel()
+        with self.lock:
+            while self.in_flight:
+                self.lock.wait()
+        self._poll()
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while self.pending is None:
+                    self.lock.wait()
+                job = self.pending
+                self.pending = None
+            try:
+                self.write(job)
+            except Exception as e:
+                job.error = e
+            self.results.put(job)
+            with self.lock:
+                self.in_flight -= 1
+                self.lock.notify_all()
+
+    @timed("autosave.write")
+    def write(self, job):
+        # Autosave thread: doesn't block the UI, but shows how long saves take to land
+        content = job.doc.to_json()
+        self.store.save(job.name, content)
+        if self.on_written:
+            self.on_written(job.name, job.doc, content)
+
+    def _poll(self):
+        self.poll_id = None
+        while True:
+            try:
+                job = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if job.error is not None:
+                if self.on_error:
+                    self.on_error(job.error)
+                continue
+            # Only edits up to the snapshot are saved, and only if the same note is still open
+            if job.generation == self.editor.generation:
+                self.editor.mark_saved(job.change_count)
+            if self.on_saved:
+                self.on_saved(job.name)
+        if self.in_flight and self.poll_id is None:
+            self.poll_id = self.root.after(POLL_MS, self._poll)
@@ -0,0 +1,376 @@
+"""
+Benchmark suite for serialization, stores, the catalog, the editor and tables.
+
+Corpora are generated (nothing is read from my_notes):
+  text10k   one note with 10,000 lines of text
+  cards500  one note with 500 cards between paragraphs
+  table     one note with a 100x50 table
+  folder    a notes folder with 50,000 small notes
+
+Benchmarks that need Tk run on $DISPLAY, or under an Xvfb started for the
+run when there is no display and Xvfb is installed; otherwise they are
+reported as skipped and the headless ones still run.
+
+    python benchmarks/run_benchmarks.py --json results.json
+    python benchmarks/run_benchmarks.py --save-baseline            # benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --quick                    # small corpora, for a smoke run
+
+Exits with status 1 if any median is more than --tolerance slower than the
+baseline (and at least --min-delta-ms slower, to ignore timer noise).
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from note_document import NoteDocument
+from note_store import FolderNoteStore
+from note_catalog import NoteCatalog
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+SIZES = {
+    "full": {"lines": 10000, "cards": 500, "table": (100, 50), "notes": 50000},
+    "quick": {"lines": 1000, "cards": 50, "table": (20, 10), "notes": 2000},
+}
+
+
+# ---------------- Corpora ----------------
+
+def text_note(lines):
+    body = "".join(f"Line {i}: the quick brown fox jumps over the lazy dog\n" for i in range(lines))
+    return [{"type": "text", "content": body}]
+
+
+def cards_note(count):
+    content = []
+    for i in range(count):
+        content.append({"type": "text", "content": f"Paragraph {i}\n"})
+        content.append({"type": "card", "title": f"Card {i}", "content": f"Body of card {i}\nsecond line",
+                        "bg": "#333333", "width": 200, "height": 120})
+    return content
+
+
+def table_note(rows, cols):
+    data = [[f"r{r}c{c}" for c in range(cols)] for r in range(rows)]
+    return [{"type": "text", "content": "Table:\n"},
+            {"type": "table", "rows": rows, "cols": cols, "cell_width": 8, "align": "center",
+             "width": 600, "height": 400, "bg": "gray", "data": data},
+            {"type": "text", "content": "\n"}]
+
+
+def make_folder(folder, count):
+    os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(folder, f"note_{i:06d}.json"), "w") as f:
+            json.dump([{"type": "text", "content": f"Note {i}\nshort body {i}\n"}], f)
+
+
+def make_corpora(workdir, size):
+    corpora = {
+        "text10k": text_note(size["lines"]),
+        "cards500": cards_note(size["cards"]),
+        "table": table_note(*size["table"]),
+    }
+    notes = os.path.join(workdir, "notes")
+    store = FolderNoteStore(notes)
+    for name, content in corpora.items():
+        store.save(name, content)
+    folder = os.path.join(workdir, "folder")
+    if not os.path.isdir(folder):
+        make_folder(folder, size["notes"])
+    # The big notes also live in the folder, for switching between them in the app
+    folder_store = FolderNoteStore(folder)
+    for name, content in corpora.items():
+        folder_store.save(name, content)
+    return corpora, notes, folder
+
+
+# ---------------- Timing ----------------
+
+def measure(func, repeat, setup=None):
+    """Runs setup() (untimed) then func() repeat times. Returns run times in ms."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - t) * 1000)
+    return times
+
+
+def summarize(times):
+    return {"median_ms": statistics.median(times), "min_ms": min(times), "runs": [round(t, 3) for t in times]}
+
+
+# ---------------- Benchmarks ----------------
+
+def headless_benchmarks(corpora, notes, folder, repeat):
+    results = {}
+    store = FolderNoteStore(notes)
+    for name, content in corpora.items():
+        raw = json.dumps(content)
+        results[f"parse.{name}"] = measure(lambda: NoteDocument.from_json(json.loads(raw)), repeat)
+        doc = NoteDocument.from_json(content)
+        results[f"serialize.{name}"] = measure(lambda: json.dumps(doc.to_json(), indent=2), repeat)
+        results[f"store.load.{name}"] = measure(lambda: store.load(name), repeat)
+
+    # One changed cell on a large table: a journal append, not a rewrite
+    table = json.loads(json.dumps(corpora["table"]))
+    store.load("table")
+    counter = iter(range(10 ** 9))
+
+    def save_one_cell():
+        table[1]["data"][0][0] = str(next(counter))
+        store.save("table", table)
+    results["store.save_one_cell.table"] = measure(save_one_cell, repeat)
+
+    folder_store = FolderNoteStore(folder)
+    cache_path = os.path.join(folder, ".catalog.json")
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    catalog = NoteCatalog(folder_store, cache_path)
+    results["catalog.refresh.cold"] = measure(catalog.refresh, 1)
+    results["catalog.refresh.warm"] = measure(catalog.refresh, repeat)
+    results["catalog.load_cache"] = measure(lambda: NoteCatalog(folder_store, cache_path), repeat)
+    return results
+
+
+def tk_benchmarks(corpora, notes, folder, repeat):
+    import tkinter as tk
+    from rich_text_editor import RichTextEditor
+    from note_document import CardSegment, TableSegment
+    from widgets import TableWidget, VirtualTableWidget, WidgetPool, widget_for_segment
+
+    results = {}
+    root = tk.Tk()
+    root.geometry("1000x700")
+    editor = RichTextEditor(root, wrap="word")
+    editor.pack(fill="both", expand=True)
+    root.update()
+
+    for name, content in corpora.items():
+        def load(content=content):
+            editor.load_content_json(content)
+            root.update_idletasks()
+        results[f"editor.load.{name}"] = measure(load, repeat, setup=editor.clear)
+        root.update()  # Let visible placeholders materialize, like a real open
+        results[f"editor.get_content_json.{name}"] = measure(editor.get_content_json, repeat)
+    editor.clear()
+
+    rows, cols = corpora["table"][1]["rows"], corpora["table"][1]["cols"]
+    for cls in (TableWidget, VirtualTableWidget):
+        tables = []
+
+        def build(cls=cls):
+            tables.append(cls(root, rows=rows, cols=cols, cell_width=8, width=600, height=400))
+            root.update_idletasks()
+
+        def destroy():
+            while tables:
+                tables.pop().destroy()
+        results[f"table.build.{cls.__name__}"] = measure(build, repeat, setup=destroy)
+        table = tables[-1]
+
+        def reshape(table=table):
+            table.cols = cols - 10 if table.cols == cols else cols
+            table.build_table()
+            root.update_idletasks()
+        results[f"table.rebuild.{cls.__name__}"] = measure(reshape, repeat)
+        destroy()
+
+    # Building embeds from scratch vs. rebinding ones parked in a WidgetPool (what clear() does between notes)
+    segments = [CardSegment(title=f"Card {i}", content="Some card text\n" * 5) for i in range(50)]
+    segments += [TableSegment(rows=6, cols=4, data=[[f"{r}.{c}" for c in range(4)] for r in range(6)]) for _ in range(50)]
+    pool = WidgetPool(editor, limit=len(segments))
+    shown = []
+
+    def fresh():
+        shown.extend(widget_for_segment(editor, seg) for seg in segments)
+        root.update_idletasks()
+
+    def destroy_shown():
+        while shown:
+            shown.pop().destroy()
+
+    def pooled():
+        shown.extend(pool.acquire(seg) for seg in segments)
+        root.update_idletasks()
+
+    def release_shown():
+        while shown:
+            pool.release(shown.pop())
+    results["embed.create.fresh"] = measure(fresh, repeat, setup=destroy_shown)
+    destroy_shown()
+    pooled()
+    results["embed.create.pooled"] = measure(pooled, repeat, setup=release_shown)
+
+    root.destroy()
+    results.update(app_benchmarks(folder, repeat))
+    return results
+
+
+def app_benchmarks(folder, repeat):
+    """refresh_notes over the big folder and switching between large notes, through StickyNotesApp itself."""
+    import tkinter as tk
+    results = {}
+    os.environ["STICKY_NOTES_STORE"] = folder
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(folder))  # theme.json is looked up in the working directory
+    try:
+        import multi_sticky
+        root = tk.Tk()
+        app = multi_sticky.StickyNotesApp(root)
+        root.update()
+        app.catalog.load_cache()
+        app.refresh_notes()
+        results["app.refresh_notes.warm"] = measure(app.refresh_notes, repeat)
+
+        names = ["text10k", "cards500"]
+        state = {"i": 0}
+
+        def switch():
+            name = names[state["i"] % 2]
+            state["i"] += 1
+            app.open_note_named(name)
+            while app.loader is not None:
+                root.update()
+            root.update_idletasks()
+        results["app.open_note.cold"] = measure(switch, repeat, setup=app.note_cache.clear)
+        switch()
+        switch()
+        results["app.open_note.cached"] = measure(switch, repeat)
+        if app.watcher is not None:
+            app.watcher.stop()
+        root.destroy()
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+# ---------------- Display ----------------
+
+def ensure_display():
+    """Returns how Tk will be shown: 'native', 'xvfb', or None if there is no display."""
+    if sys.platform in ("win32", "darwin") or os.environ.get("DISPLAY"):
+        return "native"
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        return None
+    for n in range(99, 140):
+        if os.path.exists(f"/tmp/.X11-unix/X{n}") or os.path.exists(f"/tmp/.X{n}-lock"):
+            continue
+        proc = subprocess.Popen([xvfb, f":{n}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        atexit.register(proc.terminate)
+        for _ in range(50):
+            if os.path.exists(f"/tmp/.X11-unix/X{n}"):
+                os.environ["DISPLAY"] = f":{n}"
+                return "xvfb"
+            if proc.poll() is not None:
+                break
+            time.sleep(0.1)
+        proc.terminate()
+    return None
+
+
+# ---------------- Baseline ----------------
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Prints a table and returns the names that regressed."""
+    regressions = []
+    for name in sorted(results):
+        median = results[name]["median_ms"]
+        line = f"{name:40} {median:10.2f} ms"
+        base = baseline.get(name)
+        if base is not None:
+            ratio = median / base["median_ms"] if base["median_ms"] else 1.0
+            line += f"   baseline {base['median_ms']:10.2f} ms  ({ratio:5.2f}x)"
+            if median > base["median_ms"] * (1 + tolerance) and median - base["median_ms"] > min_delta_ms:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Small corpora (not comparable with full runs)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--corpus-dir", help="Keep generated corpora here and reuse them between runs")
+    parser.add_argument("--headless", action="store_true", help="Skip everything that needs Tk")
+    parser.add_argument("--json", help="Write results here")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Write these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    scale = "quick" if args.quick else "full"
+    display = None if args.headless else ensure_display()
+    workdir = args.corpus_dir or tempfile.mkdtemp(prefix="sticky-bench-")
+    if not args.corpus_dir:
+        atexit.register(shutil.rmtree, workdir, True)
+    workdir = os.path.join(workdir, scale)
+
+    corpora, notes, folder = make_corpora(workdir, SIZES[scale])
+    raw = headless_benchmarks(corpora, notes, folder, args.repeat)
+    skipped = []
+    if display is not None:
+        raw.update(tk_benchmarks(corpora, notes, folder, args.repeat))
+    else:
+        skipped.append("tk (no display and no Xvfb)" if not args.headless else "tk (--headless)")
+
+    import tkinter
+    report = {
+        "meta": {
+            "scale": scale,
+            "display": display,
+            "python": platform.python_version(),
+            "tk": tkinter.TkVersion,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {name: summarize(times) for name, times in raw.items()},
+        "skipped": skipped,
+    }
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            base_report = json.load(f)
+        if base_report.get("meta", {}).get("scale") != scale:
+            print(f"Baseline was recorded at scale '{base_report.get('meta', {}).get('scale')}', not '{scale}'")
+            return 2
+        baseline = base_report["results"]
+    regressions = compare(report["results"], baseline, args.tolerance, args.min_delta_ms)
+    for item in skipped:
+        print(f"skipped: {item}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
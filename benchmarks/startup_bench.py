@@ -0,0 +1,149 @@
+"""
+Cold-start benchmark for multi_sticky.py.
+
+Every run is a fresh interpreter (so imports are really cold) started in a
+scratch folder with a generated notes store. The child reports:
+  import_ms       importing multi_sticky
+  first_paint_ms  process start until the main window is first exposed
+  ready_ms        process start until the deferred startup (catalog, index) is done
+
+    python benchmarks/startup_bench.py                     # report medians, check budgets
+    python benchmarks/startup_bench.py --save-baseline     # record benchmarks/startup_baseline.json
+    python benchmarks/startup_bench.py --baseline benchmarks/startup_baseline.json
+
+Exits with status 1 if a median exceeds its budget or regresses more than
+--tolerance against the baseline. Without a display only import_ms is measured.
+"""
+import time
+
+START = time.perf_counter()
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+
+# Targets for the fast-start path (milliseconds, median of the runs)
+BUDGETS_MS = {
+    "import_ms": 150,
+    "first_paint_ms": 500,
+    "ready_ms": 1500,
+}
+PAINT_TIMEOUT_MS = 10000
+
+
+def make_notes(folder, count):
+    os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        content = [
+            {"type": "text", "content": f"Note {i}\nSome text for note number {i}.\n"},
+            {"type": "card", "title": f"Card {i}", "content": "Card body", "bg": "#333333", "width": 200, "height": 120},
+        ]
+        with open(os.path.join(folder, f"note_{i:05d}.json"), "w") as f:
+            json.dump(content, f)
+
+
+def child():
+    """Runs inside the measured interpreter; prints one JSON line."""
+    sys.path.insert(0, ROOT)
+    t = time.perf_counter()
+    import multi_sticky
+    result = {"import_ms": (time.perf_counter() - t) * 1000}
+
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        print(json.dumps(result))  # No display
+        return
+
+    app = multi_sticky.StickyNotesApp(root)
+
+    def on_expose(event):
+        if "first_paint_ms" not in result:
+            result["first_paint_ms"] = (time.perf_counter() - START) * 1000
+            wait_ready()
+
+    def wait_ready():
+        if app.catalog.loaded and app.index is not None:
+            result["ready_ms"] = (time.perf_counter() - START) * 1000
+            root.destroy()
+        else:
+            root.after(1, wait_ready)
+
+    app.editor.bind("<Expose>", on_expose, add="+")
+    root.after(PAINT_TIMEOUT_MS, root.destroy)
+    root.mainloop()
+    print(json.dumps(result))
+
+
+def run_once(workdir):
+    env = dict(os.environ, STICKY_NOTES_STORE=os.path.join(workdir, "my_notes"))
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], cwd=workdir, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--notes", type=int, default=500, help="Notes in the generated store")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Write the medians as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs. the baseline (0.25 = 25%%)")
+    parser.add_argument("--json", help="Also write the results here")
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return 0
+
+    with tempfile.TemporaryDirectory() as workdir:
+        make_notes(os.path.join(workdir, "my_notes"), args.notes)
+        runs = [run_once(workdir) for _ in range(args.runs)]
+
+    medians = {}
+    for key in BUDGETS_MS:
+        values = [r[key] for r in runs if key in r]
+        if values:
+            medians[key] = statistics.median(values)
+
+    failed = False
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    for key, value in medians.items():
+        line = f"{key:16} {value:8.1f} ms  (budget {BUDGETS_MS[key]} ms"
+        if key in baseline:
+            line += f", baseline {baseline[key]:.1f} ms"
+        line += ")"
+        if value > BUDGETS_MS[key]:
+            line += "  OVER BUDGET"
+            failed = True
+        if key in baseline and value > baseline[key] * (1 + args.tolerance):
+            line += "  REGRESSION"
+            failed = True
+        print(line)
+    if "first_paint_ms" not in medians:
+        print("No display: only import time was measured")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"medians": medians, "runs": runs}, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(medians, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,483 @@
+import math
+import re
+
+# Cells starting with this are formulas: =SUM(A1:A20), =B2*1.2, =(A1+A2)/2
+FORMULA_PREFIX = "="
+COMPILE_CACHE_LIMIT = 4096
+
+ERROR_REF = "#REF!"
+ERROR_VALUE = "#VALUE!"
+ERROR_DIV0 = "#DIV/0!"
+ERROR_NAME = "#NAME?"
+ERROR_SYNTAX = "#ERROR!"
+ERROR_CYCLE = "#CYCLE!"
+
+
+class ErrorValue(str):
+    """A formula result that is an error; shown as its code."""
+
+
+class FormulaError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def is_formula(text):
+    return isinstance(text, str) and text.startswith(FORMULA_PREFIX) and len(text) > 1
+
+
+def column_name(c):
+    name = ""
+    c += 1
+    while c:
+        c, rem = divmod(c - 1, 26)
+        name = chr(ord("A") + rem) + name
+    return name
+
+
+def cell_name(r, c):
+    return f"{column_name(c)}{r + 1}"
+
+
+_CELL = re.compile(r"([A-Za-z]+)([0-9]+)$")
+
+
+def parse_cell_name(name):
+    """'B3' -> (2, 1), or None."""
+    m = _CELL.match(name)
+    if m is None or int(m.group(2)) == 0:
+        return None
+    c = 0
+    for ch in m.group(1).upper():
+        c = c * 26 + ord(ch) - ord("A") + 1
+    return int(m.group(2)) - 1, c - 1
+
+
+def to_number(text):
+    """Number in a plain cell, None for a blank one; raises #VALUE! for other text."""
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        value = float(text)
+    except ValueError:
+        raise FormulaError(ERROR_VALUE)
+    return int(value) if value.is_integer() and abs(value) < 1e15 else value
+
+
+def format_value(value):
+    """Display text of a result; never raises (saving a note goes through here)."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return ERROR_VALUE
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return f"{value:.10g}"
+    try:
+        return str(value)
+    except ValueError:
+        return ERROR_VALUE  # An integer too long for str()
+
+
+def _plain(value):
+    # Results stay machine-sized: big integers become floats, inf/nan are #VALUE!
+    if isinstance(value, int) and abs(value) >= 1e15:
+        value = float(value)  # OverflowError past float range
+    if isinstance(value, float) and not math.isfinite(value):
+        raise FormulaError(ERROR_VALUE)
+    return value
+
+
+# ---------------- Parsing ----------------
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<number>\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)
+  | (?P<func>[A-Za-z]+)(?=\s*\()
+  | (?P<range>[A-Za-z]+[0-9]+:[A-Za-z]+[0-9]+)
+  | (?P<ref>[A-Za-z]+[0-9]+)
+  | (?P<op>[-+*/^(),])
+)""", re.VERBOSE)
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if m is None:
+            raise FormulaError(ERROR_SYNTAX)
+        pos = m.end()
+        tokens.append((m.lastgroup, m.group(m.lastgroup)))
+    return tokens
+
+
+def _values(args):
+    # Range and list arguments are flattened; blanks count as nothing
+    for arg in args:
+        if isinstance(arg, list):
+            yield from (v for v in arg if v is not None)
+        elif arg is not None:
+            yield arg
+
+
+def _average(args):
+    values = list(_values(args))
+    if not values:
+        raise FormulaError(ERROR_DIV0)
+    return sum(values) / len(values)
+
+
+def _round(args):
+    values = list(_values(args))
+    if not 1 <= len(values) <= 2:
+        raise FormulaError(ERROR_VALUE)
+    return round(values[0], int(values[1]) if len(values) == 2 else 0)
+
+
+def _single(func):
+    def call(args):
+        values = list(_values(args))
+        if len(values) != 1:
+            raise FormulaError(ERROR_VALUE)
+        return func(values[0])
+    return call
+
+
+FUNCTIONS = {
+    "SUM": lambda args: sum(_values(args)),
+    "AVERAGE": _average,
+    "AVG": _average,
+    "MIN": lambda args: min(_values(args), default=0),
+    "MAX": lambda args: max(_values(args), default=0),
+    "COUNT": lambda args: sum(1 for _ in _values(args)),
+    "ABS": _single(abs),
+    "ROUND": _round,
+}
+
+
+class Formula:
+    """
+    A compiled formula: evaluate(get) runs it, reading cells through
+    get(r, c, skip_text) -> number/None; refs are the (r, c) cells it reads.
+    Formulas only hold absolute cell addresses, so one compiled formula
+    is shared by every cell and table with the same text.
+    """
+    __slots__ = ("text", "evaluate", "refs")
+
+    def __init__(self, text, evaluate, refs):
+        self.text = text
+        self.evaluate = evaluate
+        self.refs = refs
+
+
+class _Parser:
+    # expr := term (('+'|'-') term)*     term := power (('*'|'/') power)*
+    # power := unary ('^' power)?        unary := ('-'|'+') unary | primary
+    # primary := number | ref | func '(' args ')' | '(' expr ')'
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+        self.refs = set()
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        kind, text = self.peek()
+        if kind is None or (value is not None and text != value):
+            raise FormulaError(ERROR_SYNTAX)
+        self.pos += 1
+        return kind, text
+
+    def parse(self):
+        node = self.expr()
+        if self.pos != len(self.tokens):
+            raise FormulaError(ERROR_SYNTAX)
+        return node
+
+    def expr(self):
+        node = self.term()
+        while self.peek()[1] in ("+", "-"):
+            op = self.take()[1]
+            node = _binary(op, node, self.term())
+        return node
+
+    def term(self):
+        node = self.power()
+        while self.peek()[1] in ("*", "/"):
+            op = self.take()[1]
+            node = _binary(op, node, self.power())
+        return node
+
+    def power(self):
+        node = self.unary()
+        if self.peek()[1] == "^":
+            self.take()
+            node = _binary("^", node, self.power())
+        return node
+
+    def unary(self):
+        if self.peek()[1] == "-":
+            self.take()
+            operand = self.unary()
+            return lambda get: -_num(operand(get))
+        if self.peek()[1] == "+":
+            self.take()
+            return self.unary()
+        return self.primary()
+
+    def primary(self):
+        kind, text = self.take()
+        if kind == "number":
+            value = float(text)
+            value = int(value) if value.is_integer() and abs(value) < 1e15 else value
+            return lambda get: value
+        if kind == "ref":
+            cell = self.cell(text)
+            return lambda get: get(*cell)
+        if kind == "func":
+            return self.call(text.upper())
+        if text == "(":
+            node = self.expr()
+            self.take(")")
+            return node
+        if kind == "range":
+            raise FormulaError(ERROR_VALUE)  # Ranges only make sense as function arguments
+        raise FormulaError(ERROR_SYNTAX)
+
+    def call(self, name):
+        func = FUNCTIONS.get(name)
+        if func is None:
+            raise FormulaError(ERROR_NAME)
+        self.take("(")
+        args = []
+        if self.peek()[1] != ")":
+            args.append(self.argument())
+            while self.peek()[1] == ",":
+                self.take()
+                args.append(self.argument())
+        self.take(")")
+        return lambda get: func([arg(get) for arg in args])
+
+    def argument(self):
+        kind, text = self.peek()
+        if kind != "range":
+            return self.expr()
+        self.take()
+        start, end = (self.cell(part) for part in text.split(":"))
+        r0, r1 = sorted((start[0], end[0]))
+        c0, c1 = sorted((start[1], end[1]))
+        cells = [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+        self.refs.update(cells)
+        # Text inside a range is skipped, as in SUM over a column with a heading
+        return lambda get: [get(r, c, True) for r, c in cells]
+
+    def cell(self, text):
+        cell = parse_cell_name(text)
+        if cell is None:
+            raise FormulaError(ERROR_REF)
+        self.refs.add(cell)
+        return cell
+
+
+def _num(value):
+    # A blank cell in arithmetic counts as 0
+    if value is None:
+        return 0
+    if isinstance(value, list):
+        raise FormulaError(ERROR_VALUE)
+    return value
+
+
+def _binary(op, left, right):
+    if op == "+":
+        return lambda get: _num(left(get)) + _num(right(get))
+    if op == "-":
+        return lambda get: _num(left(get)) - _num(right(get))
+    if op == "*":
+        return lambda get: _num(left(get)) * _num(right(get))
+    if op == "/":
+        def divide(get):
+            dividend, divisor = _num(left(get)), _num(right(get))
+            if divisor == 0:
+                raise FormulaError(ERROR_DIV0)
+            return dividend / divisor
+        return divide
+
+    def power(get):
+        # Float powers: exact integer powers like 9^9^8 would run for minutes
+        try:
+            result = float(_num(left(get))) ** float(_num(right(get)))
+        except (OverflowError, ZeroDivisionError):
+            raise FormulaError(ERROR_VALUE)
+        if isinstance(result, complex):
+            raise FormulaError(ERROR_VALUE)
+        return result
+    return power
+
+
+_compiled = {}
+
+
+def compile_formula(text):
+    """Parses "=..." once; the same text anywhere reuses the compiled Formula (or its syntax error)."""
+    formula = _compiled.get(text)
+    if formula is None:
+        try:
+            parser = _Parser(_tokenize(text[len(FORMULA_PREFIX):]))
+            formula = Formula(text, parser.parse(), frozenset(parser.refs))
+        except FormulaError as e:
+            code = e.code
+            def fail(get):
+                raise FormulaError(code)
+            formula = Formula(text, fail, frozenset())
+        if len(_compiled) >= COMPILE_CACHE_LIMIT:
+            _compiled.clear()
+        _compiled[text] = formula
+    return formula
+
+
+# ---------------- Recalculation ----------------
+
+class FormulaEngine:
+    """
+    Formula results for one TableSegment.
+    Keeps a dependency graph (formula cell -> cells it reads, and the
+    reverse), so an edit recomputes only the formulas that transitively
+    read the edited cell, in dependency order. Formulas that end up
+    waiting on themselves are part of a cycle and show #CYCLE!.
+    Cells are flat row-major indices, like TableSegment.values.
+    """
+    def __init__(self, segment):
+        self.segment = segment
+        self.formulas = {}  # index -> Formula
+        self.results = {}  # index -> number or ErrorValue
+        self.precedents = {}  # formula index -> indices it reads
+        self.dependents = {}  # index -> formula indices reading it
+        self.rebuild()
+
+    def rebuild(self):
+        """Re-reads every cell (after a resize or a wholesale change of values)."""
+        self.formulas.clear()
+        self.results.clear()
+        self.precedents.clear()
+        self.dependents.clear()
+        for i, text in enumerate(self.segment.values):
+            if is_formula(text):
+                self._bind(i, text)
+        self._recalc(set(self.formulas))
+
+    def snapshot(self, segment):
+        engine = FormulaEngine.__new__(FormulaEngine)
+        engine.segment = segment
+        engine.formulas = dict(self.formulas)
+        engine.results = dict(self.results)
+        engine.precedents = dict(self.precedents)
+        engine.dependents = {i: set(deps) for i, deps in self.dependents.items()}
+        return engine
+
+    def _bind(self, i, text):
+        formula = compile_formula(text)
+        rows, cols = self.segment.rows, self.segment.cols
+        # References outside the table have no index; evaluating them gives #REF!
+        reads = {r * cols + c for r, c in formula.refs if r < rows and c < cols}
+        self.formulas[i] = formula
+        self.precedents[i] = reads
+        for p in reads:
+            self.dependents.setdefault(p, set()).add(i)
+
+    def _unbind(self, i):
+        self.formulas.pop(i, None)
+        self.results.pop(i, None)
+        for p in self.precedents.pop(i, ()):
+            deps = self.dependents.get(p)
+            if deps is not None:
+                deps.discard(i)
+                if not deps:
+                    del self.dependents[p]
+
+    def update(self, i):
+        """Re-reads cell i after an edit. Returns the indices whose displayed value changed."""
+        text = self.segment.values[i]
+        old = self.formulas.get(i)
+        if old is None or old.text != text:
+            self._unbind(i)
+            if is_formula(text):
+                self._bind(i, text)
+        affected = set()
+        stack = [i]
+        while stack:
+            j = stack.pop()
+            if j in affected:
+                continue
+            affected.add(j)
+            stack.extend(self.dependents.get(j, ()))
+        affected = {j for j in affected if j in self.formulas}
+        changed = self._recalc(affected)
+        changed.add(i)
+        return changed
+
+    def _recalc(self, affected):
+        # Kahn's algorithm over the affected formulas only
+        waiting = {}
+        ready = []
+        for i in affected:
+            n = sum(1 for p in self.precedents[i] if p in affected)
+            if n:
+                waiting[i] = n
+            else:
+                ready.append(i)
+        changed = set()
+        get = self._get
+        while ready:
+            i = ready.pop()
+            try:
+                value = self.formulas[i].evaluate(get)
+                if isinstance(value, list):
+                    raise FormulaError(ERROR_VALUE)
+                value = 0 if value is None else _plain(value)
+            except FormulaError as e:
+                value = ErrorValue(e.code)
+            except (ArithmeticError, TypeError, ValueError):
+                value = ErrorValue(ERROR_VALUE)
+            old = self.results.get(i)
+            if old != value or type(old) is not type(value):
+                changed.add(i)
+            self.results[i] = value
+            for d in self.dependents.get(i, ()):
+                if d in waiting:
+                    waiting[d] -= 1
+                    if not waiting[d]:
+                        del waiting[d]
+                        ready.append(d)
+        for i in waiting:  # In (or downstream of) a cycle
+            if self.results.get(i) != ERROR_CYCLE:
+                changed.add(i)
+            self.results[i] = ErrorValue(ERROR_CYCLE)
+        return changed
+
+    def _get(self, r, c, skip_text=False):
+        segment = self.segment
+        if r >= segment.rows or c >= segment.cols:
+            raise FormulaError(ERROR_REF)
+        i = r * segment.cols + c
+        if i in self.formulas:
+            value = self.results.get(i)
+            if isinstance(value, ErrorValue):
+                raise FormulaError(str(value))
+            return value
+        try:
+            return to_number(segment.values[i])
+        except FormulaError:
+            if skip_text:
+                return None
+            raise
+
+    def display(self, i):
+        if i in self.formulas:
+            return format_value(self.results.get(i, ""))
+        return self.segment.values[i]
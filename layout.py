@@ -0,0 +1,64 @@
+import time
+import tkinter as tk
+from perf_monitor import timed
+
+FRAME_MS = 16  # ~60 Hz
+
+
+class LayoutScheduler:
+    """
+    Coalesces geometry work (embed resizes, table rebuilds, canvas redraws)
+    into at most one pass per display frame. request(key, func) replaces a
+    pending func with the same key, so a resize drag that delivers dozens of
+    motion events per frame costs one relayout of the hosting Text.
+    """
+    def __init__(self, widget):
+        self.widget = widget
+        self.pending = {}
+        self.after_id = None
+        self.last_flush = 0.0
+        self.passes = 0  # Frames that actually did work
+
+    def request(self, key, func):
+        self.pending[key] = func
+        if self.after_id is None:
+            wait = FRAME_MS - (time.monotonic() - self.last_flush) * 1000
+            self.after_id = self.widget.after(max(1, int(wait)), self.flush)
+
+    def discard(self, key):
+        self.pending.pop(key, None)
+
+    def flush(self):
+        """Runs everything pending now (also called before saving, so the document sees final sizes)."""
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+        if not self.pending:
+            return
+        self.last_flush = time.monotonic()
+        self.passes += 1
+        pending, self.pending = self.pending, {}
+        self.run(pending)
+
+    @timed("layout.frame")
+    def run(self, pending):
+        """
+        Runs one frame's work. A TclError from a widget that has been destroyed
+        since it asked (the note was closed, the embed deleted) is expected and
+        skipped; any other is a real failure and is printed with its key.
+        """
+        for key, func in pending.items():
+            try:
+                func()
+            except tk.TclError as e:
+                if not self.exists(key):
+                    continue  # The widget went away before its frame came
+                print(f"Layout update {key!r} failed: {e}")
+
+    def exists(self, key):
+        """Whether the widget a (widget path, name) key belongs to is still there."""
+        try:
+            return bool(self.widget.winfo_exists()) and self.widget.tk.getboolean(
+                self.widget.tk.call("winfo", "exists", key[0]))
+        except (tk.TclError, TypeError, IndexError):
+            return False
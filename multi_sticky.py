@@ -1,9 +1,6 @@
-import tkinter as tk
-from tkinter import messagebox, simpledialog, Toplevel, Label, Button
 import os
-import json
-from theme_manager import ThemeManager
-from rich_text_editor import RichTextEditor
+import sys
+import single_instance
 
 # ================= UI SETTINGS =================
 APP_WIDTH = 900
@@ -11,17 +8,101 @@ APP_HEIGHT = 600
 MIN_WIDTH = 800
 MIN_HEIGHT = 500
 NOTES_FOLDER = "my_notes"
+# Folder of JSON notes by default; point at a .db file to use the SQLite store
+NOTES_STORE = os.environ.get("STICKY_NOTES_STORE", NOTES_FOLDER)
+SEARCH_DELAY_MS = 150  # Debounce for search-as-you-type
+NOTE_CACHE_MB = int(os.environ.get("STICKY_NOTE_CACHE_MB", "64"))  # Memory budget for recently opened notes
 
-if not os.path.exists(NOTES_FOLDER):
-    os.makedirs(NOTES_FOLDER)
+# A second launch hands its request to the running instance and exits before Tk is even imported
+if __name__ == "__main__" and "--new-instance" not in sys.argv and single_instance.forward(NOTES_STORE, sys.argv[1:]):
+    sys.exit(0)
+
+import tkinter as tk
+from tkinter import Toplevel, Label, Button
+import bisect
+import threading
+import time
+from theme_manager import ThemeManager, style
+from rich_text_editor import RichTextEditor
+from note_loader import NoteLoader
+from autosave import AutoSaver
+from note_store import open_store, TEXT_EXT
+from search_index import SearchIndex, index_path_for
+from note_catalog import NoteCatalog, catalog_path_for, SORT_NAME, SORT_MODIFIED
+from note_cache import NoteCache
+from note_watcher import NoteWatcher
+from note_document import NoteDocument, merge_documents
+from text_viewer import TextViewer
+import perf_monitor
+from perf_monitor import timed
 
 class StickyNotesApp:
-    def __init__(self, root):
+    def __init__(self, root, main=None):
         self.root = root
         self.root.title("Advanced Sticky Notes")
         self.root.geometry(f"{APP_WIDTH}x{APP_HEIGHT}")
         self.root.minsize(MIN_WIDTH, MIN_HEIGHT)
+
+        # Extra windows (see new_window) share the first window's store, index and caches
+        self.main = main
+        self.server = None  # InstanceServer answering later launches (first window only)
+        self.watcher = None  # NoteWatcher for changes made outside this window's saves (first window only)
+        self.perf = perf_monitor.install(root) if main is None else None  # Opt-in, see perf_monitor
+        if main is None:
+            self.windows = [self]
+            self.tm = ThemeManager()
+            self.store = open_store(NOTES_STORE)
+            self.index = None  # SearchIndex, opened after the first paint
+            # Filled from its cache after the first paint, then re-scanned
+            self.catalog = NoteCatalog(self.store, catalog_path_for(NOTES_STORE), preload=False)
+            self.note_cache = NoteCache(NOTE_CACHE_MB * 1024 * 1024)
+        else:
+            self.windows = main.windows
+            self.windows.append(self)
+            self.tm = main.tm
+            self.store = main.store
+            self.index = main.index
+            self.catalog = main.catalog
+            self.note_cache = main.note_cache
+        self.sort_mode = SORT_NAME
+        self.listed_names = []  # Note name for each row of notes_list
+        self.showing_results = False  # notes_list holds search results rather than the catalog
+        self.search_after_id = None
+        self.current_file = None
+        # The open note as last read from / written to the store, for conflict checks and merges
+        self.disk_mtime = None
+        self.disk_doc = None
+        self.resolving = False  # The reload/merge dialog is open
+        self.loader = None  # NoteLoader for the note currently streaming in
+        self.save_when_loaded = False  # A save was asked for while the note was still streaming in
+        self.viewer = None  # TextViewer, created the first time a plain-text note is opened
+        self.viewing = None  # Name of the plain-text note shown in the viewer
         
+        self.setup_ui()
+        self.style_widgets()
+        self.create_sidebar_context_menu()
+
+        # Named notes save themselves in the background once edits go quiet
+        self.autosaver = AutoSaver(self.root, self.editor, self.store, lambda: self.current_file,
+                                   on_saved=self.on_note_saved,
+                                   on_error=self.on_save_error,
+                                   on_status=self.set_status,
+                                   on_written=self.on_note_written,
+                                   before_save=self.check_save_conflict)
+        self.editor.on_change = self.autosaver.schedule
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        # Everything below isn't needed to draw the window; Tk's own redraw
+        # idle handlers were queued first, so these run after the first paint
+        self.root.after_idle(self.load_sidebar)
+
+    def load_sidebar(self):
+        """Deferred startup, step 1: cached catalog on screen, then the icon."""
+        if not self.catalog.loaded:
+            self.catalog.load_cache()
+        self.show_catalog()
+
         # Set Window Icon
         icon_path = os.path.join(os.path.dirname(__file__), "icon.ico")
         if os.path.exists(icon_path):
@@ -29,21 +110,27 @@ class StickyNotesApp:
                 self.root.iconbitmap(icon_path)
             except Exception as e:
                 print(f"Could not load icon: {e}")
-        
-        self.tm = ThemeManager()
-        self.current_file = None
-        
-        self.setup_ui()
-        self.apply_theme()
-        self.refresh_notes()
 
-        self.setup_ui()
-        self.apply_theme()
+        if self.main is None:
+            self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        """Deferred startup, step 2: re-scan the store, watch it and open the search index."""
         self.refresh_notes()
-        self.create_sidebar_context_menu()
-        
-        self.last_saved_content = []  # Track saved state
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.watcher = NoteWatcher(self.root, self.store, self.on_notes_changed)
+        self.watcher.start()
+        try:
+            index = SearchIndex(index_path_for(NOTES_STORE))
+        except Exception as e:
+            print(f"Search disabled: {e}")
+            return
+        for app in self.windows:
+            app.index = index
+
+        # Catch the index up with notes changed outside the app, off the UI thread
+        threading.Thread(target=self.index.sync, args=(self.store,), daemon=True).start()
+        if self.search_var.get().strip():
+            self.run_search()
 
     def setup_ui(self):
         # Main Grid
@@ -69,9 +156,42 @@ class StickyNotesApp:
         self.btn_table = tk.Button(self.toolbar, text="+ Table", command=lambda: self.editor.insert_table(), relief="flat", padx=10, font=("Consolas", 10))
         self.btn_table.pack(side="left", padx=2, pady=2)
 
+        # Formatting of the selected text (Ctrl+B/I/U in the editor)
+        self.btn_bold = tk.Button(self.toolbar, text="B", command=lambda: self.editor.toggle_format("bold"), relief="flat", padx=6, font=("Consolas", 10, "bold"))
+        self.btn_bold.pack(side="left", padx=(10, 2), pady=2)
+
+        self.btn_italic = tk.Button(self.toolbar, text="I", command=lambda: self.editor.toggle_format("italic"), relief="flat", padx=6, font=("Consolas", 10, "italic"))
+        self.btn_italic.pack(side="left", padx=2, pady=2)
+
+        self.btn_underline = tk.Button(self.toolbar, text="U", command=lambda: self.editor.toggle_format("underline"), relief="flat", padx=6, font=("Consolas", 10, "underline"))
+        self.btn_underline.pack(side="left", padx=2, pady=2)
+
+        self.btn_heading = tk.Button(self.toolbar, text="H1", command=lambda: self.editor.set_heading("h1"), relief="flat", padx=6, font=("Consolas", 10))
+        self.btn_heading.pack(side="left", padx=2, pady=2)
+
+        self.btn_subheading = tk.Button(self.toolbar, text="H2", command=lambda: self.editor.set_heading("h2"), relief="flat", padx=6, font=("Consolas", 10))
+        self.btn_subheading.pack(side="left", padx=2, pady=2)
+
+        self.btn_color = tk.Button(self.toolbar, text="Color", command=lambda: self.editor.choose_color(), relief="flat", padx=6, font=("Consolas", 10))
+        self.btn_color.pack(side="left", padx=2, pady=2)
+
+        self.btn_plain = tk.Button(self.toolbar, text="Plain", command=lambda: self.editor.clear_formatting(), relief="flat", padx=6, font=("Consolas", 10))
+        self.btn_plain.pack(side="left", padx=2, pady=2)
+
+        self.btn_undo = tk.Button(self.toolbar, text="Undo", command=lambda: self.editor.undo(), relief="flat", padx=10, font=("Consolas", 10))
+        self.btn_undo.pack(side="left", padx=(10, 2), pady=2)
+
+        self.btn_redo = tk.Button(self.toolbar, text="Redo", command=lambda: self.editor.redo(), relief="flat", padx=10, font=("Consolas", 10))
+        self.btn_redo.pack(side="left", padx=2, pady=2)
+
         self.btn_settings = tk.Button(self.toolbar, text="Settings", command=self.open_settings, relief="flat", padx=10, font=("Consolas", 10))
         self.btn_settings.pack(side="right", padx=2, pady=2)
 
+        # Load progress (only shown while a note is streaming in)
+        self.btn_cancel_load = tk.Button(self.toolbar, text="Cancel", command=self.cancel_load, relief="flat", padx=10, font=("Consolas", 10))
+        self.lbl_status = tk.Label(self.toolbar, text="", font=("Consolas", 10))
+        self.lbl_status.pack(side="right", padx=10, pady=2)
+
         # --- Sidebar (Left) ---
         self.sidebar = tk.Frame(self.root, width=220)
         self.sidebar.grid(row=1, column=0, sticky="ns")
@@ -80,6 +200,15 @@ class StickyNotesApp:
         self.lbl_notes = tk.Label(self.sidebar, text="My Notes", font=("Consolas", 12, "bold"))
         self.lbl_notes.pack(fill="x", pady=5, padx=5)
 
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        self.search_entry = tk.Entry(self.sidebar, textvariable=self.search_var, font=("Consolas", 10), relief="flat")
+        self.search_entry.pack(fill="x", padx=5, pady=(0, 5))
+        self.search_entry.bind("<Escape>", lambda e: self.search_var.set(""))
+
+        self.btn_sort = tk.Button(self.sidebar, text="Sort: Name", command=self.toggle_sort, relief="flat", font=("Consolas", 9))
+        self.btn_sort.pack(fill="x", padx=5)
+
         self.notes_list = tk.Listbox(self.sidebar, font=("Consolas", 10), bd=0, highlightthickness=0)
         self.notes_list.pack(fill="both", expand=True, padx=5, pady=5)
         self.notes_list.bind("<<ListboxSelect>>", self.open_note)
@@ -91,86 +220,405 @@ class StickyNotesApp:
         self.editor = RichTextEditor(self.editor_frame, font=("Consolas", 11), wrap="word", relief="flat", padx=10, pady=10)
         self.editor.pack(fill="both", expand=True)
 
-    def apply_theme(self):
-        colors = self.tm.colors
-        bg = colors["bg"]
-        fg = colors["fg"]
-        panel = colors["panel_bg"]
-        toolbar_bg = colors.get("toolbar_bg", panel)
-        accent = colors["accent"]
-        
-        self.root.configure(bg=bg)
-        self.toolbar.configure(bg=toolbar_bg)
-        self.sidebar.configure(bg=panel)
-        self.editor_frame.configure(bg=bg)
-        
-        # Buttons
+    def style_widgets(self):
+        """Tags every widget with its theme style (theme_manager.STYLES) and colors it once for the first paint."""
         for btn in self.toolbar.winfo_children():
-            btn.configure(bg=accent, fg="#ffffff", activebackground=colors.get("list_select", "#444"))
-            
-        # Lists and Labels
-        self.lbl_notes.configure(bg=panel, fg=fg)
-        self.notes_list.configure(
-            bg=colors["list_bg"], 
-            fg=colors["list_fg"],
-            selectbackground=colors["list_select"],
-            selectforeground=colors["list_fg"]
-        )
-        
-        # Editor
-        self.editor.configure(bg=colors["entry_bg"], fg=colors["entry_fg"], insertbackground=fg)
+            if isinstance(btn, tk.Button):
+                style(btn, "toolbar_button")
+        for widget, name in ((self.root, "root"), (self.toolbar, "toolbar"), (self.btn_cancel_load, "toolbar_button"),
+                             (self.lbl_status, "toolbar_label"), (self.sidebar, "panel"), (self.lbl_notes, "panel_label"),
+                             (self.search_entry, "entry"), (self.btn_sort, "panel_button"), (self.notes_list, "list"),
+                             (self.editor_frame, "frame"), (self.editor, "editor")):
+            style(widget, name)
 
+    def apply_theme(self):
+        # One batched restyle of every window and embedded card/table, on idle.
+        # Extra windows are Toplevels under the first window's root, so start there
+        self.tm.apply((self.main or self).root.winfo_toplevel())
+
+    @timed("refresh_notes")
     def refresh_notes(self):
+        """Rescans the store via the catalog and patches only the rows that changed, in every window."""
+        added, removed, changed = self.catalog.refresh()
+        for app in self.windows:
+            app.patch_list(added, removed, changed)
+
+    def patch_list(self, added, removed, changed):
+        if self.showing_results:
+            self.run_search()
+            return
+        for name in removed:
+            self.list_remove(name)
+        for name in added:
+            self.list_insert(name)
+        if self.sort_mode == SORT_MODIFIED:
+            for name in changed:
+                self.list_remove(name)
+                self.list_insert(name)
+
+    def show_names(self, names, labels=None):
+        self.listed_names = names
         self.notes_list.delete(0, tk.END)
-        for file in sorted(os.listdir(NOTES_FOLDER)):
-            if file.endswith(".json"):
-                self.notes_list.insert(tk.END, file.replace(".json", ""))
+        self.notes_list.insert(tk.END, *(labels or names))
+
+    def show_catalog(self):
+        self.showing_results = False
+        self.show_names(self.catalog.sorted_names(self.sort_mode))
+
+    def toggle_sort(self):
+        self.sort_mode = SORT_MODIFIED if self.sort_mode == SORT_NAME else SORT_NAME
+        self.btn_sort.configure(text="Sort: Modified" if self.sort_mode == SORT_MODIFIED else "Sort: Name")
+        if not self.showing_results:
+            self.show_catalog()
+
+    def list_insert(self, name):
+        # Tk's Listbox only draws the visible rows, so one insert stays cheap even with 100k notes
+        if self.showing_results or name in self.listed_names:
+            return
+        key = self.catalog.sort_key(self.sort_mode)
+        pos = bisect.bisect(self.listed_names, key(name), key=key)
+        self.listed_names.insert(pos, name)
+        self.notes_list.insert(pos, name)
+
+    def list_remove(self, name):
+        if self.showing_results:
+            return
+        try:
+            pos = self.listed_names.index(name)
+        except ValueError:
+            return
+        del self.listed_names[pos]
+        self.notes_list.delete(pos)
+
+    def note_listed_changed(self, name):
+        """Called after a save: adds a new note, or moves it to the top when sorted by modified time."""
+        if self.sort_mode == SORT_MODIFIED:
+            self.list_remove(name)
+        self.list_insert(name)
+
+    def selected_note(self):
+        selection = self.notes_list.curselection()
+        if not selection or selection[0] >= len(self.listed_names):
+            return None
+        return self.listed_names[selection[0]]
+
+    def schedule_search(self):
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self.search_after_id = None
+        query = self.search_var.get().strip()
+        if not query or self.index is None:
+            self.show_catalog()
+            return
+        results = self.index.search(query)
+        self.showing_results = True
+        self.show_names([r.name for r in results], [f"{r.name}  {r.snippet}" for r in results])
+
+    def on_note_written(self, name, doc, content):
+        # Runs on the autosave thread, right after the note hit the store
+        self.catalog.update(name, content)
+        entry = self.catalog.get(name)
+        self.note_cache.put(name, entry.mtime, doc, entry.size)
+        if self.index is not None:
+            self.index.index_note(name, content, entry.mtime)
 
     def new_note(self):
         if self.check_unsaved_changes():
+            self.close_viewer()
+            self.cancel_load(clear=False)
             self.current_file = None
-            self.editor.delete("1.0", tk.END)
-            self.editor.widgets.clear()
-            self.last_saved_content = []
+            self.set_disk_state(None, None)
+            self.editor.clear()
 
+    @timed("save_note")
     def save_note(self):
-        content = self.editor.get_content_json()
-        
         if self.current_file is None:
+            from tkinter import simpledialog
             name = simpledialog.askstring("Save Note", "Enter note name:", parent=self.root)
             if not name: return
+            if any(app is not self and app.current_file == name for app in self.windows):
+                from tkinter import messagebox
+                messagebox.showerror("Error", f"'{name}' is open in another window", parent=self.root)
+                return
             self.current_file = name
         
-        file_path = os.path.join(NOTES_FOLDER, self.current_file + ".json")
-        try:
-            with open(file_path, "w") as f:
-                json.dump(content, f, indent=2)
-            self.refresh_notes()
-            self.last_saved_content = content
-            messagebox.showinfo("Saved", "Note saved successfully!", parent=self.root)
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not save: {e}", parent=self.root)
+        # Serialization and the write happen on the autosave thread
+        self.autosaver.save_now()
+
+    def set_status(self, text):
+        self.lbl_status.configure(text=text)
+
+    def on_note_saved(self, name):
+        self.set_status(f"Saved {time.strftime('%H:%M:%S')}")
+        entry = self.catalog.get(name)
+        if name == self.current_file and entry is not None:
+            self.set_disk_state(entry.mtime, self.note_cache.get(name, entry.mtime))
+        for app in self.windows:
+            app.note_listed_changed(name)
+            # Our save is an outside change for other windows showing the same note
+            if app is not self and app.current_file == name:
+                app.on_external_change(name)
+
+    def set_disk_state(self, mtime, doc):
+        self.disk_mtime = mtime
+        self.disk_doc = doc
+
+    def on_save_error(self, error):
+        self.set_status("Save failed")
+        from tkinter import messagebox
+        messagebox.showerror("Error", f"Could not save: {error}", parent=self.root)
 
     def open_note(self, event):
+        note_name = self.selected_note()
+        if not note_name: return
+        self.open_note_named(note_name)
+
+    @timed("open_note")
+    def open_note_named(self, note_name):
+        # Each window autosaves on its own: a note lives in one window at a time
+        other = next((app for app in self.windows if app is not self and note_name in (app.current_file, app.viewing)), None)
+        if other is not None:
+            other.raise_window()
+            other.set_status("Already open in this window")
+            return
         if not self.check_unsaved_changes():
             return
 
-        selection = self.notes_list.curselection()
-        if not selection: return
-        
-        note_name = self.notes_list.get(selection[0])
+        text_path = self.store.text_path(note_name)
+        if text_path is not None:
+            self.open_text_note(note_name, text_path)
+        elif self.store.exists(note_name):
+            self.load_note(note_name)
+
+    def open_text_note(self, note_name, path):
+        """Plain-text notes open read-only in the memory-mapped viewer instead of the editor."""
+        self.cancel_load(clear=False)
+        self.current_file = None
+        self.set_disk_state(None, None)
+        self.editor.clear()
+        if self.viewer is None:
+            self.viewer = TextViewer(self.editor_frame, font=("Consolas", 11), padx=10, pady=10)
+        self.editor.pack_forget()
+        self.viewer.pack(fill="both", expand=True)
+        self.viewing = note_name
+        try:
+            self.viewer.open(path)
+        except OSError as e:
+            self.close_viewer()
+            from tkinter import messagebox
+            messagebox.showerror("Error", f"Could not open note: {e}")
+
+    def close_viewer(self):
+        if self.viewing is None:
+            return
+        self.viewing = None
+        self.viewer.close()
+        self.viewer.pack_forget()
+        self.editor.pack(fill="both", expand=True)
+
+    def load_note(self, note_name):
+        self.close_viewer()
+        self.cancel_load(clear=False)
         self.current_file = note_name
-        file_path = os.path.join(NOTES_FOLDER, note_name + ".json")
-        
-        if os.path.exists(file_path):
+        try:
+            info = self.store.info(note_name)
+            self.set_disk_state(info.mtime, None)
+            # Recently opened and unchanged on disk: skip reading and parsing entirely
+            doc = self.note_cache.get(note_name, info.mtime)
+            if doc is not None:
+                perf_monitor.count("open_note.cached")
+                self.disk_doc = doc.snapshot()  # The editor's widgets edit doc's segments
+                self.editor.load_document(doc)
+                return
+            perf_monitor.count("open_note.streamed")
+            self.loader = NoteLoader(self.editor, self.store, note_name,
+                                     on_progress=self.show_load_progress,
+                                     on_done=lambda: self.on_load_finished(info),
+                                     on_error=self.on_load_error)
+            self.loader.start()
+        except Exception as e:
+            self.loader = None
+            from tkinter import messagebox
+            messagebox.showerror("Error", f"Could not open note: {e}")
+
+    def on_load_finished(self, info):
+        self.note_cache.put(info.name, info.mtime, self.loader.document, info.size)
+        self.disk_doc = self.loader.document
+        save = self.save_when_loaded
+        self.on_load_done()
+        if save:
+            self.autosaver.save_now()
+
+    def show_load_progress(self, fraction):
+        self.lbl_status.configure(text=f"Loading {int(fraction * 100)}%")
+        if not self.btn_cancel_load.winfo_ismapped():
+            self.btn_cancel_load.pack(side="right", padx=2, pady=2, before=self.lbl_status)
+
+    def on_load_done(self):
+        self.loader = None
+        self.save_when_loaded = False
+        self.lbl_status.configure(text="")
+        self.btn_cancel_load.pack_forget()
+
+    def on_load_error(self, error):
+        self.on_load_done()
+        self.current_file = None
+        self.set_disk_state(None, None)
+        self.editor.clear()
+        from tkinter import messagebox
+        messagebox.showerror("Error", f"Could not open note: {error}")
+
+    def cancel_load(self, clear=True):
+        """Stops a note that is still streaming in. A partial note is never left attached to its file."""
+        if self.loader is None:
+            return
+        was_running = self.loader.running
+        if was_running and clear and self.editor.is_modified():
+            # The partial note can't be saved over its file, so edits made while it loaded would be lost
+            from tkinter import messagebox
+            if not messagebox.askyesno("Cancel Loading", "Stop loading and discard the edits made while the note was loading?",
+                                       parent=self.root):
+                return
+        self.loader.cancel()
+        self.on_load_done()
+        if was_running and clear:
+            self.current_file = None
+            self.set_disk_state(None, None)
+            self.editor.clear()
+
+    def on_notes_changed(self, names):
+        """
+        NoteWatcher callback: notes changed on disk by someone else. Updates
+        just those catalog entries, sidebar rows and index documents, and
+        offers the affected open notes a reload or merge.
+        """
+        if names is None:
+            self.refresh_notes()  # The watcher lost events
+            return
+        if any(app.autosaver.in_flight for app in self.windows):
+            return False  # Our own write may be half-way; look again with the next batch
+        changed = []
+        for name in names:
+            if not self.store.exists(name):
+                if self.catalog.get(name) is None:
+                    continue
+                self.catalog.remove(name)
+                self.note_cache.discard(name)
+                if self.index is not None:
+                    self.index.remove_note(name)
+                for app in self.windows:
+                    app.list_remove(name)
+                    if app.viewing == name:
+                        app.close_viewer()
+                    if app.current_file == name:
+                        app.set_status("Deleted on disk")
+                        app.set_disk_state(None, None)
+                continue
+            info = self.store.info(name)
+            entry = self.catalog.get(name)
+            if entry is not None and entry.mtime == info.mtime and entry.size == info.size:
+                continue  # Written by this process (or touched without changes)
+            self.catalog.update(name)
+            self.note_cache.discard(name)
+            changed.append(name)
+            for app in self.windows:
+                app.note_listed_changed(name)
+                if app.viewing == name:
+                    app.viewer.reload()  # e.g. a log that grew
+                if app.current_file == name:
+                    app.on_external_change(name)
+        if changed and self.index is not None:
+            threading.Thread(target=self.reindex, args=(changed,), daemon=True).start()
+        return True
+
+    def reindex(self, names):
+        # Runs on a background thread
+        for name in names:
+            if self.store.text_path(name) is not None:
+                continue  # Plain-text notes aren't indexed
             try:
-                with open(file_path, "r") as f:
-                    content = json.load(f)
-                self.editor.load_content_json(content)
-                self.last_saved_content = content
-                self.last_saved_content = content
+                self.index.index_note(name, self.store.load(name), self.store.info(name).mtime)
             except Exception as e:
-                messagebox.showerror("Error", f"Could not open note: {e}")
+                print(f"Could not index {name}: {e}")
+
+    def on_external_change(self, name):
+        """The note open in this window changed on disk."""
+        try:
+            mtime = self.store.info(name).mtime
+        except FileNotFoundError:
+            return
+        if mtime == self.disk_mtime or self.resolving:
+            return
+        if self.loader is not None and self.loader.running:
+            self.load_note(name)  # Still streaming the old version: start over
+        elif self.editor.is_modified():
+            self.resolve_conflict(name)
+        else:
+            self.load_note(name)
+            self.set_status("Reloaded (changed on disk)")
+
+    def check_save_conflict(self, name):
+        """AutoSaver hook: refuses to overwrite a note that changed on disk since we read it."""
+        if self.resolving:
+            return False
+        if name == self.current_file and self.loader is not None and self.loader.running:
+            # Never save a half-loaded note; on_load_finished saves it once it is complete
+            self.save_when_loaded = True
+            self.set_status("Saving once loaded...")
+            return False
+        if name != self.current_file or self.disk_mtime is None or self.autosaver.in_flight:
+            return True  # New note, or our own previous write is still landing
+        try:
+            mtime = self.store.info(name).mtime
+        except FileNotFoundError:
+            return True
+        if mtime == self.disk_mtime:
+            return True
+        return self.resolve_conflict(name)
+
+    def resolve_conflict(self, name):
+        """
+        Asks what to do with unsaved edits to a note that changed on disk.
+        Returns True if the editor content should now be saved over it.
+        """
+        win = Toplevel(self.root)
+        win.title("Note changed on disk")
+        win.configure(bg=self.tm.get_color("panel_bg"))
+        win.transient(self.root)
+        Label(win, text=f"'{name}' was changed outside this window.\nWhat should happen to your unsaved edits?",
+              bg=self.tm.get_color("panel_bg"), fg=self.tm.get_color("fg"), font=("Segoe UI", 11), justify="left").pack(padx=15, pady=10)
+        choice = tk.StringVar(value="keep")
+
+        def choose(value):
+            choice.set(value)
+            win.destroy()
+
+        Button(win, text="Reload (discard my edits)", command=lambda: choose("reload"), width=28, pady=3).pack(pady=3)
+        Button(win, text="Merge both versions", command=lambda: choose("merge"), width=28, pady=3).pack(pady=3)
+        Button(win, text="Keep mine (overwrite)", command=lambda: choose("keep"), width=28, pady=3).pack(pady=(3, 10))
+        win.protocol("WM_DELETE_WINDOW", lambda: choose("keep"))
+        win.grab_set()
+        self.resolving = True
+        try:
+            self.root.wait_window(win)
+        finally:
+            self.resolving = False
+
+        if choice.get() == "reload":
+            self.load_note(name)
+            return False
+        info = self.store.info(name)
+        theirs = NoteDocument.from_json(self.store.load(name))
+        if choice.get() == "merge":
+            merged, conflicts = merge_documents(self.disk_doc, self.editor.get_document(), theirs)
+            self.editor.load_document(merged)
+            self.editor.changed()  # The merge still has to be saved
+            self.set_status(f"Merged ({conflicts} conflicting segments appended)" if conflicts else "Merged")
+        self.set_disk_state(info.mtime, theirs)
+        return True
 
     def create_sidebar_context_menu(self):
         self.sidebar_menu = tk.Menu(self.root, tearoff=0)
@@ -190,44 +638,70 @@ class StickyNotesApp:
             pass
 
     def rename_note(self):
-        selection = self.notes_list.curselection()
-        if not selection: return
-        old_name = self.notes_list.get(selection[0])
+        old_name = self.selected_note()
+        if not old_name: return
         
+        from tkinter import simpledialog
         new_name = simpledialog.askstring("Rename Note", "Enter new name:", initialvalue=old_name, parent=self.root)
+        if new_name and self.store.text_path(old_name) is not None and not new_name.endswith(TEXT_EXT):
+            new_name += TEXT_EXT  # Stays a plain-text file
         if new_name and new_name != old_name:
-            old_path = os.path.join(NOTES_FOLDER, old_name + ".json")
-            new_path = os.path.join(NOTES_FOLDER, new_name + ".json")
+            # A queued autosave must not recreate the old note after the rename
+            self.autosaver.flush()
             try:
-                os.rename(old_path, new_path)
-                self.refresh_notes()
-                if self.current_file == old_name:
-                    self.current_file = new_name
+                self.store.rename(old_name, new_name)
+                if self.index is not None:
+                    self.index.rename_note(old_name, new_name)
+                self.catalog.rename(old_name, new_name)
+                self.note_cache.rename(old_name, new_name)
+                for app in self.windows:
+                    app.list_remove(old_name)
+                    app.list_insert(new_name)
+                    if app.current_file == old_name:
+                        app.current_file = new_name
+                    if app.viewing == old_name:
+                        app.viewing = new_name
             except Exception as e:
+                from tkinter import messagebox
                 messagebox.showerror("Error", f"Could not rename: {e}")
 
     def delete_note(self):
-        selection = self.notes_list.curselection()
-        if not selection: return
-        name = self.notes_list.get(selection[0])
+        name = self.selected_note()
+        if not name: return
         
+        from tkinter import messagebox
         if messagebox.askyesno("Delete Note", f"Are you sure you want to delete '{name}'?", parent=self.root):
-            path = os.path.join(NOTES_FOLDER, name + ".json")
+            self.autosaver.flush()
             try:
-                os.remove(path)
-                self.refresh_notes()
-                if self.current_file == name:
-                    self.new_note() # Clear editor if we deleted open note
+                self.store.delete(name)
+                if self.index is not None:
+                    self.index.remove_note(name)
+                self.catalog.remove(name)
+                self.note_cache.discard(name)
+                for app in self.windows:
+                    app.list_remove(name)
+                    if app.current_file == name or app.viewing == name:
+                        app.new_note() # Clear editor if we deleted open note
             except Exception as e:
                 messagebox.showerror("Error", f"Could not delete: {e}")
 
+    @timed("check_unsaved_changes")
     def check_unsaved_changes(self):
         """Returns True if it's safe to proceed (saved or discarded), False if cancelled."""
-        current_content = self.editor.get_content_json()
-        if current_content != self.last_saved_content:
+        # Named notes autosave: just make sure the latest edits are on disk
+        if self.current_file is not None:
+            self.autosaver.flush()
+        # O(1): the editor counts edits as they happen instead of re-serializing
+        if self.editor.is_modified() and self.save_when_loaded:
+            from tkinter import messagebox
+            messagebox.showinfo("Still Loading", "The note is still loading. Your edits are saved once it has loaded.", parent=self.root)
+            return False
+        if self.editor.is_modified():
+            from tkinter import messagebox
             response = messagebox.askyesnocancel("Unsaved Changes", "You have unsaved changes. Do you want to save them?", parent=self.root)
             if response is True: # Yes
                 self.save_note()
+                self.autosaver.flush()
                 return True
             elif response is False: # No
                 return True # User chose NOT to save, so we proceed
@@ -236,9 +710,57 @@ class StickyNotesApp:
         return True
 
     def on_closing(self):
-        if self.check_unsaved_changes():
+        if self.main is not None:
+            # Extra window: only this one goes away
+            if self.check_unsaved_changes():
+                self.cancel_load(clear=False)
+                self.close_viewer()
+                self.windows.remove(self)
+                self.root.destroy()
+            return
+        if all(app.check_unsaved_changes() for app in self.windows):
+            for app in self.windows:
+                app.cancel_load(clear=False)
+                app.close_viewer()
+            if self.server is not None:
+                self.server.close()
+            if self.watcher is not None:
+                self.watcher.stop()
+            if self.perf is not None:
+                self.perf.stop()
+            self.catalog.save_cache()
+            self.tm.flush()
+            self.store.close()
+            if self.index is not None:
+                self.index.close()
             self.root.destroy()
 
+    def handle_request(self, request):
+        """A later launch of the app (see single_instance) asked for a window or a note."""
+        if request.get("action") == single_instance.OPEN_NOTE:
+            name = request.get("note")
+            # Prefer a window that already shows it, then one with nothing open
+            app = (next((a for a in self.windows if name in (a.current_file, a.viewing)), None)
+                   or next((a for a in self.windows if a.current_file is None and not a.editor.is_modified()), None)
+                   or self.new_window())
+            app.raise_window()
+            if name in (app.current_file, app.viewing):
+                return
+            if self.store.exists(name):
+                app.open_note_named(name)
+            else:
+                app.set_status(f"No note named '{name}'")
+        else:
+            self.new_window().raise_window()
+
+    def new_window(self):
+        return StickyNotesApp(Toplevel(self.root), main=self.main or self)
+
+    def raise_window(self):
+        self.root.deiconify()
+        self.root.lift()
+        self.root.focus_force()
+
     def open_settings(self):
         win = Toplevel(self.root)
         win.title("Settings")
@@ -259,4 +781,10 @@ class StickyNotesApp:
 if __name__ == "__main__":
     root = tk.Tk()
     app = StickyNotesApp(root)
+    if "--new-instance" not in sys.argv:
+        app.server = single_instance.InstanceServer(root, single_instance.socket_path_for(NOTES_STORE), app.handle_request)
+        root.after_idle(app.server.start)
+    request = single_instance.request_from_args(sys.argv[1:])
+    if request["action"] == single_instance.OPEN_NOTE:
+        root.after_idle(app.handle_request, request)
     root.mainloop()
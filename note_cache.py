@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_BUDGET_BYTES = 64 * 1024 * 1024
+
+
+class NoteCache:
+    """
+    Bounded LRU cache of parsed notes (NoteDocument), keyed by name + mtime.
+    A changed mtime is a miss, so edits made outside the app are never served
+    stale. Entries are weighed by their size on disk and the least recently
+    used ones are evicted once the total exceeds budget_bytes.
+    Callers get a snapshot, so editing never mutates the cached copy.
+    """
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()  # name -> (mtime, doc, size)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()  # put() is also called from the autosave thread
+
+    def get(self, name, mtime):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None or entry[0] != mtime:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(name)
+            self.hits += 1
+            doc = entry[1]
+        return doc.snapshot()
+
+    def put(self, name, mtime, doc, size):
+        if size > self.budget_bytes:
+            self.discard(name)
+            return
+        with self.lock:
+            old = self.entries.pop(name, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            self.entries[name] = (mtime, doc, size)
+            self.total_bytes += size
+            while self.total_bytes > self.budget_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def discard(self, name):
+        with self.lock:
+            old = self.entries.pop(name, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+
+    def rename(self, old_name, new_name):
+        with self.lock:
+            entry = self.entries.pop(old_name, None)
+            if entry is not None:
+                self.entries[new_name] = entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
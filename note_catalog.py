@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+from autosave import atomic_write_json
+from note_document import segment_from_dict
+
+PREVIEW_CHARS = 80
+SORT_NAME = "name"
+SORT_MODIFIED = "modified"
+
+
+class CatalogEntry:
+    __slots__ = ("name", "mtime", "size", "preview")
+
+    def __init__(self, name, mtime, size, preview=""):
+        self.name = name
+        self.mtime = mtime
+        self.size = size
+        self.preview = preview
+
+    def to_list(self):
+        return [self.name, self.mtime, self.size, self.preview]
+
+
+def catalog_path_for(location):
+    """Where the catalog cache lives for a notes folder or a SQLite notes database."""
+    if os.path.isdir(location):
+        return os.path.join(location, ".catalog.json")
+    return os.path.splitext(location)[0] + ".catalog.json"
+
+
+def make_preview(segments):
+    """First PREVIEW_CHARS of plain text from an iterable of segment dicts (stops reading early)."""
+    parts = []
+    length = 0
+    for item in segments:
+        seg = segment_from_dict(item)
+        if seg is None:
+            continue
+        text = " ".join(seg.text().split())
+        if text:
+            parts.append(text)
+            length += len(text) + 1
+        if length >= PREVIEW_CHARS:
+            break
+    return " ".join(parts)[:PREVIEW_CHARS]
+
+
+class NoteCatalog:
+    """
+    In-memory (and on-disk cached) list of notes with mtime, size and a preview.
+    refresh() only compares mtimes/sizes from a directory scan against the
+    cache and reads just the notes that changed; save/rename/delete update
+    single entries. Every method returns what changed so the sidebar can
+    patch itself instead of re-listing.
+    """
+    def __init__(self, store, cache_path=None, preload=True):
+        self.store = store
+        self.cache_path = cache_path
+        self.entries = {}
+        self.lock = threading.Lock()  # update() is called from the autosave thread
+        self.loaded = False  # Until the cache is read, saving it would drop entries
+        if preload:
+            self.load_cache()
+
+    def load_cache(self):
+        self.loaded = True
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r") as f:
+                rows = json.load(f)
+            with self.lock:
+                for row in rows:
+                    entry = CatalogEntry(*row)
+                    # Entries written since startup are newer than the cache
+                    self.entries.setdefault(entry.name, entry)
+        except Exception as e:
+            print(f"Ignoring note catalog cache: {e}")
+
+    def save_cache(self):
+        if not self.cache_path or not self.loaded:
+            return
+        with self.lock:
+            rows = [entry.to_list() for entry in self.entries.values()]
+        try:
+            atomic_write_json(self.cache_path, rows)
+        except Exception as e:
+            print(f"Could not write note catalog cache: {e}")
+
+    def _read_preview(self, name):
+        try:
+            text_path = self.store.text_path(name)
+            if text_path is not None:
+                # Only the head of a (possibly huge) plain-text note
+                with open(text_path, "rb") as f:
+                    head = f.read(PREVIEW_CHARS * 4).decode("utf-8", "ignore")
+                return " ".join(head.split())[:PREVIEW_CHARS]
+            return make_preview(item for item, done, total in self.store.iter_segments(name))
+        except Exception:
+            return ""
+
+    def refresh(self):
+        """Re-scans the store. Returns (added, removed, changed) name sets."""
+        seen = set()
+        added, changed = set(), set()
+        for info in self.store.list_notes():
+            seen.add(info.name)
+            entry = self.entries.get(info.name)
+            if entry is not None and entry.mtime == info.mtime and entry.size == info.size:
+                continue
+            preview = self._read_preview(info.name)
+            with self.lock:
+                self.entries[info.name] = CatalogEntry(info.name, info.mtime, info.size, preview)
+            (changed if entry is not None else added).add(info.name)
+        with self.lock:
+            removed = set(self.entries) - seen
+            for name in removed:
+                del self.entries[name]
+        if added or removed or changed:
+            self.save_cache()
+        return added, removed, changed
+
+    def update(self, name, content=None):
+        """Re-reads one note's stat (and preview from content if given). Returns True if it is new."""
+        info = self.store.info(name)
+        preview = make_preview(content) if content is not None else self._read_preview(name)
+        with self.lock:
+            is_new = name not in self.entries
+            self.entries[name] = CatalogEntry(name, info.mtime, info.size, preview)
+        return is_new
+
+    def remove(self, name):
+        with self.lock:
+            self.entries.pop(name, None)
+
+    def rename(self, old_name, new_name):
+        with self.lock:
+            entry = self.entries.pop(old_name, None)
+        if entry is not None:
+            entry.name = new_name
+            with self.lock:
+                self.entries[new_name] = entry
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    def sort_key(self, sort):
+        if sort == SORT_MODIFIED:
+            entries = self.entries
+            # Newest first; names break ties so positions are stable
+            return lambda name: (-entries[name].mtime if name in entries else 0, name)
+        return lambda name: name
+
+    def sorted_names(self, sort=SORT_NAME):
+        with self.lock:
+            names = list(self.entries)
+        names.sort(key=self.sort_key(sort))
+        return names
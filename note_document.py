@@ -0,0 +1,477 @@
+import copy
+import json
+from formula_engine import FormulaEngine, is_formula, cell_name, parse_cell_name
+from text_styles import StyleTable, STYLES_TYPE, merge_spans
+
+
+class Segment:
+    """
+    Base class for one piece of a note.
+    Segments are plain Python objects so notes can be saved, diffed and
+    searched without any Tk widgets (or a display) around.
+    """
+    type = None
+
+    def to_dict(self):
+        raise NotImplementedError
+
+    def text(self):
+        """Returns the searchable plain text of this segment."""
+        return ""
+
+    def copy(self):
+        return self.__class__.from_dict(self.to_dict())
+
+    def snapshot(self):
+        """Cheap frozen copy for handing to another thread (strings are immutable)."""
+        return copy.copy(self)
+
+    @classmethod
+    def from_dict(cls, item):
+        raise NotImplementedError
+
+    def __eq__(self, other):
+        return isinstance(other, Segment) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.to_dict()!r})"
+
+
+class TextSegment(Segment):
+    """
+    Text, optionally with formatting as spans: [(length, style), ...]
+    covering content (see text_styles). Plain text has spans None.
+    """
+    type = "text"
+
+    def __init__(self, content="", spans=None):
+        self.content = content
+        self.spans = merge_spans(spans) if spans else None
+
+    def to_dict(self, styles=None):
+        """styles is the note's shared StyleTable; without one the dict carries its own."""
+        item = {"type": "text", "content": self.content}
+        if self.spans:
+            table = styles if styles is not None else StyleTable()
+            item["spans"] = table.encode(self.spans)
+            if styles is None:
+                item["styles"] = table.to_json()
+        return item
+
+    def text(self):
+        return self.content
+
+    @classmethod
+    def from_dict(cls, item, styles=None):
+        spans = item.get("spans")
+        if spans:
+            table = item.get("styles")
+            table = StyleTable(table) if table is not None else styles
+            spans = table.decode(spans) if table is not None else None
+        return cls(content=item.get("content", ""), spans=spans)
+
+
+TEXT_CHUNK_MIN = 2 * 1024  # Text between two embeds is saved in pieces of about this size or more
+TEXT_CHUNK_MAX = 32 * 1024
+
+
+def split_text(content, spans=None):
+    """
+    Cuts a run of text (and its spans) into TextSegments at the first
+    paragraph break after TEXT_CHUNK_MIN chars, or any line break after
+    TEXT_CHUNK_MAX. Cuts depend only on the text since the previous cut,
+    so an edit changes the piece it falls in and not the ones after it,
+    which keeps journaled saves small.
+    """
+    cuts = []
+    start = 0
+    while len(content) - start > TEXT_CHUNK_MIN:
+        cut = content.find("\n\n", start + TEXT_CHUNK_MIN)
+        if cut != -1 and cut - start <= TEXT_CHUNK_MAX:
+            cut += 2
+        else:
+            cut = content.find("\n", start + TEXT_CHUNK_MAX)
+            if cut == -1:
+                break
+            cut += 1
+        if cut >= len(content):
+            break
+        cuts.append(cut)
+        start = cut
+    if not cuts:
+        return [TextSegment(content, spans)]
+    segments = []
+    runs = list(spans or ())
+    i = 0
+    start = 0
+    for end in cuts + [len(content)]:
+        piece = []
+        need = end - start
+        while need and i < len(runs):
+            length, style = runs[i]
+            if length <= need:
+                piece.append(runs[i])
+                need -= length
+                i += 1
+            else:
+                piece.append((need, style))
+                runs[i] = (length - need, style)
+                need = 0
+        segments.append(TextSegment(content[start:end], piece))
+        start = end
+    return segments
+
+
+class CardSegment(Segment):
+    type = "card"
+
+    def __init__(self, title="Title", content="Content", bg="#333333", width=200, height=120):
+        self.title = title
+        self.content = content
+        self.bg = bg
+        self.width = width
+        self.height = height
+
+    def to_dict(self):
+        return {
+            "type": "card",
+            "width": self.width,
+            "height": self.height,
+            "title": self.title,
+            "content": self.content,
+            "bg": self.bg
+        }
+
+    def text(self):
+        return f"{self.title}\n{self.content}"
+
+    @classmethod
+    def from_dict(cls, item):
+        return cls(
+            title=item.get("title", ""),
+            content=item.get("content", ""),
+            bg=item.get("bg", "#333333"),
+            width=item.get("width", 200),
+            height=item.get("height", 120)
+        )
+
+
+class TableSegment(Segment):
+    """
+    Table cells are kept in one flat row-major list (cell r, c lives at
+    r * cols + c) so even 100k-cell tables stay a single compact list.
+    The JSON form is still the nested "data" list.
+    values holds what was typed; cells starting with "=" are formulas,
+    computed by a FormulaEngine that only exists once the table has one.
+    Saved "data" holds the computed values (what older versions, search
+    and previews see) and "formulas" maps cell names to the raw formulas.
+    """
+    type = "table"
+
+    def __init__(self, rows=3, cols=3, cell_width=10, align="center", width=300, height=150, bg="gray", data=None,
+                 formulas=None):
+        self.rows = rows
+        self.cols = cols
+        self.cell_width = cell_width
+        self.align = align
+        self.width = width
+        self.height = height
+        self.bg = bg
+        self.values = [""] * (rows * cols)
+        for r, row_vals in enumerate(data or []):
+            if r >= rows:
+                break
+            row_vals = row_vals[:cols]
+            self.values[r * cols:r * cols + len(row_vals)] = row_vals
+        for name, text in (formulas or {}).items():
+            cell = parse_cell_name(name)
+            if cell is not None and cell[0] < rows and cell[1] < cols:
+                self.values[cell[0] * cols + cell[1]] = text
+        self.engine = None
+        self.update_formulas()
+
+    def update_formulas(self):
+        """Recomputes every formula after values were replaced or moved wholesale."""
+        if self.engine is not None:
+            self.engine.rebuild()
+        elif any(is_formula(v) for v in self.values):
+            self.engine = FormulaEngine(self)
+
+    def resize(self, rows, cols):
+        """Grows or shrinks the cell grid, keeping existing values."""
+        if cols != self.cols:
+            old, old_cols = self.values, self.cols
+            keep = min(cols, old_cols)
+            values = []
+            for r in range(min(rows, self.rows)):
+                values.extend(old[r * old_cols:r * old_cols + keep])
+                values.extend([""] * (cols - keep))
+            self.values = values
+        else:
+            del self.values[rows * cols:]
+        self.values.extend([""] * (rows * cols - len(self.values)))
+        resized = (rows, cols) != (self.rows, self.cols)
+        self.rows = rows
+        self.cols = cols
+        if resized and self.engine is not None:
+            self.engine.rebuild()  # Flat indices moved
+
+    def set_values(self, values):
+        self.values = values
+        self.update_formulas()
+
+    def replace(self, rows, cols, values):
+        """Takes over a whole new grid (e.g. an imported file), values being flat row-major."""
+        self.rows, self.cols = rows, cols
+        self.set_values(values)
+
+    def get_cell(self, r, c):
+        """The raw cell, formula text included."""
+        return self.values[r * self.cols + c]
+
+    def set_cell(self, r, c, value):
+        """Returns the flat indices whose displayed value changed (dependent formulas included)."""
+        i = r * self.cols + c
+        self.values[i] = value
+        if self.engine is not None:
+            return self.engine.update(i)
+        if is_formula(value):
+            self.engine = FormulaEngine(self)
+        return {i}
+
+    def display(self, r, c):
+        """The cell as shown: a formula's result, otherwise the raw value."""
+        if self.engine is None:
+            return self.values[r * self.cols + c]
+        return self.engine.display(r * self.cols + c)
+
+    def snapshot(self):
+        seg = copy.copy(self)
+        seg.values = list(self.values)
+        if self.engine is not None:
+            seg.engine = self.engine.snapshot(seg)
+        return seg
+
+    def row(self, r):
+        if self.engine is None:
+            return self.values[r * self.cols:(r + 1) * self.cols]
+        display = self.engine.display
+        return [display(i) for i in range(r * self.cols, (r + 1) * self.cols)]
+
+    @property
+    def data(self):
+        return [self.row(r) for r in range(self.rows)]
+
+    def formulas(self):
+        if self.engine is None:
+            return {}
+        cols = self.cols
+        return {cell_name(*divmod(i, cols)): f.text for i, f in sorted(self.engine.formulas.items())}
+
+    def cell_count(self):
+        return self.rows * self.cols
+
+    def to_dict(self):
+        item = {
+            "type": "table",
+            "width": self.width,
+            "height": self.height,
+            "rows": self.rows,
+            "cols": self.cols,
+            "cell_width": self.cell_width,
+            "align": self.align,
+            "data": self.data,
+            "bg": self.bg
+        }
+        formulas = self.formulas()
+        if formulas:
+            item["formulas"] = formulas
+        return item
+
+    def text(self):
+        return "\n".join("\t".join(self.row(r)) for r in range(self.rows))
+
+    @classmethod
+    def from_dict(cls, item):
+        return cls(
+            rows=item.get("rows", 3),
+            cols=item.get("cols", 3),
+            cell_width=item.get("cell_width", 10),
+            align=item.get("align", "center"),
+            width=item.get("width", 300),
+            height=item.get("height", 150),
+            bg=item.get("bg", "gray"),
+            data=item.get("data", []),
+            formulas=item.get("formulas")
+        )
+
+
+SEGMENT_TYPES = {
+    "text": TextSegment,
+    "card": CardSegment,
+    "table": TableSegment,
+}
+
+
+def segment_from_dict(item, styles=None):
+    """Builds a Segment from its JSON dict (styles: the note's StyleTable, if any). Returns None for unknown types."""
+    cls = SEGMENT_TYPES.get(item.get("type"))
+    if cls is None:
+        return None
+    if cls is TextSegment:
+        return cls.from_dict(item, styles)
+    return cls.from_dict(item)
+
+
+def style_table_from(item):
+    """The StyleTable of a note's leading "styles" item, or None for any other item."""
+    if item.get("type") != STYLES_TYPE:
+        return None
+    return StyleTable(item.get("table"))
+
+
+class NoteDocument:
+    """
+    Pure-Python model of a note: an ordered list of segments.
+    The JSON form (to_json / from_json) is the same list of dicts that
+    RichTextEditor.get_content_json has always produced.
+    """
+    def __init__(self, segments=None, styles=None):
+        self.segments = list(segments or [])
+        # StyleTable the note was loaded with; kept so style ids (and so the
+        # saved form of untouched segments) stay the same from save to save
+        self.styles = styles
+
+    @classmethod
+    def from_json(cls, content_list):
+        segments = []
+        styles = None
+        for item in content_list or []:
+            table = style_table_from(item)
+            if table is not None:
+                styles = table
+                continue
+            seg = segment_from_dict(item, styles)
+            if seg is not None:
+                segments.append(seg)
+        return cls(segments, styles)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            return cls.from_json(json.load(f))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def to_json(self):
+        # Formatted text shares one style table, written ahead of the segments that use it.
+        # New styles are only appended, so a formatting change elsewhere never renumbers a segment's spans
+        if self.styles is None:
+            self.styles = StyleTable()
+        styles = self.styles
+        items = [seg.to_dict(styles) if isinstance(seg, TextSegment) else seg.to_dict() for seg in self.segments]
+        if styles.styles:
+            items.insert(0, {"type": STYLES_TYPE, "table": styles.to_json()})
+        return items
+
+    def copy(self):
+        return NoteDocument((seg.copy() for seg in self.segments), self.styles)
+
+    def snapshot(self):
+        """
+        Detached copy that is safe to serialize on a background thread while
+        the widgets keep editing their own segments.
+        """
+        return NoteDocument((seg.snapshot() for seg in self.segments), self.styles)
+
+    def append(self, segment):
+        self.segments.append(segment)
+
+    def text(self):
+        return "\n".join(seg.text() for seg in self.segments)
+
+    def search(self, query):
+        """
+        Case-insensitive substring search.
+        Returns a list of (segment_index, offset) pairs, offset being relative to segment.text().
+        """
+        needle = query.lower()
+        hits = []
+        if not needle:
+            return hits
+        for i, seg in enumerate(self.segments):
+            haystack = seg.text().lower()
+            start = haystack.find(needle)
+            while start != -1:
+                hits.append((i, start))
+                start = haystack.find(needle, start + 1)
+        return hits
+
+    def diff(self, other):
+        """
+        Compares against another document (or a raw JSON list).
+        Returns the indexes of segments that differ; indexes past the end of
+        the shorter document are included.
+        """
+        if not isinstance(other, NoteDocument):
+            other = NoteDocument.from_json(other)
+        changed = []
+        for i in range(max(len(self.segments), len(other.segments))):
+            if i >= len(self.segments) or i >= len(other.segments):
+                changed.append(i)
+            elif self.segments[i] != other.segments[i]:
+                changed.append(i)
+        return changed
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __iter__(self):
+        return iter(self.segments)
+
+    def __eq__(self, other):
+        if isinstance(other, NoteDocument):
+            return self.to_json() == other.to_json()
+        if isinstance(other, list):
+            return self.to_json() == other
+        return NotImplemented
+
+
+MERGE_MARKER = "\n--- Changed on disk while you were editing ---\n"
+
+
+def merge_documents(base, mine, theirs):
+    """
+    Segment-level three-way merge of two edits of base (base may be None).
+    A segment changed on one side only takes that side's version. When both
+    sides changed it, or segments were added/removed so indexes no longer
+    line up, mine is kept and their differing segments are appended after
+    MERGE_MARKER, so nothing from either side is lost.
+    Returns (merged document, number of their segments appended).
+    """
+    mine, theirs = list(mine), list(theirs)
+    base = list(base) if base is not None else None
+    merged, extra = [], []
+    if base is not None and len(base) == len(mine) == len(theirs):
+        for b, m, t in zip(base, mine, theirs):
+            if m == t or t == b:
+                merged.append(m.copy())
+            elif m == b:
+                merged.append(t.copy())
+            else:
+                merged.append(m.copy())
+                extra.append(t.copy())
+    else:
+        merged = [seg.copy() for seg in mine]
+        known = {_segment_key(seg) for seg in mine + (base or [])}
+        extra = [seg.copy() for seg in theirs if _segment_key(seg) not in known]
+    if extra:
+        merged.append(TextSegment(MERGE_MARKER))
+        merged.extend(extra)
+    return NoteDocument(merged), len(extra)
+
+
+def _segment_key(seg):
+    return json.dumps(seg.to_dict(), sort_keys=True)
@@ -0,0 +1,178 @@
+import json
+import queue
+import threading
+import time
+from note_document import NoteDocument, segment_from_dict, style_table_from
+from text_styles import StyleTable
+
+READ_CHUNK = 64 * 1024
+TICK_BUDGET_MS = 12  # Max time per after() tick spent inserting into the editor
+
+_DONE = object()
+_decoder = json.JSONDecoder()
+
+
+def iter_segments(f, chunk_size=READ_CHUNK):
+    """
+    Incrementally parses a note file (a JSON array of segment dicts).
+    Yields (segment_dict, offset) without loading the whole array first;
+    offset is the UTF-8 byte position just past the segment, so it compares
+    with the file size (open the file with newline="" to keep line endings).
+    """
+    buf = ""
+    pos = 0
+    counted = 0  # buf[:counted] is included in offset
+    offset = 0
+    eof = False
+    started = False
+
+    def fill():
+        nonlocal buf, pos, counted, offset, eof
+        offset += _utf8_len(buf[counted:pos])
+        counted = 0
+        # Read at least as much as is buffered so a huge segment is re-scanned only O(log n) times
+        chunk = f.read(max(chunk_size, len(buf) - pos))
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        # Skip whitespace, the opening bracket and separators
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            fill()
+        if pos >= len(buf):
+            if started:
+                raise ValueError("Unexpected end of note file")
+            return
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("Note file is not a JSON list")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+
+        try:
+            item, end = _decoder.raw_decode(buf, pos)
+        except ValueError:
+            if eof:
+                raise
+            fill()
+            continue
+        offset += _utf8_len(buf[counted:end])
+        counted = pos = end
+        yield item, offset
+
+
+def _utf8_len(text):
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+class NoteLoader:
+    """
+    Loads a note into a RichTextEditor without blocking the Tk thread.
+    A worker thread parses the file segment by segment; after() ticks move
+    parsed segments into the editor for at most TICK_BUDGET_MS each, so the
+    first screen shows up (and is editable) right away.
+    """
+    def __init__(self, editor, store, name, on_progress=None, on_done=None, on_error=None):
+        self.editor = editor
+        self.store = store
+        self.name = name
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.queue = queue.Queue(maxsize=2048)
+        self.cancelled = False
+        self.running = False
+        self.progress = 0.0
+        # Untouched copy of what was parsed (the editor's widgets mutate the originals), e.g. for NoteCache
+        self.document = NoteDocument()
+        self.after_id = None
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.editor.clear()
+        self.thread = threading.Thread(target=self._parse, daemon=True)
+        self.thread.start()
+        self.after_id = self.editor.after(1, self._tick)
+
+    def cancel(self):
+        if not self.running:
+            return
+        self.cancelled = True
+        self.running = False
+        if self.after_id is not None:
+            self.editor.after_cancel(self.after_id)
+            self.after_id = None
+        # Unblock the worker if it is waiting on a full queue
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _parse(self):
+        try:
+            styles = None
+            for item, done, total in self.store.iter_segments(self.name):
+                if self.cancelled:
+                    return
+                table = style_table_from(item)
+                if table is not None:
+                    styles = self.document.styles = table
+                    self._put(table)  # The editor keeps numbering styles the same way
+                    continue
+                seg = segment_from_dict(item, styles)
+                if seg is not None:
+                    self.document.append(seg.snapshot())
+                    self._put((seg, done / max(1, total)))
+            self._put(_DONE)
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self.cancelled:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _tick(self):
+        self.after_id = None
+        deadline = time.perf_counter() + TICK_BUDGET_MS / 1000.0
+        while self.running and time.perf_counter() < deadline:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self._handle(item)
+
+        if self.running:
+            if self.on_progress:
+                self.on_progress(self.progress)
+            self.after_id = self.editor.after(1, self._tick)
+
+    def _handle(self, item):
+        if item is _DONE:
+            self.running = False
+            self.progress = 1.0  # The closing bracket is never part of a segment's offset
+            if self.on_done:
+                self.on_done()
+        elif isinstance(item, StyleTable):
+            self.editor.styles = item
+        elif isinstance(item, Exception):
+            self.running = False
+            if self.on_error:
+                self.on_error(item)
+        else:
+            seg, self.progress = item
+            self.editor.append_segment(seg)
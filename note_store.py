@@ -0,0 +1,481 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from autosave import atomic_write_json
+from note_loader import iter_segments
+
+NOTE_EXT = ".json"
+TEXT_EXT = ".txt"  # Plain-text files in the folder are listed as read-only notes named with the extension
+JOURNAL_EXT = ".journal"
+JOURNAL_MIN_BYTES = 64 * 1024  # Journals smaller than this are never compacted
+JOURNAL_COMPACT_RATIO = 0.5  # ...otherwise compact once the journal exceeds this fraction of the base
+SAVED_CACHE_NOTES = 256  # Notes whose last read/written segment digests are kept as journal bases
+
+
+class NoteInfo:
+    def __init__(self, name, mtime, size):
+        self.name = name
+        self.mtime = mtime
+        self.size = size
+
+    def __repr__(self):
+        return f"NoteInfo({self.name!r}, mtime={self.mtime}, size={self.size})"
+
+
+class NoteStore:
+    """
+    Where notes live. StickyNotesApp only talks to this interface, so the
+    one-JSON-file-per-note folder and the SQLite database are interchangeable.
+    Note content is always the segment list from RichTextEditor.get_content_json.
+    """
+    def list_notes(self):
+        """Returns NoteInfo for every note, sorted by name."""
+        raise NotImplementedError
+
+    def exists(self, name):
+        raise NotImplementedError
+
+    def info(self, name):
+        """NoteInfo for a single note."""
+        raise NotImplementedError
+
+    def text_path(self, name):
+        """Path of a plain-text note (opened read-only in the text viewer), or None for ordinary notes."""
+        return None
+
+    def load(self, name):
+        return [item for item, done, total in self.iter_segments(name)]
+
+    def iter_segments(self, name):
+        """Yields (segment_dict, done, total) so callers can report progress."""
+        raise NotImplementedError
+
+    def save(self, name, content):
+        raise NotImplementedError
+
+    def rename(self, old_name, new_name):
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FolderNoteStore(NoteStore):
+    """
+    The original layout: one pretty-printed <name>.json per note in a folder.
+
+    Saves are journaled: once a note's base file has been read or written,
+    later saves only append the segments that changed to <name>.journal as
+    one JSON line {"length": n, "set": {index: segment}}. Loading replays the
+    journal over the base. When the journal grows past a fraction of the base
+    it is compacted: the folded note is written atomically as the new base,
+    then the journal is removed. A journal starts with a {"base": stamp} line
+    naming the base file it applies to, so one left behind by a crash between
+    those two steps, or by the base being replaced outside the app, is
+    dropped instead of replayed; a torn last line is ignored.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        # name -> (base mtime, [segment digest, ...]) as last read or written, least recently used first.
+        # Digests, not segments, and bounded: loading every note (search index sync) mustn't keep the corpus in memory
+        self.saved = OrderedDict()
+        self.lock = threading.RLock()  # Saves run on the autosave thread
+
+    def path_for(self, name):
+        return os.path.join(self.folder, name + NOTE_EXT)
+
+    def journal_path_for(self, name):
+        return os.path.join(self.folder, name + JOURNAL_EXT)
+
+    def list_notes(self):
+        notes = {}
+        journals = {}
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                # Dot-files are the app's own caches (catalog, search index)
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                if entry.name.endswith(NOTE_EXT):
+                    st = entry.stat()
+                    notes[entry.name[:-len(NOTE_EXT)]] = NoteInfo(entry.name[:-len(NOTE_EXT)], st.st_mtime, st.st_size)
+                elif entry.name.endswith(JOURNAL_EXT):
+                    journals[entry.name[:-len(JOURNAL_EXT)]] = entry.stat()
+                elif entry.name.endswith(TEXT_EXT):
+                    st = entry.stat()
+                    notes.setdefault(entry.name, NoteInfo(entry.name, st.st_mtime, st.st_size))
+        for name, st in journals.items():
+            info = notes.get(name)
+            if info is not None:
+                info.mtime = max(info.mtime, st.st_mtime)
+                info.size += st.st_size
+        return sorted(notes.values(), key=lambda info: info.name)
+
+    def text_path(self, name):
+        if not name.endswith(TEXT_EXT) or os.path.exists(self.path_for(name)):
+            return None
+        path = os.path.join(self.folder, name)
+        return path if os.path.isfile(path) else None
+
+    def exists(self, name):
+        return os.path.exists(self.path_for(name)) or self.text_path(name) is not None
+
+    def info(self, name):
+        text_path = self.text_path(name)
+        if text_path is not None:
+            st = os.stat(text_path)
+            return NoteInfo(name, st.st_mtime, st.st_size)
+        st = os.stat(self.path_for(name))
+        info = NoteInfo(name, st.st_mtime, st.st_size)
+        try:
+            jst = os.stat(self.journal_path_for(name))
+            info.mtime = max(info.mtime, jst.st_mtime)
+            info.size += jst.st_size
+        except FileNotFoundError:
+            pass
+        return info
+
+    def iter_segments(self, name):
+        path = self.path_for(name)
+        base_mtime = os.stat(path).st_mtime
+        if os.path.exists(self.journal_path_for(name)):
+            content = self._replay(name)
+            self._remember(name, base_mtime, [_digest(item) for item in content])
+            for i, item in enumerate(content):
+                yield item, i + 1, len(content)
+            return
+        total = max(1, os.path.getsize(path))
+        digests = []
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for item, offset in iter_segments(f):
+                digests.append(_digest(item))
+                yield item, offset, total
+        # Only a complete read can serve as the base for journaled saves
+        self._remember(name, base_mtime, digests)
+
+    def _remember(self, name, base_mtime, digests):
+        with self.lock:
+            self.saved[name] = (base_mtime, digests)
+            self.saved.move_to_end(name)
+            while len(self.saved) > SAVED_CACHE_NOTES:
+                self.saved.popitem(last=False)
+
+    def _replay(self, name):
+        with open(self.path_for(name), "r", encoding="utf-8") as f:
+            base_stamp = _stamp(os.fstat(f.fileno()))
+            content = json.load(f)
+        try:
+            f = open(self.journal_path_for(name), "r", encoding="utf-8", newline="")
+        except FileNotFoundError:
+            return content
+        good = 0
+        torn = False
+        stale = False
+        with f:
+            for line in f:
+                # Records always end in a newline; anything else is a torn write from a crash
+                # (its save never returned, so dropping it loses nothing that was acknowledged)
+                if not line.endswith("\n"):
+                    torn = True
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    torn = True
+                    break
+                if "base" in record:
+                    if record["base"] != base_stamp:
+                        stale = True  # Written against another base file
+                        break
+                else:
+                    _apply_record(content, record)
+                good += len(line.encode("utf-8"))
+        if stale:
+            # The header is the first line, so nothing was applied; the base alone is the note
+            with self.lock:
+                try:
+                    os.remove(self.journal_path_for(name))
+                except FileNotFoundError:
+                    pass
+        elif torn:
+            # Cut the partial record off so later appends start on a clean line
+            with self.lock, open(self.journal_path_for(name), "r+b") as f:
+                f.truncate(good)
+        return content
+
+    def save(self, name, content):
+        digests = [_digest(item) for item in content]
+        with self.lock:
+            saved = self.saved.get(name)
+            try:
+                st = os.stat(self.path_for(name))
+                base_mtime = st.st_mtime
+            except FileNotFoundError:
+                base_mtime = None
+            # No known base (or it was changed outside the app): write the whole note
+            if saved is None or saved[0] != base_mtime:
+                self._write_base(name, content, digests)
+                return
+            old = saved[1]
+            changes = {i: content[i] for i, digest in enumerate(digests) if i >= len(old) or old[i] != digest}
+            if not changes and len(old) == len(digests):
+                return
+            journal_path = self.journal_path_for(name)
+            line = json.dumps({"length": len(digests), "set": changes}, separators=(",", ":")) + "\n"
+            with open(journal_path, "a", encoding="utf-8") as f:
+                if f.tell() == 0:
+                    line = json.dumps({"base": _stamp(st)}) + "\n" + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._remember(name, base_mtime, digests)
+            if self._needs_compaction(name):
+                self._write_base(name, content, digests)
+
+    def _needs_compaction(self, name):
+        try:
+            journal_size = os.path.getsize(self.journal_path_for(name))
+            base_size = os.path.getsize(self.path_for(name))
+        except FileNotFoundError:
+            return False
+        return journal_size > max(JOURNAL_MIN_BYTES, base_size * JOURNAL_COMPACT_RATIO)
+
+    def _write_base(self, name, content, digests):
+        # New base first, journal second: a crash in between leaves a journal
+        # whose replay over the new base is a no-op
+        atomic_write_json(self.path_for(name), content)
+        try:
+            os.remove(self.journal_path_for(name))
+        except FileNotFoundError:
+            pass
+        self._remember(name, os.stat(self.path_for(name)).st_mtime, digests)
+
+    def compact(self, name):
+        """Folds the journal into the base file. Returns True if there was a journal."""
+        with self.lock:
+            if not os.path.exists(self.journal_path_for(name)):
+                return False
+            content = self._replay(name)
+            self._write_base(name, content, [_digest(item) for item in content])
+            return True
+
+    def compact_all(self):
+        count = 0
+        for name in self.journal_names():
+            if self.compact(name):
+                count += 1
+        return count
+
+    def journal_names(self):
+        """Names of the notes that have a journal (a directory scan, no stat per note)."""
+        with os.scandir(self.folder) as it:
+            return [entry.name[:-len(JOURNAL_EXT)] for entry in it
+                    if entry.name.endswith(JOURNAL_EXT) and not entry.name.startswith(".")]
+
+    def rename(self, old_name, new_name):
+        text_path = self.text_path(old_name)
+        if text_path is not None:
+            if not new_name.endswith(TEXT_EXT):
+                new_name += TEXT_EXT
+            new_path = os.path.join(self.folder, new_name)
+            if os.path.exists(new_path) or os.path.exists(self.path_for(new_name)):
+                raise FileExistsError(f"A note named '{new_name}' already exists")
+            os.rename(text_path, new_path)
+            return
+        new_path = self.path_for(new_name)
+        if os.path.exists(new_path):
+            raise FileExistsError(f"A note named '{new_name}' already exists")
+        with self.lock:
+            # Fold first so there is only one file to move
+            self.compact(old_name)
+            os.rename(self.path_for(old_name), new_path)
+            saved = self.saved.pop(old_name, None)
+            if saved is not None:
+                self._remember(new_name, *saved)
+
+    def delete(self, name):
+        text_path = self.text_path(name)
+        if text_path is not None:
+            os.remove(text_path)
+            return
+        with self.lock:
+            os.remove(self.path_for(name))
+            try:
+                os.remove(self.journal_path_for(name))
+            except FileNotFoundError:
+                pass
+            self.saved.pop(name, None)
+
+    def close(self):
+        # Leave plain .json files behind for anything else that reads the folder
+        try:
+            self.compact_all()
+        except OSError as e:
+            print(f"Could not compact note journals: {e}")
+
+
+def _encode(item):
+    return json.dumps(item, separators=(",", ":"), sort_keys=True)
+
+
+def _digest(item):
+    return hashlib.blake2b(_encode(item).encode("utf-8"), digest_size=16).digest()
+
+
+def _stamp(st):
+    """Identifies a base file version for its journal."""
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _apply_record(content, record):
+    length = record["length"]
+    del content[length:]
+    content.extend([None] * (length - len(content)))
+    for index, item in record["set"].items():
+        content[int(index)] = item
+    # A well-formed journal sets every new index; drop holes rather than crash
+    if None in content:
+        content[:] = [item for item in content if item is not None]
+
+
+class SqliteNoteStore(NoteStore):
+    """
+    All notes in one SQLite database (WAL mode), one row per segment.
+    Saving only rewrites the segments that actually changed.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Saves run on the autosave thread, everything else on the Tk thread
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS notes ("
+                " id INTEGER PRIMARY KEY,"
+                " name TEXT NOT NULL UNIQUE,"
+                " mtime REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400),"
+                " size INTEGER NOT NULL DEFAULT 0)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                " note_id INTEGER NOT NULL REFERENCES notes(id) ON DELETE CASCADE,"
+                " idx INTEGER NOT NULL,"
+                " data TEXT NOT NULL,"
+                " PRIMARY KEY (note_id, idx)) WITHOUT ROWID")
+
+    def _note_id(self, name):
+        row = self.conn.execute("SELECT id FROM notes WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No note named '{name}'")
+        return row[0]
+
+    def _touch(self, note_id):
+        self.conn.execute(
+            "UPDATE notes SET mtime = (julianday('now') - 2440587.5) * 86400,"
+            " size = (SELECT COALESCE(SUM(LENGTH(data)), 0) FROM segments WHERE note_id = ?)"
+            " WHERE id = ?", (note_id, note_id))
+
+    def list_notes(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT name, mtime, size FROM notes ORDER BY name").fetchall()
+        return [NoteInfo(*row) for row in rows]
+
+    def exists(self, name):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM notes WHERE name = ?", (name,)).fetchone() is not None
+
+    def info(self, name):
+        with self.lock:
+            row = self.conn.execute("SELECT name, mtime, size FROM notes WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No note named '{name}'")
+        return NoteInfo(*row)
+
+    def iter_segments(self, name):
+        with self.lock:
+            note_id = self._note_id(name)
+            rows = self.conn.execute("SELECT data FROM segments WHERE note_id = ? ORDER BY idx", (note_id,)).fetchall()
+        total = len(rows)
+        for i, (data,) in enumerate(rows):
+            yield json.loads(data), i + 1, total
+
+    def save(self, name, content):
+        new = [json.dumps(item, separators=(",", ":")) for item in content]
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO notes (name) VALUES (?)", (name,))
+            note_id = self._note_id(name)
+            old = dict(self.conn.execute("SELECT idx, data FROM segments WHERE note_id = ?", (note_id,)))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO segments (note_id, idx, data) VALUES (?, ?, ?)",
+                [(note_id, i, data) for i, data in enumerate(new) if old.get(i) != data])
+            self.conn.execute("DELETE FROM segments WHERE note_id = ? AND idx >= ?", (note_id, len(new)))
+            self._touch(note_id)
+
+    def rename(self, old_name, new_name):
+        with self.lock, self.conn:
+            if self.conn.execute("SELECT 1 FROM notes WHERE name = ?", (new_name,)).fetchone():
+                raise FileExistsError(f"A note named '{new_name}' already exists")
+            cur = self.conn.execute("UPDATE notes SET name = ? WHERE name = ?", (new_name, old_name))
+            if cur.rowcount == 0:
+                raise FileNotFoundError(f"No note named '{old_name}'")
+
+    def delete(self, name):
+        with self.lock, self.conn:
+            cur = self.conn.execute("DELETE FROM notes WHERE name = ?", (name,))
+            if cur.rowcount == 0:
+                raise FileNotFoundError(f"No note named '{name}'")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_store(location):
+    """A path ending in .db/.sqlite opens a SqliteNoteStore, anything else a FolderNoteStore."""
+    if location.endswith((".db", ".sqlite", ".sqlite3")):
+        return SqliteNoteStore(location)
+    return FolderNoteStore(location)
+
+
+def migrate_folder_to_sqlite(folder, db_path, overwrite=False):
+    """Copies every <name>.json note from folder into the database. Returns the number migrated."""
+    src = FolderNoteStore(folder)
+    dst = SqliteNoteStore(db_path)
+    count = 0
+    try:
+        for info in src.list_notes():
+            # Plain-text notes stay files in the folder; the database only holds segment notes
+            if src.text_path(info.name) is not None:
+                continue
+            if dst.exists(info.name) and not overwrite:
+                continue
+            dst.save(info.name, src.load(info.name))
+            count += 1
+    finally:
+        dst.close()
+    return count
+
+
+if __name__ == "__main__":
+    # python note_store.py migrate my_notes notes.db
+    # python note_store.py compact my_notes
+    if len(sys.argv) >= 4 and sys.argv[1] == "migrate":
+        n = migrate_folder_to_sqlite(sys.argv[2], sys.argv[3], overwrite="--overwrite" in sys.argv)
+        print(f"Migrated {n} notes into {sys.argv[3]}")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "compact":
+        n = FolderNoteStore(sys.argv[2]).compact_all()
+        print(f"Compacted {n} note journals in {sys.argv[2]}")
+    else:
+        print("Usage: python note_store.py migrate <notes_folder> <database.db> [--overwrite]")
+        print("       python note_store.py compact <notes_folder>")
+        sys.exit(1)
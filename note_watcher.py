@@ -0,0 +1,158 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from note_store import FolderNoteStore, NOTE_EXT, JOURNAL_EXT, TEXT_EXT
+
+DELIVER_MS = 250  # Changes are batched and handed to the Tk thread this often
+POLL_SECONDS = 2.0  # Scan interval when inotify isn't available
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+# IN_MODIFY is only acted on for plain-text notes: a log its writer keeps open never closes.
+# Notes written by the app (or a sync tool) are read once they are complete, on close/move.
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+_event = struct.Struct("iIII")
+
+
+def _load_inotify():
+    if not hasattr(os, "O_NONBLOCK"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def note_name_for(filename):
+    """Note name a file in the notes folder belongs to, or None for the app's own files."""
+    if filename.startswith("."):
+        return None
+    for ext in (NOTE_EXT, JOURNAL_EXT):
+        if filename.endswith(ext):
+            return filename[:-len(ext)]
+    if filename.endswith(TEXT_EXT):
+        return filename  # Plain-text notes are named with their extension
+    return None
+
+
+class NoteWatcher:
+    """
+    Reports notes changed on disk by anything (sync tools, other instances,
+    scripts) as sets of names, so the app can update single catalog entries
+    instead of re-scanning. Folder stores are watched with inotify where
+    available; otherwise the store's listing is polled and compared by
+    mtime/size. Changes are collected on a background thread and delivered
+    to on_change(names) on the Tk thread in batches; on_change may return
+    False to get the same names again with the next batch (e.g. while a
+    save is in flight). on_change(None) means "changes were lost, re-scan".
+    """
+    def __init__(self, root, store, on_change):
+        self.root = root
+        self.store = store
+        self.on_change = on_change
+        self.pending = set()
+        self.overflow = False
+        self.lock = threading.Lock()
+        self.running = False
+        self.after_id = None
+        self.fd = None
+        self.mode = None
+
+    def start(self):
+        self.running = True
+        libc = _load_inotify() if isinstance(self.store, FolderNoteStore) else None
+        if libc is not None:
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(self.store.folder), WATCH_MASK) >= 0:
+                self.fd = fd
+                self.mode = "inotify"
+                threading.Thread(target=self._read_events, daemon=True).start()
+            elif fd >= 0:
+                os.close(fd)
+        if self.fd is None:
+            self.mode = "poll"
+            threading.Thread(target=self._poll_store, daemon=True).start()
+        self.after_id = self.root.after(DELIVER_MS, self._deliver)
+
+    def stop(self):
+        self.running = False
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def _add(self, names):
+        with self.lock:
+            self.pending.update(names)
+
+    def _read_events(self):
+        fd = self.fd
+        try:
+            while self.running:
+                ready, _, _ = select.select([fd], [], [], 1.0)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                names = set()
+                offset = 0
+                while offset + _event.size <= len(data):
+                    wd, mask, cookie, length = _event.unpack_from(data, offset)
+                    offset += _event.size
+                    raw = data[offset:offset + length].rstrip(b"\0")
+                    offset += length
+                    if mask & IN_Q_OVERFLOW:
+                        self.overflow = True
+                        continue
+                    name = note_name_for(os.fsdecode(raw))
+                    if name is None or (mask & IN_MODIFY and not name.endswith(TEXT_EXT)):
+                        continue
+                    # A busy log fires on every write; the pending set and DELIVER_MS batching coalesce them
+                    names.add(name)
+                if names:
+                    self._add(names)
+        finally:
+            os.close(fd)
+
+    def _poll_store(self):
+        seen = self._scan()
+        while self.running:
+            time.sleep(POLL_SECONDS)
+            try:
+                now = self._scan()
+            except OSError:
+                continue
+            changed = {name for name, stat in now.items() if seen.get(name) != stat}
+            changed.update(name for name in seen if name not in now)
+            seen = now
+            if changed:
+                self._add(changed)
+
+    def _scan(self):
+        return {info.name: (info.mtime, info.size) for info in self.store.list_notes()}
+
+    def _deliver(self):
+        self.after_id = None
+        if not self.running:
+            return
+        with self.lock:
+            names, self.pending = self.pending, set()
+            overflow, self.overflow = self.overflow, False
+        if overflow:
+            self.on_change(None)
+        elif names and self.on_change(names) is False:
+            self._add(names)
+        self.after_id = self.root.after(DELIVER_MS, self._deliver)
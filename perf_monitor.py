@@ -0,0 +1,211 @@
+"""
+Opt-in instrumentation for finding UI stutters.
+
+Set STICKY_PERF=<file.json> to have timings and counters dumped there every
+few seconds and on exit, and/or STICKY_PERF_OVERLAY=1 for a small always-on-
+top window with the live numbers. A heartbeat measures how late Tk runs an
+after() callback ("event_loop.lag"), i.e. how long the UI thread was busy.
+
+Both are read once at import: when neither is set, timed() returns the
+function unchanged and count() returns straight away, so the hooks cost
+nothing in normal use.
+"""
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+DUMP_PATH = os.environ.get("STICKY_PERF", "")
+OVERLAY = os.environ.get("STICKY_PERF_OVERLAY", "") not in ("", "0")
+ENABLED = bool(DUMP_PATH) or OVERLAY
+
+RING_SIZE = 1024  # Recent samples kept per timing (percentiles are over these)
+BUCKETS_MS = (1, 2, 4, 8, 16, 33, 50, 100, 250, 500, 1000)  # Histogram upper bounds; one more bucket above
+HEARTBEAT_MS = 50
+DUMP_SECONDS = 10
+OVERLAY_MS = 500
+OVERLAY_ROWS = 8
+
+now = time.perf_counter
+
+
+class RingBuffer:
+    """Last RING_SIZE samples (ms) in a fixed array, plus all-time count/total/max and histogram."""
+    __slots__ = ("samples", "pos", "count", "total", "max", "histogram")
+
+    def __init__(self, size=RING_SIZE):
+        self.samples = array("d", bytes(8 * size))
+        self.pos = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms):
+        self.samples[self.pos] = ms
+        self.pos = (self.pos + 1) % len(self.samples)
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.histogram[bisect_left(BUCKETS_MS, ms)] += 1
+
+    def recent(self):
+        if self.count < len(self.samples):
+            return self.samples[:self.count].tolist()
+        return self.samples.tolist()
+
+    def summary(self):
+        recent = sorted(self.recent())
+
+        def pct(p):
+            return round(recent[int(p * (len(recent) - 1))], 3) if recent else 0.0
+
+        labels = [f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+        return {"count": self.count, "total_ms": round(self.total, 3), "max_ms": round(self.max, 3),
+                "p50_ms": pct(0.5), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+                "histogram": {label: n for label, n in zip(labels, self.histogram) if n}}
+
+
+timings = {}  # name -> RingBuffer
+counters = {}  # name -> int
+lock = threading.Lock()  # Hooks also fire on the autosave and loader threads
+dump_lock = threading.Lock()  # Held while a dump is being written
+
+
+def record(name, ms):
+    with lock:
+        ring = timings.get(name)
+        if ring is None:
+            ring = timings[name] = RingBuffer()
+        ring.add(ms)
+
+
+def count(name, n=1):
+    if not ENABLED:
+        return
+    with lock:
+        counters[name] = counters.get(name, 0) + n
+
+
+def timed(name):
+    """Decorator recording each call's duration under name (a no-op when instrumentation is off)."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        def wrapper(*args, **kwargs):
+            start = now()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, (now() - start) * 1000)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        return wrapper
+    return decorate
+
+
+def summary():
+    with lock:
+        return {"timings": {name: ring.summary() for name, ring in sorted(timings.items())},
+                "counters": dict(sorted(counters.items()))}
+
+
+def dump(path=None, background=False):
+    """
+    Writes summary() as JSON. background=True (the periodic dumps) does the
+    write and fsync on a thread, so it doesn't show up as event loop lag;
+    a dump still in progress makes the next one skip.
+    """
+    path = path or DUMP_PATH
+    if not path:
+        return
+    data = summary()
+    data["written"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    if not background:
+        with dump_lock:
+            _write(path, data)
+    elif dump_lock.acquire(blocking=False):
+        threading.Thread(target=_write, args=(path, data, dump_lock), daemon=True).start()
+
+
+def _write(path, data, release=None):
+    from autosave import atomic_write_json
+    try:
+        atomic_write_json(path, data)
+    except OSError as e:
+        print(f"Could not write performance data: {e}")
+    finally:
+        if release is not None:
+            release.release()
+
+
+class PerfMonitor:
+    """Heartbeat, periodic dump and optional overlay for one Tk root."""
+    def __init__(self, root):
+        self.root = root
+        self.expected = now() + HEARTBEAT_MS / 1000
+        self.next_dump = time.monotonic() + DUMP_SECONDS
+        self.overlay = None
+        self.label = None
+        self.after_ids = [root.after(HEARTBEAT_MS, self.beat)]
+        if OVERLAY:
+            self.show_overlay()
+
+    def beat(self):
+        t = now()
+        record("event_loop.lag", max(0.0, (t - self.expected) * 1000))
+        self.expected = t + HEARTBEAT_MS / 1000
+        self.after_ids[0] = self.root.after(HEARTBEAT_MS, self.beat)
+        if DUMP_PATH and time.monotonic() >= self.next_dump:
+            self.next_dump = time.monotonic() + DUMP_SECONDS
+            dump(background=True)
+
+    def show_overlay(self):
+        import tkinter as tk
+        from theme_manager import style
+        self.overlay = tk.Toplevel(self.root)
+        self.overlay.title("Performance")
+        self.overlay.attributes("-topmost", True)
+        self.overlay.protocol("WM_DELETE_WINDOW", self.hide_overlay)
+        self.label = style(tk.Label(self.overlay, font=("Consolas", 9), justify="left", anchor="nw"), "panel_label")
+        self.label.pack(fill="both", expand=True, padx=6, pady=4)
+        self.after_ids.append(self.root.after(OVERLAY_MS, self.refresh_overlay))
+
+    def hide_overlay(self):
+        if self.overlay is not None:
+            self.overlay.destroy()
+            self.overlay = None
+
+    def refresh_overlay(self):
+        if self.overlay is None:
+            return
+        data = summary()
+        stats = data["timings"]
+        lines = [f"{'':24} {'n':>6} {'p50':>7} {'p95':>7} {'max':>7}"]
+        lag = stats.pop("event_loop.lag", None)
+        rows = sorted(stats.items(), key=lambda item: item[1]["p95_ms"], reverse=True)[:OVERLAY_ROWS]
+        for name, s in ([("event_loop.lag", lag)] if lag else []) + rows:
+            lines.append(f"{name[:24]:24} {s['count']:>6} {s['p50_ms']:>7.1f} {s['p95_ms']:>7.1f} {s['max_ms']:>7.1f}")
+        if data["counters"]:
+            lines.append("")
+            lines.extend(f"{name[:24]:24} {n:>6}" for name, n in data["counters"].items())
+        self.label.configure(text="\n".join(lines))
+        self.after_ids[-1] = self.root.after(OVERLAY_MS, self.refresh_overlay)
+
+    def stop(self):
+        for after_id in self.after_ids:
+            self.root.after_cancel(after_id)
+        self.after_ids = []
+        self.hide_overlay()
+        dump()
+
+
+def install(root):
+    """Starts monitoring root's event loop. Returns the PerfMonitor, or None when instrumentation is off."""
+    if not ENABLED:
+        return None
+    return PerfMonitor(root)
@@ -1,106 +1,520 @@
+import re
 import tkinter as tk
-from tkinter import messagebox
-from widgets import CardWidget, TableWidget
+import tkinter.font as tkfont
+from contextlib import contextmanager
+from widgets import CardWidget, TableWidget, EmbedPlaceholder, WidgetPool
+from note_document import NoteDocument, TextSegment, CardSegment, TableSegment, split_text
+from layout import LayoutScheduler
+from undo_history import UndoHistory, TextEditOp, FieldOp, StringDeltaOp, EmbedOp, FormatOp, UNDO_MAX_STEPS
+from text_styles import (StyleTable, BOLD, ITALIC, UNDERLINE, OVERSTRIKE, HEADINGS, COLOR_PREFIX, PLAIN,
+                         style_with, style_without, style_with_heading, style_with_color)
+
+STYLE_TAG_PREFIX = "style:"
+# Tcl 8.6 counts characters outside the BMP as two index positions
+_ASTRAL = re.compile("[\U00010000-\U0010FFFF]")
+ASTRAL_WIDTH = 2 if tk.TclVersion < 8.7 else 1
+DELETE_END_MARK = "embed_delete_end"
+
+# Every Tk-level delete/replace (key bindings, cut, typing over a selection,
+# Python calls) passes through the guard first, which may re-index it
+_PROXY_PROC = """
+proc ::rich_text_proxy {orig guard args} {
+    if {[lindex $args 0] in {delete replace}} {
+        set args [$guard {*}$args]
+    }
+    uplevel 1 [list $orig {*}$args]
+}
+"""
 
 class RichTextEditor(tk.Text):
     def __init__(self, parent, **kwargs):
         super().__init__(parent, **kwargs)
         self.widgets = {}  # Map window name -> Widget instance
+        self.pool = WidgetPool(self)  # Cards/tables of previously shown content, reused for new segments
+
+        # Dirty tracking: every text or widget edit bumps change_count,
+        # mark_saved() remembers the value at the last save/load.
+        self.change_count = 0
+        self.saved_change_count = 0
+        self.generation = 0  # Bumped whenever the editor is cleared for another note
+        self.on_change = None  # Optional callback, e.g. to schedule an autosave
+        self.bind("<<Modified>>", self.on_modified)
+
+        # Undo: Tk's native stack holds text edits (we place the separators),
+        # self.history orders them with card/table operations.
+        self.history = UndoHistory()
+        # Embed resizes, table rebuilds and redraws are applied once per frame
+        self.layout = LayoutScheduler(self)
+        self.configure(undo=True, autoseparators=False, maxundo=UNDO_MAX_STEPS)
+        self.bind("<<Undo>>", lambda e: self.undo() or "break")
+        self.bind("<<Redo>>", lambda e: self.redo() or "break")
+
+        # Formatting: each distinct style (text_styles) is one Tk tag, so a run of text carries exactly one
+        self.tag_for_style = {}
+        self.style_for_tag = {}
+        self.style_fonts = {}  # Fonts must stay referenced while tags use them
+        self.styles = StyleTable()  # Style ids of the open note, reused when it is saved (see NoteDocument.styles)
+        self.bind("<Control-b>", lambda e: self.toggle_format(BOLD) or "break")
+        self.bind("<Control-i>", lambda e: self.toggle_format(ITALIC) or "break")
+        self.bind("<Control-u>", lambda e: self.toggle_format(UNDERLINE) or "break")
+
+        # Route the widget command through guard_delete (see _PROXY_PROC)
+        if not self.tk.call("info", "procs", "::rich_text_proxy"):
+            self.tk.eval(_PROXY_PROC)
+        self.text_command = self._w + "_text"
+        self.tk.call("rename", self._w, self.text_command)
+        self.tk.call("interp", "alias", "", self._w, "", "::rich_text_proxy",
+                     self.text_command, self.register(self.guard_delete))
+
+    def destroy(self):
+        # Tk removes the renamed widget command itself; the alias is ours
+        try:
+            self.tk.call("interp", "alias", "", self._w, "")
+        except tk.TclError:
+            pass
+        super().destroy()
+
+    def guard_delete(self, op, *args):
+        """
+        Runs before every delete/replace and returns the arguments to run it with.
+        Tk's native undo would restore the text of a user delete but not the
+        cards/tables in it (leaving every later index one off) nor its formatting.
+        Those embeds are removed first and recorded with the step along with the
+        formatting of the remaining range, then the (re-indexed) text delete runs.
+        """
+        try:
+            if self.history.replaying or not self.tk.getboolean(self.cget("undo")):
+                return (op,) + args  # Our own untracked change, or Tk replaying its undo stack
+            if op == "delete" and len(args) > 2:
+                return (op,) + args  # Several ranges at once; Tk's bindings never do this
+            start = self.index(args[0])
+            end = self.index(args[1]) if len(args) > 1 else self.index(f"{start}+1c")
+            if not self.compare(start, "<", end):
+                return (op,) + args
+            windows = [(index, name) for key, name, index in self.dump(start, end, window=True)]
+            embeds = []
+            if windows:
+                self.mark_set(DELETE_END_MARK, end)
+                for index, name in reversed(windows):
+                    widget = self.widgets.get(name)
+                    if widget is not None:
+                        embeds.append((index, widget.segment))
+                        self.remove_embed_at(index)
+                end = self.index(DELETE_END_MARK)
+                self.mark_unset(DELETE_END_MARK)
+            runs = self.style_runs(start, end) if self.style_for_tag else []
+            fmt = (start, end, runs) if any(style for s, e, style in runs) else None
+            if not embeds and fmt is None:
+                return (op,) + args
+            # The text delete's own group joins this step when <<Modified>> comes in
+            self.history.push(TextEditOp(self, embeds, groups=0, format=fmt))
+            return (op, start, end) + args[2:]
+        except tk.TclError as e:
+            print(f"Could not record deleted embeds/formatting: {e}")
+            return (op,) + args
 
     def insert_card(self):
         try:
             card = CardWidget(self, width=200, height=120)
-            self.window_create("insert", window=card, padx=5, pady=5)
-            self.widgets[str(card)] = card
+            self.insert_embed(card, "insert", padx=5, pady=5)
         except Exception as e:
+            from tkinter import messagebox
             messagebox.showerror("Error", f"Failed to insert card: {e}")
 
     def insert_table(self):
         try:
             # Create default 3x3 table immediately
             table = TableWidget(self, rows=3, cols=3, cell_width=10, align="center", width=300, height=150)
-            self.window_create("insert", window=table, padx=0, pady=2)
-            self.widgets[str(table)] = table
+            self.insert_embed(table, "insert", padx=0, pady=2)
         except Exception as e:
+            from tkinter import messagebox
             messagebox.showerror("Error", f"Failed to insert table: {e}")
 
-    def get_content_json(self):
+    def insert_embed(self, widget, index, **options):
+        with self.untracked():
+            self.window_create(index, window=widget, **options)
+        self.widgets[str(widget)] = widget
+        self.history.push(EmbedOp(self, widget.segment, self.index(str(widget)), inserted=True))
+        self.changed()
+
+    @contextmanager
+    def untracked(self):
+        """Text changes made inside are neither user edits nor part of Tk's undo stack."""
+        was_modified = self.edit_modified()
+        self.configure(undo=False)
+        try:
+            yield
+        finally:
+            self.configure(undo=True)
+            if not was_modified:
+                self.edit_modified(False)
+
+    def on_modified(self, event):
+        # <<Modified>> only fires when the flag flips, so count and reset it
+        if self.edit_modified():
+            self.edit_modified(False)
+            # Close Tk's undo group for this edit; TextEditOp coalesces groups into typing bursts
+            self.edit_separator()
+            self.history.push(TextEditOp(self))
+            self.changed()
+
+    def undo(self):
+        self.history.undo()
+
+    def redo(self):
+        self.history.redo()
+
+    def native_undo(self):
+        with self.untracked_flag():
+            try:
+                self.edit_undo()
+            except tk.TclError:
+                pass  # Tk already dropped this group (maxundo)
+        self.changed()
+
+    def native_redo(self):
+        with self.untracked_flag():
+            try:
+                self.edit_redo()
+            except tk.TclError:
+                pass
+        self.changed()
+
+    @contextmanager
+    def untracked_flag(self):
+        # Like untracked(), but keeps Tk's undo stack recording (needed for edit_undo/edit_redo)
+        was_modified = self.edit_modified()
+        try:
+            yield
+        finally:
+            if not was_modified:
+                self.edit_modified(False)
+
+    def record_field(self, segment, field, old, new):
+        # Long strings are stored as deltas, everything else as old/new values
+        if field == "content":
+            self.history.push(StringDeltaOp(self, segment, field, old, new))
+        else:
+            self.history.push(FieldOp(self, segment, field, old, new))
+
+    def find_widget(self, segment):
+        for widget in self.widgets.values():
+            if widget.segment is segment:
+                return widget
+        return None
+
+    def apply_field(self, segment, field, value):
+        widget = self.find_widget(segment)
+        if widget is not None and hasattr(widget, "set_field"):
+            widget.set_field(field, value)
+
+    def delete_embed(self, widget):
+        """Removes a card/table (from its context menu) as an undoable step."""
+        index = self.index(str(widget))
+        self.history.push(EmbedOp(self, widget.segment, index, inserted=False))
+        self.remove_embed_at(index)
+
+    def remove_embed_at(self, index):
+        self.layout.flush()  # Pending resizes belong to this segment, not whatever the widget shows next
+        name = self.window_cget(index, "window")
+        widget = self.widgets.pop(name, None)
+        if widget is not None:
+            self.detach_embed(index)
+        with self.untracked():
+            self.delete(index)
+        # Undo embeds a widget for the segment again (see EmbedOp/TextEditOp)
+        if widget is not None:
+            self.pool.release(widget)
+        self.changed()
+
+    def detach_embed(self, index):
+        """Takes the widget out of the embed at index, so deleting the embed unmaps it instead of destroying it."""
+        self.window_configure(index, window="")
+
+    def insert_embed_at(self, index, segment):
+        widget = self.pool.acquire(segment)
+        with self.untracked():
+            self.window_create(index, window=widget, padx=5, pady=5)
+        self.widgets[str(widget)] = widget
+        self.changed()
+
+    def replace_embed(self, widget):
+        """Rebuilds an embed with the widget class its segment now needs (e.g. a table grown past the virtual threshold)."""
+        name = str(widget)
+        if self.widgets.get(name) is not widget:
+            return
+        index = self.index(name)
+        replacement = self.pool.acquire(widget.segment)
+        self.detach_embed(index)
+        # Same segment, new widget: not a user edit
+        with self.untracked():
+            self.delete(index)
+            self.window_create(index, window=replacement, padx=5, pady=5)
+        del self.widgets[name]
+        self.widgets[str(replacement)] = replacement
+        self.pool.release(widget)
+
+    # ---------------- Formatting ----------------
+
+    def style_tag(self, style):
+        tag = self.tag_for_style.get(style)
+        if tag is None:
+            tag = STYLE_TAG_PREFIX + "|".join(style)
+            self.tag_configure(tag, **self.style_options(style))
+            self.tag_lower(tag, "sel")
+            self.tag_for_style[style] = tag
+            self.style_for_tag[tag] = style
+        return tag
+
+    def style_options(self, style):
+        base = tkfont.Font(font=self.cget("font")).actual()
+        size, weight, slant = base["size"], "normal", "roman"
+        options = {}
+        for name in style:
+            if name == BOLD:
+                weight = "bold"
+            elif name == ITALIC:
+                slant = "italic"
+            elif name == UNDERLINE:
+                options["underline"] = True
+            elif name == OVERSTRIKE:
+                options["overstrike"] = True
+            elif name in HEADINGS:
+                size, weight = round(base["size"] * HEADINGS[name]), "bold"
+            elif name.startswith(COLOR_PREFIX):
+                options["foreground"] = name[len(COLOR_PREFIX):]
+        font = self.style_fonts[style] = tkfont.Font(family=base["family"], size=size, weight=weight, slant=slant)
+        options["font"] = font
+        return options
+
+    def style_runs(self, start, end):
+        """[(start, end, style), ...] covering start..end, split wherever the formatting changes."""
+        start, end = self.index(start), self.index(end)
+        current = next((t for t in self.tag_names(start) if t in self.style_for_tag), None)
+        runs = []
+        pos = start
+        for key, tag, index in self.dump(start, end, tag=True):
+            if tag not in self.style_for_tag or (key == "tagoff" and tag != current):
+                continue
+            if self.compare(index, ">", pos):
+                runs.append((pos, index, self.style_for_tag.get(current, PLAIN)))
+                pos = index
+            current = tag if key == "tagon" else None
+        if self.compare(pos, "<", end):
+            runs.append((pos, end, self.style_for_tag.get(current, PLAIN)))
+        return runs
+
+    def apply_runs(self, start, end, runs):
+        """Sets the formatting of start..end to runs, with one tag_add per style."""
+        for tag in self.style_for_tag:
+            self.tag_remove(tag, start, end)
+        ranges = {}
+        for s, e, style in runs:
+            if style:
+                ranges.setdefault(self.style_tag(style), []).extend((s, e))
+        for tag, indexes in ranges.items():
+            self.tag_add(tag, *indexes)
+        self.changed()
+
+    def format_range(self, start, end, change):
+        """Restyles every run in start..end with change(style) -> style, as one undo step."""
+        start, end = self.index(start), self.index(end)
+        if not self.compare(start, "<", end):
+            return
+        old = self.style_runs(start, end)
+        new = [(s, e, change(style)) for s, e, style in old]
+        if new == old:
+            return
+        self.apply_runs(start, end, new)
+        self.history.push(FormatOp(self, start, end, old, new))
+
+    def selection(self):
+        try:
+            return self.index("sel.first"), self.index("sel.last")
+        except tk.TclError:
+            return None
+
+    def toggle_format(self, name):
+        """Bold/italic/underline/overstrike on the selection; off if all of it already has it."""
+        sel = self.selection()
+        if sel is None:
+            return
+        has = all(name in style for s, e, style in self.style_runs(*sel))
+        self.format_range(*sel, lambda style: style_without(style, name) if has else style_with(style, name))
+
+    def set_heading(self, heading):
+        """Makes the lines of the selection (or the cursor's line) a heading ("h1", "h2"), or plain with None."""
+        first, last = self.selection() or ("insert", "insert")
+        self.format_range(f"{first} linestart", f"{last} lineend", lambda style: style_with_heading(style, heading))
+
+    def set_color(self, color):
+        sel = self.selection()
+        if sel is not None:
+            self.format_range(*sel, lambda style: style_with_color(style, color))
+
+    def choose_color(self):
+        from tkinter import colorchooser
+        sel = self.selection()
+        if sel is None:
+            return
+        color = colorchooser.askcolor(title="Text Color", parent=self)[1]
+        if color:
+            self.format_range(*sel, lambda style: style_with_color(style, color))
+
+    def clear_formatting(self):
+        sel = self.selection()
+        if sel is not None:
+            self.format_range(*sel, lambda style: PLAIN)
+
+    def insert_spans(self, start, content, spans):
+        """Tags freshly inserted content (starting at index start) with its spans, one tag_add per style."""
+        line, col = map(int, start.split("."))
+        astral = ASTRAL_WIDTH > 1 and not content.isascii()
+        ranges = {}
+        pos = 0
+        for length, style in spans:
+            text = content[pos:pos + length]
+            pos += length
+            s = f"{line}.{col}"
+            newlines = text.count("\n")
+            if newlines:
+                line += newlines
+                tail = text[text.rfind("\n") + 1:]
+                col = len(tail) + (len(_ASTRAL.findall(tail)) if astral else 0)
+            else:
+                col += len(text) + (len(_ASTRAL.findall(text)) if astral else 0)
+            if style:
+                ranges.setdefault(self.style_tag(style), []).extend((s, f"{line}.{col}"))
+        for tag, indexes in ranges.items():
+            self.tag_add(tag, *indexes)
+
+    def note_widget_changed(self, widget):
+        self.changed()
+
+    def changed(self):
+        self.change_count += 1
+        if self.on_change is not None:
+            self.on_change()
+
+    def is_modified(self):
+        return self.change_count != self.saved_change_count
+
+    def mark_saved(self, change_count=None):
+        """Records the content as saved, optionally as of an earlier snapshot's change_count."""
+        self.saved_change_count = self.change_count if change_count is None else change_count
+
+    def clear(self):
+        self.layout.flush()  # Finish pending resizes before the widgets go away
+        # Deleting an embed destroys its window: detach the real widgets first and park them for the next note
+        for name, widget in self.widgets.items():
+            if not isinstance(widget, EmbedPlaceholder):
+                self.detach_embed(name)
+        with self.untracked():
+            self.delete("1.0", tk.END)
+        for widget in self.widgets.values():
+            if isinstance(widget, EmbedPlaceholder):
+                widget.destroy()
+            else:
+                self.pool.release(widget)
+        self.widgets.clear()
+        self.styles = StyleTable()
+        self.edit_modified(False)
+        self.edit_reset()
+        self.history.clear()
+        self.generation += 1
+        self.mark_saved()
+
+    def get_document(self):
         """
-        Serializes the content into a list of segments.
-        Each segment is either {"type": "text", "content": "..."} or a widget dict.
+        Returns a NoteDocument for the current content.
+        Embedded widgets keep their segments up to date as they are edited,
+        so this only walks the text dump, never the widgets' own children.
         """
-        content = []
+        self.layout.flush()
+        doc = NoteDocument(styles=self.styles)
         
         # We use 'dump' to get everything in order
         # dump returns tuples: (key, value, index)
         # key is 'text', 'mark', 'tagon', 'tagoff', 'window', 'image'
         try:
             # "1.0" to "end-1c" (exclude trailing newline)
-            elements = self.dump("1.0", "end-1c", text=True, window=True)
-            
-            if not elements:
-                return []
+            elements = self.dump("1.0", "end-1c", text=True, window=True, tag=True)
+
+            # Text comes in many chunks (per line and per tag change); the text
+            # between two embeds is joined and saved as a few TextSegments with run-length spans
+            parts, spans = [], []
+            style = PLAIN
+
+            def flush():
+                if parts:
+                    for seg in split_text("".join(parts), spans):
+                        doc.append(seg)
+                    parts.clear()
+                    spans.clear()
 
             for key, value, index in elements:
                 if key == "text":
-                    content.append({"type": "text", "content": value})
+                    parts.append(value)
+                    spans.append((len(value), style))
+                elif key == "tagon":
+                    style = self.style_for_tag.get(value, style)
+                elif key == "tagoff":
+                    if self.style_for_tag.get(value) is style:
+                        style = PLAIN
                 elif key == "window":
-                    # value is the window name (string path)
-                    # We need to find the widget object
-                    # Tkinter widget paths are unique strings.
-                    # We stored mapping in self.widgets, BUT window names might change or be tricky.
-                    # Best way: self.nametowidget(value)
-                    try:
-                        widget = self.nametowidget(value)
-                        if isinstance(widget, (CardWidget, TableWidget)):
-                            content.append(widget.get_data())
-                    except KeyError:
-                        pass # Widget might have been destroyed but still in dump? Unlikely.
+                    flush()
+                    # value is the window path name, which is the key in self.widgets
+                    widget = self.widgets.get(value)
+                    if widget is not None:
+                        doc.append(widget.segment)
+            flush()
         except Exception as e:
             print(f"Error saving: {e}")
-            
-        return content
+
+        return doc
+
+    def get_content_json(self):
+        """
+        Serializes the content into a list of segments.
+        Each segment is either {"type": "text", "content": "..."} or a widget dict.
+        """
+        return self.get_document().to_json()
 
     def load_content_json(self, content_list):
-        self.delete("1.0", tk.END)
-        self.widgets.clear()
-        
-        if not content_list:
-            return
+        self.load_document(NoteDocument.from_json(content_list))
+
+    def load_document(self, doc):
+        self.clear()
+        if doc.styles is not None:
+            self.styles = doc.styles
+        for seg in doc:
+            self.append_segment(seg)
+
+    def append_segment(self, seg):
+        """Appends one segment at the end without counting it as a user edit."""
+        with self.untracked():
+            if isinstance(seg, TextSegment):
+                start = self.index("end-1c")
+                self.insert("end", seg.content)
+                if seg.spans:
+                    self.insert_spans(start, seg.content, seg.spans)
+            elif isinstance(seg, (CardSegment, TableSegment)):
+                # Real widgets are only built once the embed scrolls into view
+                placeholder = EmbedPlaceholder(self, seg)
+                self.window_create("end", window=placeholder, padx=5, pady=5)
+                self.widgets[str(placeholder)] = placeholder
 
-        for item in content_list:
-            if item.get("type") == "text":
-                self.insert("end", item.get("content", ""))
-            elif item.get("type") == "card":
-                card = CardWidget(
-                    self, 
-                    title=item.get("title", ""), 
-                    content=item.get("content", ""),
-                    bg=item.get("bg", "#333333"),
-                    width=item.get("width", 200),
-                    height=item.get("height", 120)
-                )
-                self.window_create("end", window=card, padx=5, pady=5)
-                self.widgets[str(card)] = card
-            elif item.get("type") == "table":
-                table = TableWidget(
-                    self,
-                    rows=item.get("rows", 3),
-                    cols=item.get("cols", 3),
-                    cell_width=item.get("cell_width", 10),
-                    align=item.get("align", "center"),
-                    width=item.get("width", 300),
-                    height=item.get("height", 150),
-                    bg=item.get("bg", "gray")
-                )
-                # Restore cell data
-                saved_data = item.get("data", [])
-                if saved_data:
-                    for r, row_vals in enumerate(saved_data):
-                        if r < len(table.cells):
-                            for c, val in enumerate(row_vals):
-                                if c < len(table.cells[r]):
-                                    table.cells[r][c].insert(0, val)
-                
-                self.window_create("end", window=table, padx=5, pady=5)
-                self.widgets[str(table)] = table
+    def materialize(self, placeholder):
+        """Replaces a placeholder with the real CardWidget/TableWidget at the same index."""
+        name = str(placeholder)
+        if self.widgets.get(name) is not placeholder:
+            return  # Already replaced, or the note was reloaded
+        index = self.index(name)
+        widget = self.pool.acquire(placeholder.segment)
+        # Swapping in the widget is not a user edit
+        with self.untracked():
+            self.delete(index)
+            self.window_create(index, window=widget, padx=5, pady=5)
+        del self.widgets[name]
+        self.widgets[str(widget)] = widget
+        placeholder.destroy()
@@ -0,0 +1,120 @@
+import os
+import re
+import sqlite3
+import threading
+from note_document import NoteDocument
+
+SNIPPET_TOKENS = 10
+_token_re = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchResult:
+    def __init__(self, name, snippet, rank):
+        self.name = name
+        self.snippet = snippet
+        self.rank = rank
+
+    def __repr__(self):
+        return f"SearchResult({self.name!r}, {self.snippet!r})"
+
+
+def index_path_for(location):
+    """Where the index lives for a notes folder or a SQLite notes database."""
+    if os.path.isdir(location):
+        return os.path.join(location, ".search_index.db")
+    return os.path.splitext(location)[0] + ".search.db"
+
+
+def build_query(text):
+    """Turns user input into an FTS5 query: every word must match as a prefix (search-as-you-type)."""
+    words = _token_re.findall(text)
+    if not words:
+        return None
+    return " ".join('"%s"*' % w for w in words)
+
+
+class SearchIndex:
+    """
+    Persistent full-text index over all notes (SQLite FTS5).
+    Text segments, card titles/bodies and table cells are indexed via
+    NoteDocument.text(). Notes are re-indexed one at a time as they are
+    saved, renamed or deleted, so queries never touch the note files.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Updates come from the autosave thread, queries from the Tk thread
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS note_text USING fts5(name, body, tokenize='unicode61')")
+            # name -> FTS rowid, so updates never have to scan the full-text table
+            self.conn.execute("CREATE TABLE IF NOT EXISTS indexed (name TEXT PRIMARY KEY, docid INTEGER NOT NULL, mtime REAL NOT NULL)")
+
+    def _docid(self, name):
+        row = self.conn.execute("SELECT docid FROM indexed WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def index_note(self, name, content, mtime=0.0):
+        body = NoteDocument.from_json(content).text()
+        with self.lock, self.conn:
+            docid = self._docid(name)
+            if docid is not None:
+                self.conn.execute("DELETE FROM note_text WHERE rowid = ?", (docid,))
+            docid = self.conn.execute("INSERT INTO note_text (name, body) VALUES (?, ?)", (name, body)).lastrowid
+            self.conn.execute("INSERT OR REPLACE INTO indexed (name, docid, mtime) VALUES (?, ?, ?)", (name, docid, mtime))
+
+    def remove_note(self, name):
+        with self.lock, self.conn:
+            docid = self._docid(name)
+            if docid is not None:
+                self.conn.execute("DELETE FROM note_text WHERE rowid = ?", (docid,))
+                self.conn.execute("DELETE FROM indexed WHERE name = ?", (name,))
+
+    def rename_note(self, old_name, new_name):
+        with self.lock, self.conn:
+            docid = self._docid(old_name)
+            if docid is not None:
+                self.conn.execute("UPDATE note_text SET name = ? WHERE rowid = ?", (new_name, docid))
+                self.conn.execute("UPDATE indexed SET name = ? WHERE name = ?", (new_name, old_name))
+
+    def sync(self, store):
+        """
+        Brings the index up to date with the store: only notes that are new or
+        whose mtime changed since they were indexed get parsed. Returns the
+        number of notes (re)indexed.
+        """
+        with self.lock:
+            known = dict(self.conn.execute("SELECT name, mtime FROM indexed"))
+        count = 0
+        for info in store.list_notes():
+            if known.pop(info.name, None) == info.mtime or store.text_path(info.name) is not None:
+                continue  # Unchanged, or a plain-text note (only shown in the viewer, not indexed)
+            try:
+                self.index_note(info.name, store.load(info.name), info.mtime)
+                count += 1
+            except Exception as e:
+                print(f"Could not index {info.name}: {e}")
+        for name in known:
+            self.remove_note(name)
+        return count
+
+    def search(self, text, limit=50):
+        """Returns SearchResults ranked by BM25, with note name matches weighted highest."""
+        query = build_query(text)
+        if query is None:
+            return []
+        with self.lock:
+            try:
+                rows = self.conn.execute(
+                    "SELECT name, snippet(note_text, 1, '[', ']', '...', ?), bm25(note_text, 10.0, 1.0) AS rank"
+                    " FROM note_text WHERE note_text MATCH ? ORDER BY rank LIMIT ?",
+                    (SNIPPET_TOKENS, query, limit)).fetchall()
+            except sqlite3.OperationalError:
+                return []
+        return [SearchResult(name, snippet.replace("\n", " "), rank) for name, snippet, rank in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
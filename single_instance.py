@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import queue
+import socket
+import stat
+import tempfile
+import threading
+
+CONNECT_TIMEOUT = 0.5  # Seconds a second launch waits for the running instance
+POLL_MS = 100
+MAX_REQUEST_BYTES = 64 * 1024
+
+# Requests (one JSON line each)
+NEW_WINDOW = "new_window"
+OPEN_NOTE = "open"
+
+
+def supported():
+    return hasattr(socket, "AF_UNIX")
+
+
+def socket_dir():
+    """$XDG_RUNTIME_DIR (per user, 0700 by spec), else a sticky-notes-<uid> folder in the temp dir."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return runtime
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(tempfile.gettempdir(), f"sticky-notes-{uid}")
+
+
+def socket_path_for(location):
+    """One socket per user and notes store, in a directory only that user can use."""
+    key = hashlib.sha1(os.path.abspath(location).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(socket_dir(), f"sticky-notes-{key}.sock")
+
+
+def private_dir(folder, create=False):
+    """
+    True if folder belongs to this user and nobody else can use it. With
+    create, a missing folder is made (0700). Anything else (another user's
+    folder squatting the name in /tmp, loose permissions) is refused, since
+    whoever can write there could answer or hijack our requests.
+    """
+    if create:
+        try:
+            os.mkdir(folder, 0o700)
+        except FileExistsError:
+            pass
+    st = os.lstat(folder)
+    uid = os.getuid() if hasattr(os, "getuid") else st.st_uid
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == uid and not st.st_mode & 0o077
+
+
+def request_from_args(args):
+    """`multi_sticky.py` asks for a new window, `multi_sticky.py <note>` for that note."""
+    names = [a for a in args if not a.startswith("-")]
+    if names:
+        return {"action": OPEN_NOTE, "note": names[0]}
+    return {"action": NEW_WINDOW}
+
+
+def send_request(path, request):
+    """Hands request to the running instance. Returns False if none is listening."""
+    if not supported():
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        return sock.makefile("rb").readline().strip() == b"ok"
+    except (OSError, socket.timeout):
+        return False
+    finally:
+        sock.close()
+
+
+def forward(location, args):
+    """Called first thing on launch: True if a running instance took over."""
+    path = socket_path_for(location)
+    try:
+        if not private_dir(os.path.dirname(path)):
+            return False
+    except OSError:
+        return False  # No folder yet: nothing is running
+    return send_request(path, request_from_args(args))
+
+
+class InstanceServer:
+    """
+    Listens on the store's socket so later launches can reuse this process.
+    Requests are accepted on a background thread and handed to on_request
+    on the Tk thread via a polled queue, like AutoSaver and NoteLoader do.
+    """
+    def __init__(self, root, path, on_request):
+        self.root = root
+        self.path = path
+        self.on_request = on_request
+        self.requests = queue.Queue()
+        self.sock = None
+        self.poll_id = None
+
+    def start(self):
+        """Returns False if single-instance mode isn't available (or another instance owns the socket)."""
+        if not supported():
+            return False
+        try:
+            if not private_dir(os.path.dirname(self.path), create=True):
+                raise PermissionError(f"{os.path.dirname(self.path)} is not private to this user")
+            if os.path.exists(self.path):
+                if send_request(self.path, {"action": "ping"}):
+                    return False
+                os.remove(self.path)  # Left behind by a crashed instance
+        except OSError as e:
+            print(f"Single-instance mode disabled: {e}")
+            return False
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            # Nobody else can reach the folder, so there is no window before the chmod
+            sock.bind(self.path)
+            os.chmod(self.path, 0o600)
+            sock.listen(8)
+        except OSError as e:
+            sock.close()
+            print(f"Single-instance mode disabled: {e}")
+            return False
+        self.sock = sock
+        threading.Thread(target=self._serve, daemon=True).start()
+        self.poll_id = self.root.after(POLL_MS, self._poll)
+        return True
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return  # Closed
+            with conn:
+                try:
+                    conn.settimeout(CONNECT_TIMEOUT)
+                    line = conn.makefile("rb").readline(MAX_REQUEST_BYTES)
+                    request = json.loads(line)
+                    if request.get("action") != "ping":
+                        self.requests.put(request)
+                    conn.sendall(b"ok\n")
+                except (OSError, ValueError, AttributeError):
+                    pass
+
+    def _poll(self):
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                self.on_request(request)
+            except Exception as e:
+                print(f"Could not handle request {request!r}: {e}")
+        self.poll_id = self.root.after(POLL_MS, self._poll)
+
+    def close(self):
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)  # Wakes the accept() in _serve
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
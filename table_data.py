@@ -0,0 +1,111 @@
+import csv
+import os
+from formula_engine import FormulaError, to_number
+
+IMPORT_CHUNK_ROWS = 2000  # Rows parsed per Tk idle slice
+SNIFF_BYTES = 64 * 1024
+
+
+def delimiter_for(path, sample=""):
+    """Tab for .tsv/.tab files, otherwise whatever the sample looks like (comma if unsure)."""
+    if os.path.splitext(path)[1].lower() in (".tsv", ".tab"):
+        return "\t"
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+class TableReader:
+    """
+    Streams a CSV/TSV file into one flat row-major list, ready to become
+    TableSegment.values: each parsed row is copied straight into the list,
+    so the file is never held as a list of rows as well. read() parses a
+    bounded number of rows per call so the caller can spread a large
+    import over idle slices. Rows shorter than the widest row are padded.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "r", encoding="utf-8-sig", errors="replace", newline="")
+        sample = self.file.read(SNIFF_BYTES)
+        self.file.seek(0)
+        self.reader = csv.reader(self.file, delimiter=delimiter_for(path, sample))
+        self.values = []
+        self.rows = 0
+        self.cols = 0
+
+    def read(self, max_rows=IMPORT_CHUNK_ROWS):
+        """Parses up to max_rows rows. Returns False once the file is exhausted."""
+        reader = self.reader
+        for _ in range(max_rows):
+            row = next(reader, None)
+            if row is None:
+                self.close()
+                return False
+            if len(row) > self.cols:
+                self.widen(len(row))
+            self.values.extend(row)
+            if len(row) < self.cols:
+                self.values.extend([""] * (self.cols - len(row)))
+            self.rows += 1
+        return True
+
+    def widen(self, cols):
+        # Rare (a ragged file): re-lay out the rows read so far at the new width
+        old, old_cols = self.values, self.cols
+        pad = [""] * (cols - old_cols)
+        values = []
+        for r in range(self.rows):
+            values.extend(old[r * old_cols:(r + 1) * old_cols])
+            values.extend(pad)
+        self.values = values
+        self.cols = cols
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def write_table(path, segment, rows=None):
+    """Streams the shown values (formula results) of segment's rows (all, or the given order) to CSV/TSV."""
+    delimiter = "\t" if os.path.splitext(path)[1].lower() in (".tsv", ".tab") else ","
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        for r in (range(segment.rows) if rows is None else rows):
+            writer.writerow(segment.row(r))
+
+
+def _sort_key(text):
+    # Numbers before text, numbers by value, text case-insensitively
+    try:
+        number = to_number(text)
+    except FormulaError:
+        return (1, 0, text.casefold())
+    return (0, number, "")
+
+
+def column_values(segment, c):
+    """Shown values of column c, one per row, in one pass over the flat list."""
+    if segment.engine is None:
+        return segment.values[c::segment.cols]
+    display = segment.engine.display
+    return [display(i) for i in range(c, segment.rows * segment.cols, segment.cols)]
+
+
+def sort_rows(segment, c, descending=False, rows=None):
+    """Row indices (all, or just rows) ordered by column c; blank cells always go last."""
+    column = column_values(segment, c)
+    rows = range(segment.rows) if rows is None else rows
+    filled = [r for r in rows if column[r].strip()]
+    blank = [r for r in rows if not column[r].strip()]
+    filled.sort(key=lambda r: _sort_key(column[r]), reverse=descending)
+    return filled + blank
+
+
+def filter_rows(segment, c, text, rows=None):
+    """Row indices (all, or just rows) whose column c contains text, case-insensitively."""
+    column = column_values(segment, c)
+    rows = range(segment.rows) if rows is None else rows
+    needle = text.casefold()
+    return [r for r in rows if needle in column[r].casefold()]
@@ -0,0 +1,148 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formula_engine import (ERROR_CYCLE, ERROR_DIV0, ERROR_NAME, ERROR_REF, ERROR_SYNTAX, ERROR_VALUE,
+                            FormulaError, column_name, compile_formula, format_value, parse_cell_name)
+from note_document import TableSegment
+
+
+def evaluate(text, cells=None):
+    """Runs one formula against a dict of (r, c) -> value."""
+    cells = cells or {}
+    return compile_formula(text).evaluate(lambda r, c, skip_text=False: cells.get((r, c)))
+
+
+def shown(seg):
+    return [[seg.display(r, c) for c in range(seg.cols)] for r in range(seg.rows)]
+
+
+class NamesTest(unittest.TestCase):
+    def test_column_names(self):
+        self.assertEqual([column_name(c) for c in (0, 25, 26, 27, 701, 702)], ["A", "Z", "AA", "AB", "ZZ", "AAA"])
+
+    def test_parse_cell_name(self):
+        self.assertEqual(parse_cell_name("B3"), (2, 1))
+        self.assertEqual(parse_cell_name("aa10"), (9, 26))
+        self.assertIsNone(parse_cell_name("A0"))
+        self.assertIsNone(parse_cell_name("3B"))
+
+
+class ParserTest(unittest.TestCase):
+    def test_precedence(self):
+        self.assertEqual(evaluate("=1+2*3"), 7)
+        self.assertEqual(evaluate("=(1+2)*3"), 9)
+        self.assertEqual(evaluate("=2^3^2"), 512)  # Right-associative
+        self.assertEqual(evaluate("=-2^2"), 4)
+        self.assertEqual(evaluate("=10-4-3"), 3)
+        self.assertEqual(evaluate("=.5*4"), 2)
+
+    def test_references_and_functions(self):
+        cells = {(0, 0): 1, (1, 0): 2, (2, 0): None}
+        self.assertEqual(evaluate("=SUM(A1:A3)", cells), 3)
+        self.assertEqual(evaluate("=sum(A1, A2, 4)", cells), 7)
+        self.assertEqual(evaluate("=AVERAGE(A1:A3)", cells), 1.5)
+        self.assertEqual(evaluate("=COUNT(A1:A3)", cells), 2)
+        self.assertEqual(evaluate("=MAX(A1:A2)-MIN(A1:A2)", cells), 1)
+        self.assertEqual(evaluate("=ROUND(2.567, 2)"), 2.57)
+        self.assertEqual(evaluate("=A3+1", cells), 1)  # Blank counts as 0
+
+    def test_refs(self):
+        self.assertEqual(compile_formula("=A1+SUM(B1:B2)").refs, {(0, 0), (0, 1), (1, 1)})
+
+    def test_errors(self):
+        for text, code in (("=1+", ERROR_SYNTAX), ("=1 2", ERROR_SYNTAX), ("=(1", ERROR_SYNTAX),
+                           ("=FOO(1)", ERROR_NAME), ("=A1:A2", ERROR_VALUE), ("=1/0", ERROR_DIV0),
+                           ("=AVERAGE()", ERROR_DIV0), ("=ABS(1, 2)", ERROR_VALUE)):
+            with self.subTest(text=text):
+                with self.assertRaises(FormulaError) as cm:
+                    evaluate(text)
+                self.assertEqual(cm.exception.code, code)
+
+    def test_compiled_formulas_are_shared(self):
+        self.assertIs(compile_formula("=A1*2"), compile_formula("=A1*2"))
+
+
+class RecalcTest(unittest.TestCase):
+    def test_initial_values(self):
+        seg = TableSegment(2, 3, data=[["1", "2", "=A1+B1"], ["x", "=SUM(A1:C1)", "=A2+1"]])
+        self.assertEqual(shown(seg), [["1", "2", "3"], ["x", "6", ERROR_VALUE]])
+
+    def test_edit_recalculates_dependents_only(self):
+        seg = TableSegment(3, 1, data=[["1"], ["=A1*2"], ["=A2+1"]])
+        self.assertEqual(seg.set_cell(0, 0, "5"), {0, 1, 2})
+        self.assertEqual(shown(seg), [["5"], ["10"], ["11"]])
+        seg = TableSegment(2, 2, data=[["1", "=A1"], ["2", "=A2"]])
+        self.assertEqual(seg.set_cell(1, 0, "3"), {2, 3})
+
+    def test_formula_replaced_by_value(self):
+        seg = TableSegment(2, 1, data=[["=1+1"], ["=A1*10"]])
+        seg.set_cell(0, 0, "7")
+        self.assertEqual(shown(seg), [["7"], ["70"]])
+        seg.set_cell(0, 0, "=2+2")
+        self.assertEqual(shown(seg), [["4"], ["40"]])
+        self.assertEqual(seg.get_cell(0, 0), "=2+2")
+
+    def test_errors_propagate(self):
+        seg = TableSegment(1, 3, data=[["=1/0", "=A1+1", "=C5"]])
+        self.assertEqual(shown(seg), [[ERROR_DIV0, ERROR_DIV0, ERROR_REF]])
+
+    def test_resize_rebuilds(self):
+        seg = TableSegment(1, 2, data=[["2", "=A1*3"]])
+        seg.resize(2, 2)
+        self.assertEqual(shown(seg), [["2", "6"], ["", ""]])
+
+    def test_long_chain(self):
+        n = 500
+        seg = TableSegment(n, 1, data=[["1"]] + [[f"=A{r}+1"] for r in range(1, n)])
+        self.assertEqual(seg.display(n - 1, 0), str(n))
+        seg.set_cell(0, 0, "0")
+        self.assertEqual(seg.display(n - 1, 0), str(n - 1))
+
+
+class CycleTest(unittest.TestCase):
+    def test_self_reference(self):
+        seg = TableSegment(1, 1, data=[["=A1+1"]])
+        self.assertEqual(shown(seg), [[ERROR_CYCLE]])
+
+    def test_cycle_and_downstream(self):
+        seg = TableSegment(1, 4, data=[["=B1", "=A1", "=A1+1", "5"]])
+        self.assertEqual(shown(seg), [[ERROR_CYCLE, ERROR_CYCLE, ERROR_CYCLE, "5"]])
+
+    def test_breaking_a_cycle(self):
+        seg = TableSegment(1, 3, data=[["=B1", "=A1", "=A1*2"]])
+        changed = seg.set_cell(0, 1, "4")
+        self.assertEqual(changed, {0, 1, 2})
+        self.assertEqual(shown(seg), [["4", "4", "8"]])
+        seg.set_cell(0, 1, "=C1")
+        self.assertEqual(shown(seg), [[ERROR_CYCLE, ERROR_CYCLE, ERROR_CYCLE]])
+
+
+class LimitsTest(unittest.TestCase):
+    def test_huge_powers_are_errors_and_fast(self):
+        start = time.monotonic()
+        seg = TableSegment(1, 4, data=[["=9^9^8", "=10^5000", "=1e400*1", "=(-8)^(1/3)"]])
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(shown(seg), [[ERROR_VALUE] * 4])
+        seg.to_dict()  # Still saves
+
+    def test_growing_integers_become_floats(self):
+        data = [["999999999999999"]] + [[f"=A{r}*A{r}"] for r in range(1, 12)]
+        seg = TableSegment(len(data), 1, data=data)
+        self.assertEqual(seg.display(1, 0), "1e+30")
+        self.assertEqual(seg.display(len(data) - 1, 0), ERROR_VALUE)
+        seg.to_dict()
+
+    def test_format_value_never_raises(self):
+        self.assertEqual(format_value(float("inf")), ERROR_VALUE)
+        self.assertEqual(format_value(float("nan")), ERROR_VALUE)
+        self.assertEqual(format_value(10 ** 5000), ERROR_VALUE)
+        self.assertEqual(format_value(2.0), "2")
+        self.assertEqual(format_value(0.1 + 0.2), "0.3")
+
+
+if __name__ == "__main__":
+    unittest.main()
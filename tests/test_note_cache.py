@@ -0,0 +1,71 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from note_cache import NoteCache
+from note_document import CardSegment, NoteDocument, TextSegment
+
+
+def doc(text):
+    return NoteDocument([TextSegment(text), CardSegment(title="T", content=text)])
+
+
+class NoteCacheTest(unittest.TestCase):
+    def test_hit_and_mtime_miss(self):
+        cache = NoteCache()
+        cache.put("a", 1.0, doc("x"), 10)
+        self.assertEqual(cache.get("a", 1.0), doc("x"))
+        self.assertIsNone(cache.get("a", 2.0))  # Changed on disk
+        self.assertIsNone(cache.get("b", 1.0))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_lru_eviction_by_size(self):
+        cache = NoteCache(budget_bytes=100)
+        cache.put("a", 1, doc("a"), 40)
+        cache.put("b", 1, doc("b"), 40)
+        cache.get("a", 1)  # b is now the least recently used
+        cache.put("c", 1, doc("c"), 40)
+        self.assertIsNone(cache.get("b", 1))
+        self.assertIsNotNone(cache.get("a", 1))
+        self.assertIsNotNone(cache.get("c", 1))
+        self.assertEqual(cache.total_bytes, 80)
+
+    def test_too_big_is_not_cached_and_drops_the_old_entry(self):
+        cache = NoteCache(budget_bytes=100)
+        cache.put("a", 1, doc("a"), 10)
+        cache.put("a", 2, doc("a2"), 500)
+        self.assertIsNone(cache.get("a", 1))
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_replacing_an_entry_keeps_the_total(self):
+        cache = NoteCache()
+        cache.put("a", 1, doc("a"), 10)
+        cache.put("a", 2, doc("a"), 30)
+        self.assertEqual(cache.total_bytes, 30)
+        cache.discard("a")
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_get_returns_an_isolated_snapshot(self):
+        cache = NoteCache()
+        cache.put("a", 1, doc("original"), 10)
+        first = cache.get("a", 1)
+        first.segments[0].content = "edited"
+        first.segments[1].content = "edited"
+        first.append(TextSegment("more"))
+        self.assertEqual(cache.get("a", 1), doc("original"))
+
+    def test_rename_and_clear(self):
+        cache = NoteCache()
+        cache.put("a", 1, doc("a"), 10)
+        cache.rename("a", "b")
+        self.assertIsNone(cache.get("a", 1))
+        self.assertEqual(cache.get("b", 1), doc("a"))
+        cache.clear()
+        self.assertIsNone(cache.get("b", 1))
+        self.assertEqual(cache.total_bytes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
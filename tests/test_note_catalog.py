@@ -0,0 +1,97 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from note_catalog import PREVIEW_CHARS, SORT_MODIFIED, NoteCatalog, catalog_path_for, make_preview
+from note_store import FolderNoteStore
+
+
+class Store(FolderNoteStore):
+    """Counts how many notes are read for previews."""
+    def __init__(self, folder):
+        super().__init__(folder)
+        self.reads = []
+
+    def iter_segments(self, name):
+        self.reads.append(name)
+        return super().iter_segments(name)
+
+
+class NoteCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.store = Store(self.folder)
+        self.cache_path = catalog_path_for(self.folder)
+        self.mtime = 1_000_000
+
+    def save(self, name, text):
+        self.store.save(name, [{"type": "text", "content": text}])
+        self.store.compact(name)
+        # Distinct mtimes even on filesystems with coarse timestamps
+        self.mtime += 10
+        os.utime(self.store.path_for(name), (self.mtime, self.mtime))
+
+    def test_refresh_reports_deltas_and_reads_only_changes(self):
+        self.save("a", "alpha")
+        self.save("b", "beta")
+        catalog = NoteCatalog(self.store, self.cache_path)
+        self.assertEqual(catalog.refresh(), ({"a", "b"}, set(), set()))
+        self.assertEqual(catalog.get("a").preview, "alpha")
+
+        self.store.reads.clear()
+        self.assertEqual(catalog.refresh(), (set(), set(), set()))
+        self.assertEqual(self.store.reads, [])
+
+        self.save("b", "beta 2")
+        self.save("c", "gamma")
+        self.store.delete("a")
+        self.assertEqual(catalog.refresh(), ({"c"}, {"a"}, {"b"}))
+        self.assertEqual(sorted(self.store.reads), ["b", "c"])
+        self.assertEqual(catalog.get("b").preview, "beta 2")
+
+    def test_cache_survives_restart(self):
+        self.save("a", "alpha")
+        NoteCatalog(self.store, self.cache_path).refresh()
+        self.store.reads.clear()
+        catalog = NoteCatalog(self.store, self.cache_path)
+        self.assertEqual(catalog.get("a").preview, "alpha")
+        self.assertEqual(catalog.refresh(), (set(), set(), set()))
+        self.assertEqual(self.store.reads, [])
+
+    def test_update_rename_remove(self):
+        catalog = NoteCatalog(self.store, self.cache_path)
+        self.save("a", "alpha")
+        self.assertTrue(catalog.update("a"))
+        self.assertFalse(catalog.update("a", [{"type": "text", "content": "given"}]))
+        self.assertEqual(catalog.get("a").preview, "given")
+        catalog.rename("a", "z")
+        self.assertIsNone(catalog.get("a"))
+        self.assertEqual(catalog.get("z").name, "z")
+        catalog.remove("z")
+        self.assertEqual(catalog.sorted_names(), [])
+
+    def test_sorted_names(self):
+        self.save("b", "first")
+        self.save("a", "second")
+        catalog = NoteCatalog(self.store, self.cache_path)
+        catalog.refresh()
+        self.assertEqual(catalog.sorted_names(), ["a", "b"])
+        self.assertEqual(catalog.sorted_names(SORT_MODIFIED), ["a", "b"])
+        self.save("b", "third")
+        catalog.refresh()
+        self.assertEqual(catalog.sorted_names(SORT_MODIFIED), ["b", "a"])
+
+    def test_preview(self):
+        items = [{"type": "text", "content": "  many\n\n spaces  "}, {"type": "text", "content": "x" * 500}]
+        preview = make_preview(items)
+        self.assertTrue(preview.startswith("many spaces x"))
+        self.assertEqual(len(preview), PREVIEW_CHARS)
+
+
+if __name__ == "__main__":
+    unittest.main()
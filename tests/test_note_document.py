@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from note_document import MERGE_MARKER, CardSegment, NoteDocument, TextSegment, merge_documents
+
+
+def doc(*texts):
+    return NoteDocument(TextSegment(text) for text in texts)
+
+
+def texts(document):
+    return [seg.text() for seg in document]
+
+
+class MergeDocumentsTest(unittest.TestCase):
+    def test_changes_on_different_segments_combine(self):
+        merged, extra = merge_documents(doc("a", "b", "c"), doc("A", "b", "c"), doc("a", "b", "C"))
+        self.assertEqual(texts(merged), ["A", "b", "C"])
+        self.assertEqual(extra, 0)
+
+    def test_same_change_on_both_sides(self):
+        merged, extra = merge_documents(doc("a", "b"), doc("a", "B"), doc("a", "B"))
+        self.assertEqual(texts(merged), ["a", "B"])
+        self.assertEqual(extra, 0)
+
+    def test_conflict_keeps_mine_and_appends_theirs(self):
+        merged, extra = merge_documents(doc("a", "b"), doc("mine", "b"), doc("theirs", "b"))
+        self.assertEqual(texts(merged), ["mine", "b", MERGE_MARKER, "theirs"])
+        self.assertEqual(extra, 1)
+
+    def test_different_lengths_append_only_new_segments(self):
+        merged, extra = merge_documents(doc("a", "b"), doc("a", "b", "mine"), doc("a", "theirs"))
+        self.assertEqual(texts(merged), ["a", "b", "mine", MERGE_MARKER, "theirs"])
+        self.assertEqual(extra, 1)
+
+    def test_without_base(self):
+        merged, extra = merge_documents(None, doc("a", "mine"), doc("a", "theirs"))
+        self.assertEqual(texts(merged), ["a", "mine", MERGE_MARKER, "theirs"])
+        self.assertEqual(extra, 1)
+        merged, extra = merge_documents(None, doc("a"), doc("a"))
+        self.assertEqual((texts(merged), extra), (["a"], 0))
+
+    def test_merged_segments_are_copies(self):
+        card = CardSegment(title="T", content="x")
+        mine = NoteDocument([card])
+        merged, extra = merge_documents(NoteDocument([card.copy()]), mine, NoteDocument([card.copy()]))
+        self.assertEqual(merged.segments, [card])
+        self.assertIsNot(merged.segments[0], card)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from note_loader import iter_segments
+
+CONTENT = [
+    {"type": "text", "content": "Plain ascii text\n"},
+    {"type": "card", "title": "Ünïcödé", "content": "日本語のカード 🗒", "width": 200, "height": 120},
+    {"type": "text", "content": "x" * 500},
+    {"type": "table", "rows": 1, "cols": 2, "data": [["é", "=A1"]]},
+]
+
+
+def parse(text, chunk_size=64):
+    return list(iter_segments(io.StringIO(text, newline=""), chunk_size=chunk_size))
+
+
+class IterSegmentsTest(unittest.TestCase):
+    def test_every_chunk_size(self):
+        text = json.dumps(CONTENT, indent=2, ensure_ascii=False)
+        for chunk_size in (1, 2, 3, 7, 64, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual([item for item, offset in parse(text, chunk_size)], CONTENT)
+
+    def test_offsets_are_file_bytes(self):
+        text = json.dumps(CONTENT, indent=2, ensure_ascii=False).replace("\n", "\r\n")
+        data = text.encode("utf-8")
+        offsets = [offset for item, offset in parse(text, 5)]
+        # Each offset is just past the segment's closing brace; only the closing bracket follows the last one
+        for offset in offsets:
+            self.assertEqual(data[offset - 1:offset], b"}")
+        self.assertEqual(data[offsets[-1]:].strip(), b"]")
+        self.assertEqual(offsets, sorted(offsets))
+
+    def test_empty_list_and_empty_file(self):
+        self.assertEqual(parse("[]"), [])
+        self.assertEqual(parse(" [ \n ] "), [])
+        self.assertEqual(parse(""), [])
+
+    def test_truncated_file(self):
+        text = json.dumps(CONTENT)
+        for cut in (1, len(text) // 2, len(text) - 1):
+            with self.subTest(cut=cut):
+                with self.assertRaises(ValueError):
+                    parse(text[:cut], 16)
+
+    def test_not_a_list(self):
+        for text in ('{"type": "text"}', '"text"', "42"):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    parse(text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autosave import atomic_write_json
+from note_store import FolderNoteStore, SqliteNoteStore, migrate_folder_to_sqlite
+
+
+class StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def write_text(self, name, text):
+        with open(os.path.join(self.folder, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def note(*texts):
+    return [{"type": "text", "content": text} for text in texts]
+
+
+class JournalTest(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = FolderNoteStore(self.folder)
+        self.store.save("n", note("a", "b", "c"))
+        self.store.save("n", note("a", "B", "c"))  # Journaled against the base written above
+        self.journal = self.store.journal_path_for("n")
+
+    def reopen(self):
+        return FolderNoteStore(self.folder)
+
+    def test_saves_append_to_the_journal(self):
+        self.assertTrue(os.path.exists(self.journal))
+        self.assertEqual(self.reopen().load("n"), note("a", "B", "c"))
+
+    def test_torn_last_line_is_dropped(self):
+        with open(self.journal, "a", encoding="utf-8") as f:
+            f.write('{"length": 3, "set": {"2": {"type": "te')
+        store = self.reopen()
+        self.assertEqual(store.load("n"), note("a", "B", "c"))
+        # The torn tail was cut off, so the next record starts on its own line
+        store.save("n", note("a", "B", "C"))
+        self.assertEqual(self.reopen().load("n"), note("a", "B", "C"))
+
+    def test_crash_between_base_write_and_journal_removal(self):
+        # Compaction writes the folded note as the new base, then removes the journal; stop in between
+        atomic_write_json(self.store.path_for("n"), note("a", "B", "c"))
+        self.assertTrue(os.path.exists(self.journal))
+        store = self.reopen()
+        self.assertEqual(store.load("n"), note("a", "B", "c"))
+        self.assertEqual(store.load("n"), note("a", "B", "c"))
+        store.save("n", note("x"))
+        self.assertEqual(self.reopen().load("n"), note("x"))
+
+    def test_journal_is_not_replayed_over_a_replaced_base(self):
+        atomic_write_json(self.store.path_for("n"), note("from", "elsewhere"))
+        self.assertEqual(self.reopen().load("n"), note("from", "elsewhere"))
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_compact_all_folds_only_journaled_notes(self):
+        self.store.save("other", note("x"))
+        self.assertEqual(self.store.journal_names(), ["n"])
+        self.assertEqual(self.store.compact_all(), 1)
+        self.assertFalse(os.path.exists(self.journal))
+        self.assertEqual(self.reopen().load("n"), note("a", "B", "c"))
+
+
+class MigrateTest(StoreTestCase):
+    def test_text_notes_are_left_in_the_folder(self):
+        atomic_write_json(os.path.join(self.folder, "plan.json"), note("hi"))
+        self.write_text("log.txt", "line 1\nline 2\n")
+        db_path = os.path.join(self.folder, "notes.db")
+        self.assertEqual(migrate_folder_to_sqlite(self.folder, db_path), 1)
+        db = SqliteNoteStore(db_path)
+        try:
+            self.assertEqual([info.name for info in db.list_notes()], ["plan"])
+            self.assertEqual(db.load("plan"), note("hi"))
+        finally:
+            db.close()
+        self.assertIsNotNone(FolderNoteStore(self.folder).text_path("log.txt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from note_store import FolderNoteStore
+from note_watcher import NoteWatcher, note_name_for
+
+
+class Root:
+    """Just enough of Tk for NoteWatcher: after() callbacks are never run, so changes stay pending."""
+    def after(self, ms, func):
+        return "after"
+
+    def after_cancel(self, after_id):
+        pass
+
+
+class NoteNameTest(unittest.TestCase):
+    def test_names(self):
+        self.assertEqual(note_name_for("plan.json"), "plan")
+        self.assertEqual(note_name_for("plan.journal"), "plan")
+        self.assertEqual(note_name_for("log.txt"), "log.txt")
+        self.assertIsNone(note_name_for(".catalog.json"))
+        self.assertIsNone(note_name_for("plan.json.tmp"))
+
+
+class InotifyTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.watcher = NoteWatcher(Root(), FolderNoteStore(self.folder), lambda names: None)
+        self.watcher.start()
+        self.addCleanup(self.watcher.stop)
+        if self.watcher.mode != "inotify":
+            self.skipTest("inotify not available")
+
+    def wait_for(self, name, seconds=2.0):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            with self.watcher.lock:
+                if name in self.watcher.pending:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def test_text_note_kept_open_by_its_writer(self):
+        with open(os.path.join(self.folder, "log.txt"), "a") as f:
+            f.write("first\n")
+            f.flush()
+            self.assertTrue(self.wait_for("log.txt"))
+            with self.watcher.lock:
+                self.watcher.pending.clear()
+            f.write("second\n")
+            f.flush()
+            self.assertTrue(self.wait_for("log.txt"))
+
+    def test_json_note_waits_for_close(self):
+        with open(os.path.join(self.folder, "plan.json"), "w") as f:
+            f.write("[")
+            f.flush()
+            self.assertFalse(self.wait_for("plan", 0.3))
+        self.assertTrue(self.wait_for("plan"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from note_store import FolderNoteStore
+from search_index import SearchIndex, build_query, index_path_for
+
+
+def text(content):
+    return [{"type": "text", "content": content}]
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.index = SearchIndex(index_path_for(self.folder))
+        self.addCleanup(self.index.close)
+
+    def names(self, query):
+        return [result.name for result in self.index.search(query)]
+
+    def test_build_query(self):
+        self.assertEqual(build_query("foo, ba"), '"foo"* "ba"*')
+        self.assertIsNone(build_query(" ,. "))
+
+    def test_prefix_search_over_all_segment_types(self):
+        self.index.index_note("plain", text("Groceries: apples and bread"))
+        self.index.index_note("card", [{"type": "card", "title": "Meeting", "content": "Quarterly planning"}])
+        self.index.index_note("table", [{"type": "table", "rows": 1, "cols": 2, "data": [["Kiwi", "Mango"]]}])
+        self.assertEqual(self.names("appl"), ["plain"])
+        self.assertEqual(self.names("plann"), ["card"])
+        self.assertEqual(self.names("meet"), ["card"])
+        self.assertEqual(self.names("mango"), ["table"])
+        self.assertEqual(self.names("apples bread"), ["plain"])
+        self.assertEqual(self.names("apples mango"), [])  # Every word must match
+        self.assertEqual(self.names("   "), [])
+
+    def test_name_matches_rank_first(self):
+        self.index.index_note("other", text("budget budget budget"))
+        self.index.index_note("budget", text("numbers"))
+        self.assertEqual(self.names("budget"), ["budget", "other"])
+
+    def test_snippet_marks_the_match(self):
+        self.index.index_note("n", text("one two\nthree four"))
+        self.assertIn("[three]", self.index.search("three")[0].snippet)
+
+    def test_reindex_rename_delete(self):
+        self.index.index_note("n", text("old words"))
+        self.index.index_note("n", text("new words"))
+        self.assertEqual(self.names("old"), [])
+        self.assertEqual(self.names("new"), ["n"])
+        self.index.rename_note("n", "renamed")
+        self.assertEqual(self.names("words"), ["renamed"])
+        self.index.remove_note("renamed")
+        self.assertEqual(self.names("words"), [])
+
+    def test_sync_indexes_only_changes(self):
+        store = FolderNoteStore(self.folder)
+        store.save("a", text("alpha"))
+        store.save("b", text("beta"))
+        with open(os.path.join(self.folder, "log.txt"), "w") as f:
+            f.write("gamma")
+        self.assertEqual(self.index.sync(store), 2)
+        self.assertEqual(self.index.sync(store), 0)
+        self.assertEqual(self.names("gamma"), [])  # Plain-text notes aren't indexed
+        store.delete("a")
+        store.save("b", text("beta two"))
+        store.compact("b")
+        os.utime(store.path_for("b"), (1, 1))  # A new mtime even on coarse filesystem clocks
+        self.assertEqual(self.index.sync(store), 1)
+        self.assertEqual(self.names("alpha"), [])
+        self.assertEqual(self.names("two"), ["b"])
+
+    def test_persists(self):
+        self.index.index_note("n", text("kept"))
+        self.index.close()
+        self.index = SearchIndex(index_path_for(self.folder))
+        self.assertEqual(self.names("kept"), ["n"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import single_instance
+from single_instance import InstanceServer, private_dir, send_request
+
+
+class Root:
+    """Just enough of Tk for InstanceServer: after() callbacks are never run."""
+    def after(self, ms, func):
+        return "after"
+
+    def after_cancel(self, after_id):
+        pass
+
+
+@unittest.skipUnless(single_instance.supported() and hasattr(os, "getuid"), "needs Unix sockets")
+class InstanceServerTest(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base)
+        self.folder = os.path.join(self.base, "run")
+        self.path = os.path.join(self.folder, "notes.sock")
+
+    def start(self):
+        server = InstanceServer(Root(), self.path, lambda request: None)
+        self.addCleanup(server.close)
+        return server.start()
+
+    def test_creates_a_private_folder(self):
+        self.assertTrue(self.start())
+        self.assertEqual(os.stat(self.folder).st_mode & 0o777, 0o700)
+        self.assertTrue(send_request(self.path, {"action": "ping"}))
+        self.assertFalse(self.start())  # The first instance answers
+
+    def test_replaces_a_stale_socket(self):
+        os.mkdir(self.folder, 0o700)
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.path)
+        stale.close()  # Bound but nobody listening, like after a crash
+        self.assertTrue(self.start())
+
+    def test_refuses_a_shared_folder(self):
+        os.mkdir(self.folder)
+        os.chmod(self.folder, 0o777)
+        self.assertFalse(private_dir(self.folder))
+        self.assertFalse(self.start())
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
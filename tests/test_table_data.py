@@ -0,0 +1,83 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from note_document import TableSegment
+from table_data import TableReader, filter_rows, sort_rows, write_table
+
+
+class TableReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def write(self, name, text):
+        path = os.path.join(self.folder, name)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        return path
+
+    def read_all(self, path, max_rows=2):
+        reader = TableReader(path)
+        while reader.read(max_rows):
+            pass
+        return reader
+
+    def test_csv_in_chunks(self):
+        reader = self.read_all(self.write("t.csv", "a,b\n1,2\n3,4\n\"x,y\",5\n"))
+        self.assertEqual((reader.rows, reader.cols), (4, 2))
+        self.assertEqual(reader.values, ["a", "b", "1", "2", "3", "4", "x,y", "5"])
+        self.assertIsNone(reader.file)  # Closed once exhausted
+
+    def test_tsv_by_extension_and_bom(self):
+        reader = self.read_all(self.write("t.tsv", "\ufeffname\tnote\nä\ta,b\n"))
+        self.assertEqual(reader.values, ["name", "note", "ä", "a,b"])
+
+    def test_sniffed_delimiter(self):
+        reader = self.read_all(self.write("t.txt", "a;b;c\n1;2;3\n"))
+        self.assertEqual((reader.rows, reader.cols), (2, 3))
+
+    def test_ragged_rows_are_padded(self):
+        reader = self.read_all(self.write("t.csv", "a\nb,c\nd,e,f\ng\n"), max_rows=1)
+        self.assertEqual((reader.rows, reader.cols), (4, 3))
+        self.assertEqual(reader.values, ["a", "", "", "b", "c", "", "d", "e", "f", "g", "", ""])
+
+    def test_empty_file(self):
+        reader = self.read_all(self.write("t.csv", ""))
+        self.assertEqual((reader.rows, reader.cols, reader.values), (0, 0, []))
+
+    def test_write_round_trip(self):
+        seg = TableSegment(2, 2, data=[["1", "=A1*2"], ["a,b", ""]])
+        path = os.path.join(self.folder, "out.csv")
+        write_table(path, seg)
+        reader = self.read_all(path)
+        self.assertEqual(reader.values, ["1", "2", "a,b", ""])  # Formulas are exported as their results
+        write_table(path, seg, rows=[1])
+        self.assertEqual(self.read_all(path).values, ["a,b", ""])
+
+
+class SortFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.seg = TableSegment(6, 2, data=[["10", "x"], ["banana", "y"], ["", "z"], ["9", "x"],
+                                            ["Apple", "y"], ["=A1*10", "z"]])
+
+    def test_sort_numbers_then_text_blanks_last(self):
+        self.assertEqual(sort_rows(self.seg, 0), [3, 0, 5, 4, 1, 2])
+        self.assertEqual(sort_rows(self.seg, 0, descending=True), [1, 4, 5, 0, 3, 2])
+
+    def test_sort_within_rows(self):
+        self.assertEqual(sort_rows(self.seg, 0, rows=[4, 0, 2]), [0, 4, 2])
+
+    def test_filter(self):
+        self.assertEqual(filter_rows(self.seg, 1, "X"), [0, 3])
+        self.assertEqual(filter_rows(self.seg, 0, "an"), [1])
+        self.assertEqual(filter_rows(self.seg, 0, "100"), [5])  # Matches the shown result
+        self.assertEqual(filter_rows(self.seg, 1, "y", rows=[4, 1, 0]), [4, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
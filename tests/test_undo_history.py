@@ -0,0 +1,147 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from undo_history import COALESCE_SECONDS, OP_OVERHEAD, FieldOp, Operation, StringDeltaOp, UndoHistory, string_delta
+
+
+class Segment:
+    def __init__(self, content=""):
+        self.content = content
+        self.title = ""
+
+
+class Editor:
+    """Stands in for RichTextEditor: applies field values straight to the segment."""
+    def apply_field(self, segment, field, value):
+        setattr(segment, field, value)
+
+
+class Sized(Operation):
+    def __init__(self, size):
+        self.size = size
+
+
+def apply_delta(value, delta):
+    start, removed, inserted = delta
+    return value[:start] + inserted + value[start + len(removed):]
+
+
+class StringDeltaTest(unittest.TestCase):
+    def test_cases(self):
+        for old, new, expected in (("abc", "abc", (3, "", "")), ("", "x", (0, "", "x")), ("x", "", (0, "x", "")),
+                                   ("hello world", "hello there world", (6, "", "there ")),
+                                   ("aaaa", "aa", (2, "aa", "")), ("abcdef", "abXYef", (2, "cd", "XY"))):
+            with self.subTest(old=old, new=new):
+                self.assertEqual(string_delta(old, new), expected)
+
+    def test_round_trip(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            old = "".join(rng.choice("ab\n") for _ in range(rng.randrange(30)))
+            new = "".join(rng.choice("ab\n") for _ in range(rng.randrange(30)))
+            start, removed, inserted = string_delta(old, new)
+            self.assertEqual(apply_delta(old, (start, removed, inserted)), new)
+            self.assertEqual(apply_delta(new, (start, inserted, removed)), old)
+
+
+class UndoHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.editor = Editor()
+        self.history = UndoHistory()
+
+    def edit(self, segment, text):
+        old, segment.content = segment.content, text
+        op = StringDeltaOp(self.editor, segment, "content", old, text)
+        self.history.push(op)
+        return op
+
+    def test_typing_burst_is_one_step(self):
+        seg = Segment()
+        for text in ("h", "he", "hel", "hell", "hello"):
+            self.edit(seg, text)
+        self.assertEqual(len(self.history.undo_stack), 1)
+        self.history.undo()
+        self.assertEqual(seg.content, "")
+        self.history.redo()
+        self.assertEqual(seg.content, "hello")
+
+    def test_pause_starts_a_new_step(self):
+        seg = Segment()
+        first = self.edit(seg, "a")
+        first.time -= COALESCE_SECONDS + 1
+        self.edit(seg, "ab")
+        self.assertEqual(len(self.history.undo_stack), 2)
+        self.history.undo()
+        self.assertEqual(seg.content, "a")
+
+    def test_other_segment_or_field_doesnt_merge(self):
+        a, b = Segment(), Segment()
+        self.edit(a, "x")
+        self.edit(b, "y")
+        self.history.push(FieldOp(self.editor, b, "title", "", "T"))
+        self.assertEqual(len(self.history.undo_stack), 3)
+        self.history.undo()
+        self.assertEqual(b.title, "")
+
+    def test_shape_changes_never_merge(self):
+        seg = Segment()
+        self.history.push(FieldOp(self.editor, seg, "shape", 1, 2))
+        self.history.push(FieldOp(self.editor, seg, "shape", 2, 3))
+        self.assertEqual(len(self.history.undo_stack), 2)
+
+    def test_new_edit_clears_redo(self):
+        seg = Segment()
+        self.edit(seg, "a")
+        self.history.undo()
+        self.assertTrue(self.history.can_redo())
+        self.edit(seg, "b")
+        self.assertFalse(self.history.can_redo())
+
+    def test_replayed_ops_are_not_recorded(self):
+        seg = Segment()
+        self.edit(seg, "a")
+        self.history.replaying = True
+        self.edit(seg, "ab")
+        self.history.replaying = False
+        self.assertEqual(len(self.history.undo_stack), 1)
+
+    def test_step_cap(self):
+        history = UndoHistory(max_steps=3)
+        ops = [Sized(10) for _ in range(5)]
+        for op in ops:
+            history.push(op)
+        self.assertEqual(list(history.undo_stack), ops[2:])
+        self.assertEqual(history.total_bytes, 30)
+
+    def test_byte_cap_keeps_the_latest_step(self):
+        history = UndoHistory(max_bytes=100)
+        for size in (40, 40, 40):
+            history.push(Sized(size))
+        self.assertEqual(len(history.undo_stack), 2)
+        self.assertEqual(history.total_bytes, 80)
+        history.push(Sized(500))  # Bigger than the cap on its own: still undoable
+        self.assertEqual(len(history.undo_stack), 1)
+        self.assertEqual(history.total_bytes, 500)
+
+    def test_total_bytes_follow_undo_redo_and_merge(self):
+        seg = Segment()
+        self.edit(seg, "abc")
+        self.edit(seg, "abcdef")
+        size = self.history.undo_stack[-1].size
+        self.assertEqual(self.history.total_bytes, size)
+        self.assertGreater(size, OP_OVERHEAD)
+        self.history.undo()
+        self.assertEqual(self.history.total_bytes, 0)
+        self.history.redo()
+        self.assertEqual(self.history.total_bytes, size)
+        self.history.clear()
+        self.assertEqual(self.history.total_bytes, 0)
+        self.assertFalse(self.history.can_undo())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Character formatting of note text, kept as run-length spans.
+
+A style is a sorted tuple of format names, e.g. ("bold", "color:#ff0000");
+() is plain text. Styles are interned, so every run with the same
+formatting shares one tuple. In a note's JSON, text segments carry
+"spans": [length, style id, length, style id, ...] covering their content,
+and one leading {"type": "styles", "table": [[...], ...]} item maps the ids
+to format names. Older versions skip both.
+"""
+
+BOLD = "bold"
+ITALIC = "italic"
+UNDERLINE = "underline"
+OVERSTRIKE = "overstrike"
+HEADINGS = {"h1": 1.6, "h2": 1.3}  # Heading -> font scale
+COLOR_PREFIX = "color:"
+STYLES_TYPE = "styles"
+
+PLAIN = ()
+_interned = {PLAIN: PLAIN}
+
+
+def make_style(names):
+    style = tuple(sorted(set(names)))
+    return _interned.setdefault(style, style)
+
+
+def style_with(style, name):
+    return style if name in style else make_style(style + (name,))
+
+
+def style_without(style, name):
+    return make_style(n for n in style if n != name) if name in style else style
+
+
+def style_with_heading(style, heading):
+    """Replaces any heading in style (heading None removes it)."""
+    names = [n for n in style if n not in HEADINGS]
+    if heading is not None:
+        names.append(heading)
+    return make_style(names)
+
+
+def style_with_color(style, color):
+    """Replaces the text color in style (color None removes it)."""
+    names = [n for n in style if not n.startswith(COLOR_PREFIX)]
+    if color is not None:
+        names.append(COLOR_PREFIX + color)
+    return make_style(names)
+
+
+class StyleTable:
+    """Numbers the distinct styles of one note for its JSON form."""
+    def __init__(self, table=None):
+        self.styles = [make_style(names) for names in table or []]
+        self.ids = {style: i for i, style in enumerate(self.styles)}
+
+    def intern(self, style):
+        i = self.ids.get(style)
+        if i is None:
+            i = self.ids[style] = len(self.styles)
+            self.styles.append(style)
+        return i
+
+    def to_json(self):
+        return [list(style) for style in self.styles]
+
+    def encode(self, spans):
+        flat = []
+        for length, style in spans:
+            flat.append(length)
+            flat.append(self.intern(style))
+        return flat
+
+    def decode(self, flat):
+        """[length, id, ...] -> [(length, style), ...]; unknown ids read as plain text."""
+        styles = self.styles
+        spans = []
+        for i in range(0, len(flat) - 1, 2):
+            sid = flat[i + 1]
+            spans.append((flat[i], styles[sid] if isinstance(sid, int) and 0 <= sid < len(styles) else PLAIN))
+        return spans
+
+
+def merge_spans(spans):
+    """Joins neighbouring runs with the same style and drops empty ones; None if nothing is formatted."""
+    merged = []
+    for length, style in spans:
+        if not length:
+            continue
+        if merged and merged[-1][1] is style:
+            merged[-1] = (merged[-1][0] + length, style)
+        else:
+            merged.append((length, style))
+    if all(style is PLAIN for length, style in merged):
+        return None
+    return merged
@@ -0,0 +1,313 @@
+import bisect
+import mmap
+import os
+import threading
+import tkinter as tk
+from array import array
+from theme_manager import style
+
+INDEX_CHUNK = 4 * 1024 * 1024  # Bytes scanned for newlines per step of the index thread
+MAX_LINE_BYTES = 16 * 1024  # Longer lines are shown cut into pieces of this size
+STATUS_MS = 250  # Status refresh while the index is being built
+
+
+class LineIndex:
+    """
+    Byte offsets of line starts in a file, built on a background thread.
+    offsets only ever grows while the scan runs (array appends are atomic
+    under the GIL), so the Tk thread can look lines up in the part that is
+    already known; complete is set once the scan reached limit.
+    The scan reads the file through its own handle rather than the viewer's
+    mmap: a file that shrinks under it then just reads short, where touching
+    mapped pages past the new end would kill the process with SIGBUS.
+    extend_to() carries on from where the scan stopped when the file grows.
+    """
+    def __init__(self, path, size):
+        self.path = path
+        self.limit = size
+        self.scanned = 0  # Bytes scanned so far
+        self.offsets = array("Q", [0])
+        self.complete = False
+        self.cancelled = False
+        self.running = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.complete = False
+        threading.Thread(target=self._scan, daemon=True).start()
+
+    def extend_to(self, size):
+        """The file grew to size: index the new part too."""
+        with self.lock:
+            self.limit = size
+        self.start()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _scan(self):
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.scanned)
+                while not self.cancelled:
+                    with self.lock:
+                        pos, limit = self.scanned, self.limit
+                        if pos >= limit:
+                            self.complete = True
+                            self.running = False
+                            return
+                    chunk = f.read(min(INDEX_CHUNK, limit - pos))
+                    if not chunk:
+                        with self.lock:
+                            self.limit = pos  # Shrank; the viewer re-opens it
+                        continue
+                    batch = array("Q")
+                    find = chunk.find
+                    i = find(b"\n")
+                    while i != -1:
+                        batch.append(pos + i + 1)
+                        i = find(b"\n", i + 1)
+                    self.offsets.extend(batch)
+                    self.scanned = pos + len(chunk)
+        except OSError as e:
+            print(f"Could not index {self.path}: {e}")
+        with self.lock:
+            self.running = False
+
+    def known_lines(self):
+        n = len(self.offsets)
+        if self.complete and n > 1 and self.offsets[-1] >= self.limit:
+            n -= 1  # A trailing newline doesn't start another line
+        return n
+
+    def line_at(self, offset):
+        """0-based line number of a byte offset, or None if the scan hasn't got that far."""
+        offsets = self.offsets
+        if not self.complete and offset >= offsets[-1]:
+            return None
+        if offset >= self.limit and self.complete:
+            offset = max(0, self.limit - 1)
+        return bisect.bisect_right(offsets, offset) - 1
+
+
+class TextViewer(tk.Frame):
+    """
+    Read-only view of a (possibly huge) plain-text file.
+    The file is memory-mapped and only the lines that fit on screen are
+    decoded and put into the Text widget, so memory use doesn't depend on
+    the file size. Scrolling works on byte offsets (the scrollbar is a
+    fraction of the file), so jumping anywhere is instant even before the
+    line index has been built; the index only adds line numbers and
+    Ctrl+G (go to line).
+    """
+    def __init__(self, parent, **text_options):
+        super().__init__(parent)
+        self.mm = None
+        self.file = None
+        self.path = None
+        self.size = 0
+        self.index = None
+        self.top = 0  # Byte offset of the first shown line
+        self.bottom = 0  # Byte offset just past the last shown line
+        self.status_id = None
+
+        self.vbar = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.hbar = tk.Scrollbar(self, orient="horizontal")
+        self.text = style(tk.Text(self, wrap="none", relief="flat", state="disabled",
+                                  xscrollcommand=self.hbar.set, **text_options), "editor")
+        self.hbar.configure(command=self.text.xview)
+        self.status = style(tk.Label(self, anchor="w", font=("Consolas", 9)), "panel_label")
+        self.status.pack(side="bottom", fill="x")
+        self.hbar.pack(side="bottom", fill="x")
+        self.vbar.pack(side="right", fill="y")
+        self.text.pack(side="left", fill="both", expand=True)
+
+        self.text.bind("<Configure>", lambda e: self.render())
+        self.text.bind("<MouseWheel>", lambda e: self.scroll_lines(-3 if e.delta > 0 else 3))
+        self.text.bind("<Button-4>", lambda e: self.scroll_lines(-3))
+        self.text.bind("<Button-5>", lambda e: self.scroll_lines(3))
+        self.text.bind("<Up>", lambda e: self.scroll_lines(-1))
+        self.text.bind("<Down>", lambda e: self.scroll_lines(1))
+        self.text.bind("<Prior>", lambda e: self.scroll_lines(-self.page_lines()))
+        self.text.bind("<Next>", lambda e: self.scroll_lines(self.page_lines()))
+        self.text.bind("<Control-Home>", lambda e: self.show_from(0) or "break")
+        self.text.bind("<Control-End>", lambda e: self.show_end() or "break")
+        self.text.bind("<Control-g>", lambda e: self.ask_line() or "break")
+
+    def open(self, path, keep_position=False):
+        top = self.top if keep_position else 0
+        self.close()
+        self.path = path
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        # mmap can't map an empty file
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.index = LineIndex(path, self.size)
+        self.index.start()
+        self.top = self.line_start(min(top, self.size))
+        self.render()
+        self.update_status()
+
+    def reload(self):
+        """
+        Catches up with a change on disk, keeping the position. A file that
+        only grew (a log being appended to) is re-mapped and indexed from the
+        old end on; anything else (shrunk, replaced) is opened afresh.
+        """
+        if self.path is None:
+            return
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return  # Deleted; the app closes the viewer
+        if st.st_size == self.size:
+            return
+        old = os.fstat(self.file.fileno())
+        if st.st_size < self.size or (st.st_ino, st.st_dev) != (old.st_ino, old.st_dev):
+            self.open(self.path, keep_position=True)
+            return
+        mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm is not None:
+            self.mm.close()
+        self.mm = mm
+        self.size = len(mm)
+        self.index.extend_to(self.size)
+        self.render()
+        self.update_status()
+
+    def ensure_mapped(self):
+        """
+        Re-opens the file if it shrank since it was mapped: reading pages past
+        the new end of a mapped file raises SIGBUS, which would end the app.
+        Called before every read of the map.
+        """
+        if self.file is not None and os.fstat(self.file.fileno()).st_size < self.size:
+            self.open(self.path, keep_position=True)
+
+    def close(self):
+        if self.status_id is not None:
+            self.after_cancel(self.status_id)
+            self.status_id = None
+        if self.index is not None:
+            self.index.cancel()
+            self.index = None
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.size = 0
+        self.top = self.bottom = 0
+
+    # ---------------- Byte offsets ----------------
+
+    def line_start(self, offset):
+        """Start of the line containing offset."""
+        if offset <= 0 or self.mm is None:
+            return 0
+        return self.mm.rfind(b"\n", max(0, offset - MAX_LINE_BYTES), offset) + 1 or max(0, offset - MAX_LINE_BYTES)
+
+    def next_line(self, offset):
+        i = self.mm.find(b"\n", offset, offset + MAX_LINE_BYTES)
+        return min(self.size, offset + MAX_LINE_BYTES) if i == -1 else i + 1
+
+    def prev_line(self, offset):
+        return self.line_start(offset - 1) if offset > 0 else 0
+
+    # ---------------- Display ----------------
+
+    def page_lines(self):
+        height = self.text.winfo_height()
+        linespace = max(1, self.text.tk.call("font", "metrics", self.text.cget("font"), "-linespace"))
+        return max(1, height // linespace)
+
+    def render(self):
+        self.ensure_mapped()
+        lines = []
+        pos = self.top
+        if self.mm is not None:
+            for _ in range(self.page_lines() + 1):
+                if pos >= self.size:
+                    break
+                end = self.next_line(pos)
+                lines.append(self.mm[pos:end].decode("utf-8", "replace").rstrip("\r\n"))
+                pos = end
+        self.bottom = pos
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", "\n".join(lines))
+        self.text.configure(state="disabled")
+        if self.size:
+            self.vbar.set(self.top / self.size, self.bottom / self.size)
+        else:
+            self.vbar.set(0, 1)
+
+    def show_from(self, offset):
+        self.ensure_mapped()
+        self.top = self.line_start(max(0, min(offset, self.size)))
+        self.render()
+        self.update_status()
+
+    def show_end(self):
+        self.ensure_mapped()
+        pos = self.size
+        for _ in range(self.page_lines()):
+            pos = self.prev_line(pos)
+        self.show_from(pos)
+
+    def scroll_lines(self, n):
+        self.ensure_mapped()
+        if self.mm is None:
+            return "break"
+        pos = self.top
+        for _ in range(abs(n)):
+            nxt = self.next_line(pos) if n > 0 else self.prev_line(pos)
+            if nxt >= self.size and n > 0:
+                break
+            pos = nxt
+        self.show_from(pos)
+        return "break"
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.show_from(int(float(args[1]) * self.size))
+        elif args[0] == "scroll":
+            count = int(args[1])
+            self.scroll_lines(count * self.page_lines() if args[2] == "pages" else count)
+
+    def goto_line(self, number):
+        """Shows 1-based line number at the top. Returns False if the index hasn't reached it yet."""
+        if self.index is None:
+            return False
+        offsets = self.index.offsets
+        if number > self.index.known_lines():
+            if not self.index.complete:
+                return False
+            number = self.index.known_lines()
+        self.show_from(offsets[max(0, number - 1)])
+        return True
+
+    def ask_line(self):
+        from tkinter import simpledialog
+        number = simpledialog.askinteger("Go to Line", "Line number:", parent=self, minvalue=1)
+        if number is not None and not self.goto_line(number):
+            self.status.configure(text=f"Line {number:,} not indexed yet")
+
+    def update_status(self):
+        if self.status_id is not None:
+            self.after_cancel(self.status_id)  # Called directly while a refresh is pending
+        self.status_id = None
+        if self.index is None:
+            return
+        line = self.index.line_at(self.top)
+        where = f"Line {line + 1:,}" if line is not None else "Line ?"
+        if self.index.complete:
+            self.status.configure(text=f"{where} of {self.index.known_lines():,}  (read-only)")
+        else:
+            self.status.configure(text=f"{where} of {self.index.known_lines():,}+  (indexing, read-only)")
+            self.status_id = self.after(STATUS_MS, self.update_status)
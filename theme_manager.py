@@ -1,5 +1,7 @@
 import json
 import os
+import threading
+from perf_monitor import timed
 
 THEME_FILE = "theme.json"
 
@@ -10,11 +12,16 @@ DEFAULT_THEMES = {
         "panel_bg": "#0B0B0B",
         "toolbar_bg": "#101010",
         "accent": "#007acc",
+        "button_fg": "#ffffff",
         "entry_bg": "#292929",
         "entry_fg": "#ffffff",
         "list_bg": "#000000",
         "list_fg": "#ffffff",
-        "list_select": "#333333"
+        "list_select": "#333333",
+        "cell_bg": "#1e1e1e",
+        "cell_fg": "#ffffff",
+        "cell_grid": "#3c3c3c",
+        "sizer": "#444444"
     },
     "Light": {
         "bg": "#fdfdfd",
@@ -22,21 +29,69 @@ DEFAULT_THEMES = {
         "panel_bg": "#f0f0f0",
         "toolbar_bg": "#f0f0f0",
         "accent": "#0078d4",
+        "button_fg": "#ffffff",
         "entry_bg": "#ffffff",
         "entry_fg": "#202124",
         "list_bg": "#f0f0f0",
         "list_fg": "#202124",
-        "list_select": "#e0e0e0"
+        "list_select": "#e0e0e0",
+        "cell_bg": "#ffffff",
+        "cell_fg": "#000000",
+        "cell_grid": "#c8c8c8",
+        "sizer": "#999999"
     }
 }
 
+# Style name -> {Tk option: palette color}. Widgets are tagged with a style
+# (see style()), and a theme switch restyles every tagged widget at once.
+STYLES = {
+    "root": {"bg": "bg"},
+    "frame": {"bg": "bg"},
+    "toolbar": {"bg": "toolbar_bg"},
+    "toolbar_button": {"bg": "accent", "fg": "button_fg", "activebackground": "list_select"},
+    "toolbar_label": {"bg": "toolbar_bg", "fg": "fg"},
+    "panel": {"bg": "panel_bg"},
+    "panel_label": {"bg": "panel_bg", "fg": "fg"},
+    "panel_button": {"bg": "panel_bg", "fg": "fg", "activebackground": "list_select"},
+    "entry": {"bg": "entry_bg", "fg": "entry_fg", "insertbackground": "fg"},
+    "list": {"bg": "list_bg", "fg": "list_fg", "selectbackground": "list_select", "selectforeground": "list_fg"},
+    "editor": {"bg": "entry_bg", "fg": "entry_fg", "insertbackground": "fg"},
+    "cell": {"bg": "cell_bg", "fg": "cell_fg", "insertbackground": "cell_fg"},
+    "cell_canvas": {"bg": "cell_bg"},
+    "sizer": {"bg": "sizer"},
+    "outline": {"bg": "accent"},
+    # Canvas items of virtual tables (used with create_rectangle/create_text)
+    "cell_rect": {"fill": "cell_bg", "outline": "cell_grid"},
+    "cell_text": {"fill": "cell_fg"},
+}
+
+
 class ThemeManager:
+    """
+    Current theme plus its resolved palette and styles.
+    Palettes (defaults merged with theme.json) and the per-style option
+    strings are computed once per theme and cached, so switching back and
+    forth costs nothing but the restyle itself. apply() restyles a whole
+    widget tree (embedded cards and tables included) in one Tcl call,
+    coalesced into a single idle callback.
+    """
+    active = None  # The app's ThemeManager; widgets read their colors through style_options()
+
     def __init__(self):
         self.current_theme_name = "Dark"
         self.colors = DEFAULT_THEMES["Dark"].copy()
+        self.palettes = {}  # theme name -> resolved colors
+        self.options = {}  # theme name -> {style: {Tk option: color}}
+        self.fragments = {}  # theme name -> {style: "-bg {#...} -fg {#...}"}
+        self.apply_id = None
+        self.lock = threading.Lock()
+        self.pending_save = None
+        self.writer = None
         self.load_theme()
+        ThemeManager.active = self
 
     def load_theme(self):
+        # A few hundred bytes, and needed before the first paint, so this one read stays synchronous
         if os.path.exists(THEME_FILE):
             try:
                 with open(THEME_FILE, "r") as f:
@@ -45,20 +100,127 @@ class ThemeManager:
                     self.colors = data.get("colors", DEFAULT_THEMES["Dark"])
             except Exception:
                 pass
+        self.forget(self.current_theme_name)
+        self.palettes[self.current_theme_name] = self.resolve(self.current_theme_name, self.colors)
 
     def save_theme(self):
+        """Queues theme.json for writing on a background thread; back-to-back saves collapse into one."""
         data = {
             "name": self.current_theme_name,
             "colors": self.colors
         }
-        with open(THEME_FILE, "w") as f:
-            json.dump(data, f)
+        with self.lock:
+            self.pending_save = data
+            if self.writer is not None:
+                return
+            self.writer = threading.Thread(target=self._write_pending, daemon=True)
+        self.writer.start()
+
+    def _write_pending(self):
+        from autosave import atomic_write_json
+        while True:
+            with self.lock:
+                data, self.pending_save = self.pending_save, None
+                if data is None:
+                    self.writer = None
+                    return
+            try:
+                atomic_write_json(THEME_FILE, data)
+            except OSError as e:
+                print(f"Could not save theme: {e}")
+
+    def flush(self):
+        """Waits for a queued theme.json write (before exit)."""
+        writer = self.writer
+        if writer is not None:
+            writer.join()
 
     def set_theme(self, theme_name):
         if theme_name in DEFAULT_THEMES:
             self.current_theme_name = theme_name
             self.colors = DEFAULT_THEMES[theme_name].copy()
+            # A palette cached from a customised theme.json no longer applies
+            if self.palettes.get(theme_name) != self.colors:
+                self.forget(theme_name)
             self.save_theme()
 
+    def forget(self, theme_name):
+        self.palettes.pop(theme_name, None)
+        self.options.pop(theme_name, None)
+        self.fragments.pop(theme_name, None)
+
     def get_color(self, key):
-        return self.colors.get(key, "#000000")
+        return self.palette().get(key, "#000000")
+
+    def resolve(self, name, colors):
+        # theme.json from older versions lacks newer keys such as the table cell colors
+        palette = dict(DEFAULT_THEMES.get(name, DEFAULT_THEMES["Dark"]))
+        palette.update(colors)
+        return palette
+
+    def palette(self):
+        palette = self.palettes.get(self.current_theme_name)
+        if palette is None:
+            palette = self.palettes[self.current_theme_name] = self.resolve(self.current_theme_name, self.colors)
+        return palette
+
+    def style_options(self, style):
+        options = self.options.setdefault(self.current_theme_name, {})
+        if style not in options:
+            palette = self.palette()
+            options[style] = {option: palette.get(key, "#000000") for option, key in STYLES[style].items()}
+        return options[style]
+
+    def style_fragments(self):
+        fragments = self.fragments.get(self.current_theme_name)
+        if fragments is None:
+            fragments = {}
+            for style in STYLES:
+                fragments[style] = " ".join(f"-{option} {{{value}}}" for option, value in self.style_options(style).items())
+            self.fragments[self.current_theme_name] = fragments
+        return fragments
+
+    def apply(self, root):
+        """Schedules one restyle of root's whole widget tree; calls before it runs coalesce."""
+        if self.apply_id is None:
+            self.apply_id = root.after_idle(self._apply_now, root)
+
+    @timed("apply_theme")
+    def _apply_now(self, root):
+        self.apply_id = None
+        fragments = self.style_fragments()
+        script = []
+        hooks = []
+        stack = [root]
+        while stack:
+            widget = stack.pop()
+            style = getattr(widget, "theme_style", None)
+            if style is not None:
+                # Tk may have destroyed it already (e.g. an embed deleted with its text) while
+                # tkinter still lists it; one stale path must not abort the whole script
+                script.append(f"if {{[winfo exists {widget._w}]}} {{{widget._w} configure {fragments[style]}}}")
+            if hasattr(widget, "on_theme_changed"):
+                hooks.append(widget)
+            stack.extend(widget.children.values())
+        # One round trip into Tcl instead of one configure() call per widget
+        if script:
+            root.tk.eval("\n".join(script))
+        for widget in hooks:
+            if widget.winfo_exists():
+                widget.on_theme_changed()
+
+
+def style_options(style):
+    """Current Tk options for a style (the Dark defaults before the app has a ThemeManager)."""
+    tm = ThemeManager.active
+    if tm is not None:
+        return tm.style_options(style)
+    palette = DEFAULT_THEMES["Dark"]
+    return {option: palette[key] for option, key in STYLES[style].items()}
+
+
+def style(widget, name):
+    """Tags widget with a style from STYLES and gives it the current colors."""
+    widget.theme_style = name
+    widget.configure(**style_options(name))
+    return widget
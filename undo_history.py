@@ -0,0 +1,277 @@
+import time
+from collections import deque
+
+UNDO_MAX_BYTES = 4 * 1024 * 1024  # Rough memory cap for the whole history
+UNDO_MAX_STEPS = 1000
+COALESCE_SECONDS = 1.0  # Edits to the same thing closer together than this undo as one step
+OP_OVERHEAD = 64  # Rough per-operation bookkeeping cost in bytes
+
+
+def string_delta(old, new):
+    """
+    Smallest single replacement turning old into new: (start, removed, inserted).
+    Prefix/suffix are found by binary search over slice compares, so the
+    Python-level work is O(log n) even for very long strings.
+    """
+    n = min(len(old), len(new))
+    lo, hi = 0, n
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[:mid] == new[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    start = lo
+    lo, hi = 0, n - start
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[len(old) - mid:] == new[len(new) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return start, old[start:len(old) - lo], new[start:len(new) - lo]
+
+
+class Operation:
+    """One undoable step. size is an estimate in bytes used for the memory cap."""
+    size = OP_OVERHEAD
+
+    def undo(self):
+        raise NotImplementedError
+
+    def redo(self):
+        raise NotImplementedError
+
+    def merge(self, other):
+        """Absorbs a following op (typing bursts). Returns True if merged."""
+        return False
+
+
+class TextEditOp(Operation):
+    """
+    Edits to the editor's own text. Tk already keeps those as compact
+    deltas in its native undo stack, so this only remembers how many of
+    Tk's separator-delimited groups belong to this step.
+
+    Tk's undo brings deleted text back but neither its formatting tags nor
+    embedded windows, so a delete keeps the (start, end, runs) formatting of
+    the deleted text in format, and cards/tables inside the range are taken
+    out just before the delete and kept in embeds as (index, segment), in
+    the order they were removed.
+    """
+    def __init__(self, editor, embeds=(), groups=1, format=None):
+        self.editor = editor
+        self.embeds = list(embeds)
+        self.format = format
+        self.groups = groups
+        self.time = time.monotonic()
+        self.size = OP_OVERHEAD + sum(_estimate(segment) for index, segment in self.embeds)
+        if format is not None:
+            self.size += 32 * len(format[2])
+
+    def undo(self):
+        for _ in range(self.groups):
+            self.editor.native_undo()
+        if self.format is not None:
+            self.editor.apply_runs(*self.format)
+        for index, segment in reversed(self.embeds):
+            self.editor.insert_embed_at(index, segment)
+
+    def redo(self):
+        for index, segment in self.embeds:
+            self.editor.remove_embed_at(index)
+        for _ in range(self.groups):
+            self.editor.native_redo()
+
+    def merge(self, other):
+        # A delete that took embeds or formatting along starts a step of its own (they are restored last)
+        if (isinstance(other, TextEditOp) and not other.embeds and other.format is None
+                and other.time - self.time < COALESCE_SECONDS):
+            self.groups += other.groups
+            self.time = other.time
+            return True
+        return False
+
+
+class FieldOp(Operation):
+    """A field of a card/table segment changed, e.g. ("cell", r, c), "title", "bg", "size" or "shape"."""
+    def __init__(self, editor, segment, field, old, new):
+        self.editor = editor
+        self.segment = segment
+        self.field = field
+        self.old = old
+        self.new = new
+        self.time = time.monotonic()
+        self.size = OP_OVERHEAD + _estimate(old) + _estimate(new)
+
+    def undo(self):
+        self.editor.apply_field(self.segment, self.field, self.old)
+
+    def redo(self):
+        self.editor.apply_field(self.segment, self.field, self.new)
+
+    def merge(self, other):
+        if (isinstance(other, FieldOp) and other.segment is self.segment and other.field == self.field
+                and self.field not in ("shape",) and other.time - self.time < COALESCE_SECONDS):
+            self.new = other.new
+            self.time = other.time
+            self.size = OP_OVERHEAD + _estimate(self.old) + _estimate(self.new)
+            return True
+        return False
+
+
+class StringDeltaOp(Operation):
+    """Long string fields (card bodies) are stored as replacement deltas, not full copies."""
+    def __init__(self, editor, segment, field, old, new):
+        self.editor = editor
+        self.segment = segment
+        self.field = field
+        self.deltas = [string_delta(old, new)]
+        self.time = time.monotonic()
+        self.size = OP_OVERHEAD + _estimate(self.deltas)
+
+    def _apply(self, deltas, reverse):
+        value = getattr(self.segment, self.field)
+        for start, removed, inserted in deltas:
+            if reverse:
+                removed, inserted = inserted, removed
+            value = value[:start] + inserted + value[start + len(removed):]
+        self.editor.apply_field(self.segment, self.field, value)
+
+    def undo(self):
+        self._apply(reversed(self.deltas), True)
+
+    def redo(self):
+        self._apply(self.deltas, False)
+
+    def merge(self, other):
+        if (isinstance(other, StringDeltaOp) and other.segment is self.segment and other.field == self.field
+                and other.time - self.time < COALESCE_SECONDS):
+            self.deltas.extend(other.deltas)
+            self.time = other.time
+            self.size += other.size - OP_OVERHEAD
+            return True
+        return False
+
+
+class EmbedOp(Operation):
+    """A card/table was inserted (inserted=True) or deleted at a text index."""
+    def __init__(self, editor, segment, index, inserted):
+        self.editor = editor
+        self.segment = segment
+        self.index = index
+        self.inserted = inserted
+        self.size = OP_OVERHEAD + _estimate(segment)
+
+    def undo(self):
+        if self.inserted:
+            self.editor.remove_embed_at(self.index)
+        else:
+            self.editor.insert_embed_at(self.index, self.segment)
+
+    def redo(self):
+        if self.inserted:
+            self.editor.insert_embed_at(self.index, self.segment)
+        else:
+            self.editor.remove_embed_at(self.index)
+
+
+class FormatOp(Operation):
+    """Formatting of the text between two indexes changed; old/new are its (start, end, style) runs."""
+    def __init__(self, editor, start, end, old, new):
+        self.editor = editor
+        self.start = start
+        self.end = end
+        self.old = old
+        self.new = new
+        self.size = OP_OVERHEAD + 32 * (len(old) + len(new))
+
+    def undo(self):
+        self.editor.apply_runs(self.start, self.end, self.old)
+
+    def redo(self):
+        self.editor.apply_runs(self.start, self.end, self.new)
+
+
+def _estimate(value):
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return 8 * len(value) + sum(_estimate(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_estimate(v) + 8 for v in value.values())
+    if hasattr(value, "values"):  # TableSegment
+        return _estimate(value.values)
+    if hasattr(value, "content"):
+        return len(value.content) + len(getattr(value, "title", ""))
+    return 8
+
+
+class UndoHistory:
+    """
+    Undo/redo stacks of small operations with a memory cap.
+    Oldest steps are dropped once the estimated size exceeds max_bytes
+    or the number of steps exceeds max_steps.
+    """
+    def __init__(self, max_bytes=UNDO_MAX_BYTES, max_steps=UNDO_MAX_STEPS):
+        self.max_bytes = max_bytes
+        self.max_steps = max_steps
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.total_bytes = 0
+        self.replaying = False  # True while undo/redo applies ops, so they aren't recorded again
+
+    def push(self, op):
+        if self.replaying:
+            return
+        self.redo_stack.clear()
+        if self.undo_stack:
+            top = self.undo_stack[-1]
+            before = top.size
+            if top.merge(op):
+                self.total_bytes += top.size - before
+                self._trim()
+                return
+        self.undo_stack.append(op)
+        self.total_bytes += op.size
+        self._trim()
+
+    def _trim(self):
+        while len(self.undo_stack) > 1 and (self.total_bytes > self.max_bytes or len(self.undo_stack) > self.max_steps):
+            self.total_bytes -= self.undo_stack.popleft().size
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        if not self.undo_stack:
+            return False
+        op = self.undo_stack.pop()
+        self.total_bytes -= op.size
+        self._replay(op.undo)
+        self.redo_stack.append(op)
+        return True
+
+    def redo(self):
+        if not self.redo_stack:
+            return False
+        op = self.redo_stack.pop()
+        self._replay(op.redo)
+        self.undo_stack.append(op)
+        self.total_bytes += op.size
+        return True
+
+    def _replay(self, func):
+        self.replaying = True
+        try:
+            func()
+        finally:
+            self.replaying = False
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.total_bytes = 0
@@ -1,5 +1,13 @@
+import bisect
+import csv
 import tkinter as tk
-from tkinter import ttk, colorchooser, simpledialog, messagebox
+import tkinter.font as tkfont
+from note_document import CardSegment, TableSegment
+from theme_manager import style, style_options
+from table_data import TableReader, write_table, sort_rows, filter_rows
+from perf_monitor import timed
+
+OUTLINE_WIDTH = 2  # Resize preview border, in pixels
 
 class ResizableFrame(tk.Frame):
     def __init__(self, parent, width=200, height=150, bg="gray", **kwargs):
@@ -7,6 +15,8 @@ class ResizableFrame(tk.Frame):
         self.parent = parent
         self.pack_propagate(False)
         self.bg_color = bg
+        self.change_count = 0  # Bumped on every user edit, see mark_changed
+        self.rebinding = False  # True while widgets are filled from the segment (not a user edit)
         
         # Context Menu
         self.menu = tk.Menu(self, tearoff=0)
@@ -17,35 +27,124 @@ class ResizableFrame(tk.Frame):
         self.bind("<Button-3>", self.show_menu)
         
         # Resize handle
-        self.sizer = tk.Frame(self, bg="#444", width=10, height=10, cursor="sizing")
+        self.sizer = style(tk.Frame(self, width=10, height=10, cursor="sizing"), "sizer")
         self.sizer.place(relx=1.0, rely=1.0, anchor="se")
+        self.sizer.bind("<ButtonPress-1>", self.start_resize)
         self.sizer.bind("<B1-Motion>", self.do_resize)
+        self.sizer.bind("<ButtonRelease-1>", self.end_resize)
+        self.resize_start = None
+        self.preview_size = None
+        self.outline = None  # Frames drawing the drag preview in the parent
+
+        # Keep the segment's size in sync instead of asking winfo_* at save time
+        self.bind("<Configure>", self.on_configure)
 
     def show_menu(self, event):
         self.menu.post(event.x_root, event.y_root)
 
+    def start_resize(self, event):
+        self.resize_start = (self.winfo_width(), self.winfo_height())
+        self.preview_size = self.resize_start
+
+    def end_resize(self, event):
+        if self.resize_start is None:
+            return
+        self.hide_outline()
+        start, size = self.resize_start, self.preview_size
+        self.resize_start = self.preview_size = None
+        if size != start:
+            # The real (expensive) relayout of the hosting Text happens once, here
+            self.schedule_layout("size", lambda: self.apply_size(*size))
+            self.record_field("size", start, size)
+
     def do_resize(self, event):
-        w, h = self.winfo_width(), self.winfo_height()
-        new_w = w + event.x
-        new_h = h + event.y
+        # While dragging only an outline moves; the frame keeps its size
+        new_w = event.x_root - self.winfo_rootx()
+        new_h = event.y_root - self.winfo_rooty()
         if new_w > 50 and new_h > 50:
-            self.config(width=new_w, height=new_h)
-            
-            # Since this is embedded in a text widget, we might need to update the window_configure
-            # But usually, just resizing the frame is enough if the Text widget knows it's a window.
-            # However, for smooth interaction inside a tk.Text, we often need to re-configure the window size via the Text widget method if exact control is needed.
-            # For this simple implementation, direct config works but might be slightly jittery.
+            self.preview_size = (new_w, new_h)
+            self.schedule_layout("outline", self.draw_outline)
+
+    def draw_outline(self):
+        if self.preview_size is None:
+            return
+        w, h = self.preview_size
+        x = self.winfo_rootx() - self.parent.winfo_rootx()
+        y = self.winfo_rooty() - self.parent.winfo_rooty()
+        if self.outline is None:
+            self.outline = [style(tk.Frame(self.parent), "outline") for _ in range(4)]
+        t = OUTLINE_WIDTH
+        edges = ((x, y, w, t), (x, y + h - t, w, t), (x, y, t, h), (x + w - t, y, t, h))
+        for frame, (fx, fy, fw, fh) in zip(self.outline, edges):
+            frame.place(x=fx, y=fy, width=fw, height=fh)
+            frame.lift()
+
+    def hide_outline(self):
+        if self.outline is not None:
+            for frame in self.outline:
+                frame.destroy()
+            self.outline = None
+
+    def apply_size(self, width, height):
+        self.config(width=width, height=height)
+        self.segment.width, self.segment.height = width, height
+        self.mark_changed()
+
+    def schedule_layout(self, name, func):
+        """Runs func with the hosting editor's next layout pass (right away outside an editor)."""
+        layout = getattr(self.parent, "layout", None)
+        if layout is None:
+            func()
+        else:
+            layout.request((str(self), name), func)
+
+    def mark_changed(self):
+        if self.rebinding:
+            return
+        # Tell the hosting editor so its unsaved-changes check stays O(1)
+        self.change_count += 1
+        notify = getattr(self.parent, "note_widget_changed", None)
+        if notify is not None:
+            notify(self)
+
+    def record_field(self, field, old, new):
+        # Hand the change to the editor's undo history
+        if self.rebinding or old == new:
+            return
+        record = getattr(self.parent, "record_field", None)
+        if record is not None:
+            record(self.segment, field, old, new)
+
+    def set_field(self, field, value):
+        """Applies an undo/redo value; subclasses handle their own fields."""
+        if field == "size":
+            self.schedule_layout("size", lambda: self.apply_size(*value))
+
+    def on_configure(self, event):
+        segment = getattr(self, "segment", None)
+        if segment is not None:
+            segment.width = event.width
+            segment.height = event.height
 
     def show_properties(self):
         pass
 
     def delete_widget(self):
-        self.destroy()
+        # Let the editor remove it (undoably) so it no longer shows up in the document
+        delete_embed = getattr(self.parent, "delete_embed", None)
+        if delete_embed is not None:
+            delete_embed(self)
+        else:
+            self.mark_changed()
+            self.destroy()
 
 class CardWidget(ResizableFrame):
     def __init__(self, parent, title="Title", content="Content", bg="#333333", fg="#ffffff", **kwargs):
         super().__init__(parent, bg=bg, **kwargs)
+        self.segment = CardSegment(title=title, content=content, bg=bg,
+                                   width=kwargs.get("width", 200), height=kwargs.get("height", 120))
         self.title_var = tk.StringVar(value=title)
+        self.title_var.trace_add("write", self.on_title_changed)
         
         # Header Frame
         self.header_frame = tk.Frame(self, bg=bg, height=25)
@@ -62,49 +161,114 @@ class CardWidget(ResizableFrame):
         
         self.text_body = tk.Text(self, bg=bg, fg=fg, font=("Consolas", 10), relief="flat", wrap="word", padx=5, pady=5)
         self.text_body.insert("1.0", content)
+        self.text_body.edit_modified(False)
         self.text_body.pack(fill="both", expand=True, padx=2, pady=(0, 2))
         
+        self.text_body.bind("<<Modified>>", self.on_body_modified)
         self.text_body.bind("<Button-3>", self.show_menu)
+        # Card edits are steps in the editor's history, not the body's own undo stack
+        if hasattr(parent, "history"):
+            self.text_body.bind("<<Undo>>", lambda e: parent.undo() or "break")
+            self.text_body.bind("<<Redo>>", lambda e: parent.redo() or "break")
         self.lbl_title.bind("<Button-3>", self.show_menu)
         self.sizer.lift()
 
+    def on_title_changed(self, *args):
+        old, self.segment.title = self.segment.title, self.title_var.get()
+        self.record_field("title", old, self.segment.title)
+        self.mark_changed()
+
+    def on_body_modified(self, event):
+        # <<Modified>> only fires when the flag flips, so reset it after each sync
+        if self.text_body.edit_modified():
+            old, self.segment.content = self.segment.content, self.text_body.get("1.0", "end-1c")
+            self.text_body.edit_modified(False)
+            self.record_field("content", old, self.segment.content)
+            self.mark_changed()
+
     def choose_color(self):
+        from tkinter import colorchooser  # Dialog modules load on first use, not at startup
         color = colorchooser.askcolor(title="Choose Card Color", initialcolor=self.bg_color)[1]
         if color:
             self.configure_color(color)
 
     def configure_color(self, color):
+        self.record_field("bg", self.bg_color, color)
         self.configure(bg=color)
         self.header_frame.configure(bg=color)
         self.lbl_title.configure(bg=color)
         self.btn_color.configure(bg=color)
         self.text_body.configure(bg=color)
         self.bg_color = color
+        self.segment.bg = color
+        self.mark_changed()
 
     def show_properties(self):
         self.choose_color()
 
+    def set_field(self, field, value):
+        if field == "title":
+            self.title_var.set(value)
+        elif field == "content":
+            self.text_body.delete("1.0", "end")
+            self.text_body.insert("1.0", value)
+            # Sync directly; the queued <<Modified>> must not look like a new edit
+            self.text_body.edit_modified(False)
+            self.segment.content = value
+            self.mark_changed()
+        elif field == "bg":
+            self.configure_color(value)
+        else:
+            super().set_field(field, value)
+
+    def rebind(self, segment):
+        """Shows another CardSegment in this (pooled) card."""
+        self.rebinding = True
+        try:
+            self.segment = segment
+            self.title_var.set(segment.title)
+            self.text_body.delete("1.0", "end")
+            self.text_body.insert("1.0", segment.content)
+            self.text_body.edit_modified(False)
+            self.text_body.edit_reset()
+            self.configure_color(segment.bg)
+            self.config(width=segment.width, height=segment.height)
+        finally:
+            self.rebinding = False
+
     def get_data(self):
-        return {
-            "type": "card",
-            "width": self.winfo_width(),
-            "height": self.winfo_height(),
-            "title": self.title_var.get(),
-            "content": self.text_body.get("1.0", "end-1c"),
-            "bg": self.bg_color
-        }
+        return self.segment.to_dict()
 
 class TableWidget(ResizableFrame):
-    def __init__(self, parent, rows=3, cols=3, cell_width=10, cell_height=1, align="center", **kwargs):
+    def __init__(self, parent, rows=3, cols=3, cell_width=10, cell_height=1, align="center", data=None, segment=None, **kwargs):
         super().__init__(parent, **kwargs)
+        # An existing segment (e.g. from a loaded document) is adopted as-is, without copying cells
+        self.segment = segment or TableSegment(rows=rows, cols=cols, cell_width=cell_width, align=align,
+                                               width=kwargs.get("width", 300), height=kwargs.get("height", 150),
+                                               bg=self.bg_color, data=data)
         self.rows = rows
         self.cols = cols
         self.cell_width = cell_width  # Can be int, str, or list
         self.cell_height = cell_height
         self.align = align  # "left", "center", "right"
         self.cells = []
+        self.editing = None  # (r, c) of the focused cell, which shows its formula instead of the result
+        self.showing = False  # True while Entries are refreshed with results (not user edits)
+        self.view = None  # Segment rows in display order while sorted/filtered (None: all rows, in order)
+        self.view_pos = None  # Segment row -> display row, for the rows in view
+        self.visible_rows = 0  # Entry rows currently gridded
+        self.menu_col = 0  # Column the context menu was opened on
+        self.importing = None  # TableReader of an import in progress
         
         self.menu.add_command(label="Settings", command=self.show_properties)
+        self.menu.add_separator()
+        self.menu.add_command(label="Sort Ascending", command=lambda: self.sort_column(False))
+        self.menu.add_command(label="Sort Descending", command=lambda: self.sort_column(True))
+        self.menu.add_command(label="Filter Column...", command=self.filter_column)
+        self.menu.add_command(label="Show All Rows", command=lambda: self.set_view(None))
+        self.menu.add_separator()
+        self.menu.add_command(label="Import CSV/TSV...", command=self.import_file)
+        self.menu.add_command(label="Export CSV/TSV...", command=self.export_file)
 
         # Header for Settings
         self.header_frame = tk.Frame(self, bg=self.bg_color, height=20)
@@ -122,68 +286,300 @@ class TableWidget(ResizableFrame):
         
         self.build_table()
 
+    @timed("build_table")
     def build_table(self):
-        # 1. Preserve existing data
-        old_data = []
-        # Check if cells exist (first run they don't)
-        if hasattr(self, 'cells') and self.cells:
-             # get_data returns a dict, we need the 'data' list from it
-             # But self.get_data() relies on self.rows/cols which might have just changed if this is called after updating attributes?
-             # Actually get_data uses len(self.cells), so it's safe to call on *current* state.
-             try:
-                 old_data = self.get_data().get("data", [])
-             except:
-                 old_data = []
-
-        # Clear existing
-        for widget in self.grid_frame.winfo_children():
-            widget.destroy()
-        
-        self.cells = []
+        """
+        Brings the Entry grid in line with rows/cols/cell_width/align.
+        Only rows and columns that were added or removed are created or
+        destroyed; surviving cells are reconfigured in place.
+        """
+        # Cell values live in self.segment, so nothing needs to be read back out of the Entries
+        self.segment.resize(self.rows, self.cols)
+        if self.view is not None:
+            self.view = self.view_pos = None
+            self.show_view()
+        self.segment.cell_width = self.cell_width
+        self.segment.align = self.align
+
         justify_map = {"left": "left", "center": "center", "right": "right"}
         justify_val = justify_map.get(self.align, "center")
-        
+        widths = self.parse_widths()
+        old_rows = len(self.cells)
+        old_cols = len(self.cells[0]) if self.cells else 0
+
         # Ensure sizer is on top
         self.sizer.lift()
 
-        # Reset grid weights for unused columns to prevent ghost spacing
-        for i in range(20):
-             self.grid_frame.grid_columnconfigure(i, weight=0)
+        # Drop removed rows, then removed columns of the surviving rows
+        for row_cells in self.cells[self.rows:]:
+            for e in row_cells:
+                e.destroy()
+        del self.cells[self.rows:]
+        for r in range(self.rows, old_rows):
+            self.grid_frame.grid_rowconfigure(r, weight=0)
+
+        for row_cells in self.cells:
+            for e in row_cells[self.cols:]:
+                e.destroy()
+            del row_cells[self.cols:]
+        # Zero the weights of removed columns to prevent ghost spacing
+        for c in range(self.cols, old_cols):
+            self.grid_frame.grid_columnconfigure(c, weight=0)
+
+        # Reconfigure surviving cells only where something actually changed
+        for row_cells in self.cells:
+            for c, e in enumerate(row_cells):
+                w = widths[c % len(widths)]
+                if int(e.cget("width")) != w or e.cget("justify") != justify_val:
+                    e.configure(width=w, justify=justify_val)
+
+        # Add new columns to surviving rows, then whole new rows
+        for r, row_cells in enumerate(self.cells):
+            for c in range(len(row_cells), self.cols):
+                row_cells.append(self.make_cell(r, c, widths[c % len(widths)], justify_val))
+        for r in range(len(self.cells), self.rows):
+            self.cells.append([self.make_cell(r, c, widths[c % len(widths)], justify_val) for c in range(self.cols)])
+
+        for r in range(old_rows, self.rows):
+            self.grid_frame.grid_rowconfigure(r, weight=1)
+        for c in range(old_cols, self.cols):
+            self.grid_frame.grid_columnconfigure(c, weight=1)
+        self.visible_rows = len(self.cells)
+
+    def make_cell(self, r, c, width, justify):
+        var = tk.StringVar(value=self.segment.display(r, c))
+        var.trace_add("write", lambda *args, r=r, c=c, var=var: self.on_cell_changed(r, c, var))
+        e = tk.Entry(self.grid_frame, textvariable=var, relief="solid", bd=1, justify=justify, font=("Consolas", 10),
+                     **style_options("cell"))
+        e.theme_style = "cell"
+        e.configure(width=width)
+        e.var = var
+        e.grid(row=r, column=c, sticky="nsew", padx=0, pady=0)
+        e.bind("<Button-3>", lambda event, c=c: self.show_cell_menu(event, c))
+        e.bind("<FocusIn>", lambda event, r=r, c=c: self.on_cell_focus(r, c))
+        e.bind("<FocusOut>", lambda event, r=r, c=c: self.on_cell_blur(r, c))
+        return e
 
-        # Parse widths
-        widths = []
+    def on_cell_focus(self, r, c):
+        self.editing = (r, c)
+        if r < self.shown_rows() and c < self.cols:
+            self.show_cell(r, c)
+
+    def on_cell_blur(self, r, c):
+        if self.editing == (r, c):
+            self.editing = None
+        if r < self.shown_rows() and c < self.cols:
+            self.show_cell(r, c)
+
+    def show_cell(self, r, c):
+        """Refreshes the Entry at display row r (segment row data_row(r))."""
+        # The cell being edited shows its formula, every other cell its result
+        dr = self.data_row(r)
+        value = self.segment.get_cell(dr, c) if self.editing == (r, c) else self.segment.display(dr, c)
+        var = self.cells[r][c].var
+        if var.get() != value:
+            was_showing, self.showing = self.showing, True
+            try:
+                var.set(value)
+            finally:
+                self.showing = was_showing
+
+    def show_changes(self, indices):
+        """Updates the Entries of cells whose displayed value changed (e.g. dependent formulas)."""
+        for i in indices:
+            r, c = divmod(i, self.cols)
+            if self.view_pos is not None:
+                r = self.view_pos.get(r)
+                if r is None:
+                    continue  # Filtered out
+            if r < len(self.cells) and c < len(self.cells[r]):
+                self.show_cell(r, c)
+
+    def data_row(self, r):
+        return r if self.view is None else self.view[r]
+
+    def shown_rows(self):
+        return self.rows if self.view is None else len(self.view)
+
+    def set_view(self, rows):
+        """Shows the given segment rows in that order (None: all, in order). Cells are reused, not rebuilt."""
+        self.editing = None
+        self.focus_set()
+        self.view = rows
+        self.view_pos = None if rows is None else {r: i for i, r in enumerate(rows)}
+        self.show_view()
+        self.refresh_cells()
+
+    def show_view(self):
+        # Rows past the view are only taken off the grid, so showing them again is cheap
+        shown = min(self.shown_rows(), len(self.cells))
+        for r in range(shown, self.visible_rows):
+            self.grid_frame.grid_rowconfigure(r, weight=0)
+            for e in self.cells[r]:
+                e.grid_remove()
+        for r in range(self.visible_rows, shown):
+            self.grid_frame.grid_rowconfigure(r, weight=1)
+            for c, e in enumerate(self.cells[r]):
+                e.grid(row=r, column=c, sticky="nsew", padx=0, pady=0)
+        self.visible_rows = shown
+
+    def show_cell_menu(self, event, c):
+        self.menu_col = c
+        self.menu.post(event.x_root, event.y_root)
+
+    def sort_column(self, descending):
+        if self.menu_col < self.cols:
+            self.set_view(sort_rows(self.segment, self.menu_col, descending, self.view))
+
+    def filter_column(self):
+        from tkinter import simpledialog
+        if self.menu_col >= self.cols:
+            return
+        text = simpledialog.askstring("Filter", f"Show rows whose column {self.menu_col + 1} contains:", parent=self)
+        if text:
+            self.set_view(filter_rows(self.segment, self.menu_col, text, self.view))
+
+    def import_file(self):
+        from tkinter import filedialog, messagebox
+        path = filedialog.askopenfilename(parent=self, title="Import Table",
+                                          filetypes=[("CSV/TSV", "*.csv *.tsv *.tab *.txt"), ("All files", "*")])
+        if not path:
+            return
+        try:
+            self.importing = TableReader(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not import: {e}")
+            return
+        self.after_idle(self.import_step, self.importing)
+
+    def import_step(self, reader):
+        """Parses one chunk of rows per idle slice, so big files don't freeze the window."""
+        if self.importing is not reader:
+            reader.close()
+            return  # Cancelled (the table was rebound or imported into again)
+        try:
+            more = reader.read()
+        except (OSError, csv.Error) as e:
+            reader.close()
+            self.importing = None
+            from tkinter import messagebox
+            messagebox.showerror("Error", f"Could not import: {e}")
+            return
+        if more:
+            self.after(1, self.import_step, reader)
+            return
+        self.importing = None
+        if reader.rows and reader.cols:
+            old_shape = self.get_shape(keep_values=True)
+            self.segment.replace(reader.rows, reader.cols, reader.values)
+            self.rows, self.cols = reader.rows, reader.cols
+            self.schedule_rebuild()
+            self.record_field("shape", old_shape, self.get_shape(keep_values=True))
+            self.mark_changed()
+
+    def export_file(self):
+        from tkinter import filedialog, messagebox
+        path = filedialog.asksaveasfilename(parent=self, title="Export Table", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("TSV", "*.tsv")])
+        if not path:
+            return
+        try:
+            write_table(path, self.segment, self.view)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not export: {e}")
+
+    def parse_widths(self):
         try:
             if isinstance(self.cell_width, list):
-                widths = self.cell_width
+                widths = [int(w) for w in self.cell_width]
             elif isinstance(self.cell_width, str) and "," in self.cell_width:
                 widths = [int(w.strip()) for w in self.cell_width.split(",")]
             else:
                 widths = [int(self.cell_width)]
         except:
             widths = [10] # Fallback
+        return widths or [10]
 
-        for r in range(self.rows):
-            row_cells = []
-            for c in range(self.cols):
-                # Determine width for this column
-                w = widths[c % len(widths)]
-                
-                e = tk.Entry(self.grid_frame, bg="#ffffff", fg="#000000", relief="solid", bd=1, justify=justify_val, font=("Consolas", 10))
-                e.configure(width=w)
-                
-                e.grid(row=r, column=c, sticky="nsew", padx=0, pady=0)
-                
-                self.grid_frame.grid_rowconfigure(r, weight=1)
-                self.grid_frame.grid_columnconfigure(c, weight=1)
-                
-                e.bind("<Button-3>", lambda event: self.menu.post(event.x_root, event.y_root))
-                
-                # Restore data if available
-                if r < len(old_data) and c < len(old_data[r]):
-                    e.insert(0, old_data[r][c])
+    def on_cell_changed(self, r, c, var):
+        if self.showing or r >= self.shown_rows():
+            return
+        r = self.data_row(r)
+        old, new = self.segment.get_cell(r, c), var.get()
+        if old == new:
+            return
+        changed = self.segment.set_cell(r, c, new)
+        self.record_field(("cell", r, c), old, new)
+        self.mark_changed()
+        self.show_changes(changed)
+
+    def get_shape(self, keep_values=False):
+        shape = {"rows": self.rows, "cols": self.cols, "cell_width": self.cell_width, "align": self.align}
+        if keep_values:
+            shape["values"] = list(self.segment.values)
+        return shape
 
-                row_cells.append(e)
-            self.cells.append(row_cells)
+    def set_cell_value(self, r, c, value):
+        # Undo/redo hands back raw cell text, formulas included
+        changed = self.segment.set_cell(r, c, value)
+        self.mark_changed()
+        self.show_changes(changed)
+
+    def set_field(self, field, value):
+        if isinstance(field, tuple) and field[0] == "cell":
+            self.set_cell_value(field[1], field[2], value)
+        elif field == "shape":
+            self.rows, self.cols = value["rows"], value["cols"]
+            self.cell_width, self.align = value["cell_width"], value["align"]
+            self.schedule_rebuild()
+            if "values" in value:
+                self.segment.set_values(list(value["values"]))
+            self.mark_changed()
+        else:
+            super().set_field(field, value)
+
+    def schedule_rebuild(self):
+        # The segment takes the new shape now (saves and undo see it), the widgets follow next frame
+        self.segment.resize(self.rows, self.cols)
+        self.segment.cell_width = self.cell_width
+        self.segment.align = self.align
+        self.schedule_layout("build", self.rebuild)
+
+    def rebuild(self):
+        # A table that grew past (or shrank below) VIRTUAL_TABLE_THRESHOLD gets the other widget class
+        swap = getattr(self.parent, "replace_embed", None)
+        if swap is not None and table_class_for(self.segment) is not type(self):
+            swap(self)
+            return
+        self.build_table()
+        self.refresh_cells()
+
+    def refresh_cells(self):
+        """Pushes segment values into the Entries without recording them as edits."""
+        was_rebinding, self.rebinding = self.rebinding, True
+        try:
+            for r, row_cells in enumerate(self.cells[:self.visible_rows]):
+                for c in range(len(row_cells)):
+                    self.show_cell(r, c)
+        finally:
+            self.rebinding = was_rebinding
+
+    def rebind(self, segment):
+        """Shows another TableSegment in this (pooled) table, reusing as many cells as fit."""
+        self.rebinding = True
+        try:
+            self.segment = segment
+            self.importing = None  # A running import stops at its next step
+            self.editing = None
+            self.rows, self.cols = segment.rows, segment.cols
+            self.cell_width, self.align = segment.cell_width, segment.align
+            self.build_table()
+            self.refresh_cells()
+            self.bg_color = segment.bg
+            for w in (self, self.header_frame, self.btn_delete, self.btn_settings, self.grid_frame):
+                w.configure(bg=segment.bg)
+            self.config(width=segment.width, height=segment.height)
+        finally:
+            self.rebinding = False
 
     def show_properties(self):
         # Dialog to edit settings
@@ -213,11 +609,15 @@ class TableWidget(ResizableFrame):
         f_align = tk.Frame(win)
         f_align.pack(fill="x", padx=10, pady=5)
         tk.Label(f_align, text="Alignment:", width=15, anchor="w").pack(side="left")
+        from tkinter import ttk
         align_cb = ttk.Combobox(f_align, textvariable=align_var, values=["left", "center", "right"])
         align_cb.pack(side="right", fill="x", expand=True)
 
         def apply():
             try:
+                old_rows, old_cols = self.rows, self.cols
+                # Shrinking drops cells, so only then does the undo step keep a copy of the values
+                old_shape = self.get_shape(keep_values=rows_var.get() < old_rows or cols_var.get() < old_cols)
                 self.rows = rows_var.get()
                 self.cols = cols_var.get()
                 
@@ -229,29 +629,323 @@ class TableWidget(ResizableFrame):
                      self.cell_width = int(w_str)
 
                 self.align = align_var.get()
-                self.build_table()
+                self.schedule_rebuild()
+                self.record_field("shape", old_shape, self.get_shape())
+                self.mark_changed()
                 win.destroy()
             except Exception as e:
+                from tkinter import messagebox
                 messagebox.showerror("Error", f"Invalid input: {e}")
 
         tk.Button(win, text="Apply", command=apply).pack(pady=20)
 
     def get_data(self):
-        data = []
-        for r in range(len(self.cells)):
-            row_data = []
-            for c in range(len(self.cells[r])):
-                row_data.append(self.cells[r][c].get())
-            data.append(row_data)
-        
-        return {
-            "type": "table",
-            "width": self.winfo_width(),
-            "height": self.winfo_height(),
-            "rows": self.rows,
-            "cols": self.cols,
-            "cell_width": self.cell_width,
-            "align": self.align,
-            "data": data,
-            "bg": self.bg_color
-        }
+        return self.segment.to_dict()
+
+
+class VirtualTableWidget(TableWidget):
+    """
+    Canvas-rendered table for large grids.
+    Only the cells inside the visible area are drawn, and a single floating
+    Entry edits the active cell. Values live in self.segment (flat row-major),
+    and the saved JSON is identical to TableWidget's.
+    """
+    CELL_PAD = 6
+
+    @timed("build_table.virtual")
+    def build_table(self):
+        self.segment.resize(self.rows, self.cols)
+        self.segment.cell_width = self.cell_width
+        self.segment.align = self.align
+
+        if not hasattr(self, "canvas"):
+            self.font = tkfont.Font(font=("Consolas", 10))
+            self.row_height = self.font.metrics("linespace") + self.CELL_PAD
+            self.active_cell = None
+
+            self.vbar = tk.Scrollbar(self.grid_frame, orient="vertical", command=self.yview)
+            self.hbar = tk.Scrollbar(self.grid_frame, orient="horizontal", command=self.xview)
+            self.canvas = style(tk.Canvas(self.grid_frame, highlightthickness=0,
+                                          xscrollcommand=self.hbar.set, yscrollcommand=self.vbar.set), "cell_canvas")
+            self.vbar.pack(side="right", fill="y")
+            self.hbar.pack(side="bottom", fill="x")
+            self.canvas.pack(side="left", fill="both", expand=True)
+
+            # The one and only cell editor, moved around on demand
+            self.editor = style(tk.Entry(self.canvas, relief="solid", bd=1, font=self.font), "cell")
+            self.editor_window = None
+            self.editor.bind("<Return>", lambda e: self.move_editor(1, 0))
+            self.editor.bind("<Tab>", lambda e: self.move_editor(0, 1))
+            self.editor.bind("<Escape>", lambda e: self.close_editor(commit=False))
+            self.editor.bind("<FocusOut>", lambda e: self.close_editor())
+
+            self.canvas.bind("<Configure>", lambda e: self.schedule_layout("redraw", self.redraw))
+            self.canvas.bind("<Button-1>", self.on_click)
+            self.canvas.bind("<MouseWheel>", self.on_wheel)
+            self.canvas.bind("<Button-4>", lambda e: self.yview("scroll", -3, "units"))
+            self.canvas.bind("<Button-5>", lambda e: self.yview("scroll", 3, "units"))
+            self.canvas.bind("<Button-3>", self.on_canvas_menu)
+        else:
+            self.close_editor()
+        self.view = self.view_pos = None  # A new shape shows every row again
+
+        self.sizer.lift()
+
+        # Column x offsets (pixels), one extra entry for the right edge
+        char_w = self.font.measure("0")
+        widths = self.parse_widths()
+        self.col_x = [0]
+        for c in range(self.cols):
+            self.col_x.append(self.col_x[-1] + widths[c % len(widths)] * char_w + self.CELL_PAD)
+        self.show_view()
+
+    def show_view(self):
+        self.canvas.configure(scrollregion=(0, 0, self.col_x[-1], self.shown_rows() * self.row_height))
+        self.redraw()
+
+    def set_view(self, rows):
+        self.close_editor()  # Commits to the row it was opened on
+        self.view = rows
+        self.view_pos = None if rows is None else {r: i for i, r in enumerate(rows)}
+        self.show_view()
+
+    def on_canvas_menu(self, event):
+        cell = self.cell_at(event.x, event.y)
+        if cell is not None:
+            self.menu_col = cell[1]
+        self.show_menu(event)
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.redraw()
+
+    def xview(self, *args):
+        self.canvas.xview(*args)
+        self.redraw()
+
+    def on_wheel(self, event):
+        self.yview("scroll", int(-event.delta / 40) or (-1 if event.delta > 0 else 1), "units")
+        return "break"
+
+    def visible_range(self):
+        x0 = self.canvas.canvasx(0)
+        y0 = self.canvas.canvasy(0)
+        x1 = x0 + self.canvas.winfo_width()
+        y1 = y0 + self.canvas.winfo_height()
+        first_row = max(0, int(y0 // self.row_height))
+        last_row = min(self.shown_rows(), int(y1 // self.row_height) + 1)
+        first_col = max(0, bisect.bisect_right(self.col_x, x0) - 1)
+        last_col = min(self.cols, bisect.bisect_left(self.col_x, x1) + 1)
+        return first_row, last_row, first_col, last_col
+
+    def redraw(self):
+        self.canvas.delete("cell")
+        first_row, last_row, first_col, last_col = self.visible_range()
+        anchor = {"left": "w", "right": "e"}.get(self.align, "center")
+        display, rh = self.segment.display, self.row_height
+        rect_style, text_style = style_options("cell_rect"), style_options("cell_text")
+        for r in range(first_row, last_row):
+            y = r * rh
+            dr = self.data_row(r)
+            for c in range(first_col, last_col):
+                x0, x1 = self.col_x[c], self.col_x[c + 1]
+                self.canvas.create_rectangle(x0, y, x1, y + rh, tags="cell", **rect_style)
+                val = display(dr, c)
+                if val:
+                    if anchor == "w":
+                        tx = x0 + self.CELL_PAD // 2
+                    elif anchor == "e":
+                        tx = x1 - self.CELL_PAD // 2
+                    else:
+                        tx = (x0 + x1) // 2
+                    self.canvas.create_text(tx, y + rh // 2, text=val, anchor=anchor, font=self.font, tags="cell", **text_style)
+        if self.editor_window is not None:
+            self.canvas.tag_raise(self.editor_window)
+
+    def on_theme_changed(self):
+        # Canvas items aren't widgets; only the visible cells exist, so redrawing them is cheap
+        self.schedule_layout("redraw", self.redraw)
+
+    def cell_at(self, x, y):
+        cx = self.canvas.canvasx(x)
+        cy = self.canvas.canvasy(y)
+        r = int(cy // self.row_height)
+        c = bisect.bisect_right(self.col_x, cx) - 1
+        if 0 <= r < self.shown_rows() and 0 <= c < self.cols:
+            return r, c
+        return None
+
+    def on_click(self, event):
+        cell = self.cell_at(event.x, event.y)
+        self.close_editor()
+        if cell:
+            self.open_editor(*cell)
+
+    def open_editor(self, r, c):
+        self.active_cell = (r, c)
+        x0, x1 = self.col_x[c], self.col_x[c + 1]
+        y = r * self.row_height
+        justify = self.align if self.align in ("left", "center", "right") else "center"
+        self.editor.configure(justify=justify)
+        self.editor.delete(0, "end")
+        self.editor.insert(0, self.segment.get_cell(self.data_row(r), c))
+        if self.editor_window is None:
+            self.editor_window = self.canvas.create_window(x0, y, window=self.editor, anchor="nw",
+                                                           width=x1 - x0, height=self.row_height)
+        else:
+            self.canvas.coords(self.editor_window, x0, y)
+            self.canvas.itemconfigure(self.editor_window, width=x1 - x0, height=self.row_height, state="normal")
+        self.see(r, c)
+        self.editor.focus_set()
+        self.editor.select_range(0, "end")
+
+    def close_editor(self, commit=True):
+        if self.active_cell is None:
+            return
+        r, c = self.active_cell
+        self.active_cell = None
+        if commit and r < self.shown_rows() and c < self.cols:
+            r = self.data_row(r)
+            value = self.editor.get()
+            old = self.segment.get_cell(r, c)
+            if value != old:
+                self.segment.set_cell(r, c, value)
+                self.record_field(("cell", r, c), old, value)
+                self.mark_changed()
+        if self.editor_window is not None:
+            self.canvas.itemconfigure(self.editor_window, state="hidden")
+        self.redraw()
+
+    def set_cell_value(self, r, c, value):
+        self.segment.set_cell(r, c, value)
+        self.mark_changed()
+        self.redraw()
+
+    def refresh_cells(self):
+        self.redraw()
+
+    def move_editor(self, dr, dc):
+        if self.active_cell is None:
+            return "break"
+        r, c = self.active_cell
+        self.close_editor()
+        c += dc
+        if c >= self.cols:
+            c, r = 0, r + 1
+        r += dr
+        if r < self.shown_rows():
+            self.open_editor(r, c)
+        return "break"
+
+    def see(self, r, c):
+        total_h = self.shown_rows() * self.row_height
+        total_w = self.col_x[-1]
+        first_row, last_row, first_col, last_col = self.visible_range()
+        if total_h and not (first_row < r < last_row - 1):
+            self.canvas.yview_moveto(max(0, r * self.row_height - self.row_height) / total_h)
+        if total_w and not (first_col <= c < last_col - 1):
+            self.canvas.xview_moveto(self.col_x[c] / total_w)
+        self.redraw()
+
+
+# Tables with more cells than this open as a VirtualTableWidget
+VIRTUAL_TABLE_THRESHOLD = 1000
+
+def make_table_widget(parent, rows=3, cols=3, **kwargs):
+    cls = VirtualTableWidget if rows * cols > VIRTUAL_TABLE_THRESHOLD else TableWidget
+    return cls(parent, rows=rows, cols=cols, **kwargs)
+
+def table_class_for(seg):
+    return VirtualTableWidget if seg.cell_count() > VIRTUAL_TABLE_THRESHOLD else TableWidget
+
+def widget_class_for(seg):
+    if isinstance(seg, CardSegment):
+        return CardWidget
+    if isinstance(seg, TableSegment):
+        return table_class_for(seg)
+    return None
+
+def widget_for_segment(parent, seg):
+    """Builds the embedded widget for a CardSegment or TableSegment, sharing the segment."""
+    if isinstance(seg, CardSegment):
+        card = CardWidget(parent, title=seg.title, content=seg.content, bg=seg.bg,
+                          width=seg.width, height=seg.height)
+        card.segment = seg
+        return card
+    if isinstance(seg, TableSegment):
+        return make_table_widget(parent, rows=seg.rows, cols=seg.cols, cell_width=seg.cell_width,
+                                 align=seg.align, width=seg.width, height=seg.height,
+                                 bg=seg.bg, segment=seg)
+    return None
+
+
+class EmbedPlaceholder(tk.Frame):
+    """
+    Lightweight stand-in for a card or table that has not been scrolled into view yet.
+    It only holds the segment and reserves the same space; the Text widget maps
+    embedded windows when they become visible, and <Map> asks the editor to
+    swap in the real widget.
+    """
+    def __init__(self, parent, segment):
+        super().__init__(parent, width=segment.width, height=segment.height, bg=segment.bg)
+        self.parent = parent
+        self.segment = segment
+        self.bind("<Map>", self.on_map)
+
+    def on_map(self, event):
+        materialize = getattr(self.parent, "materialize", None)
+        if materialize is not None:
+            # Don't edit the Text from inside its own redisplay
+            self.after_idle(materialize, self)
+
+    def get_data(self):
+        return self.segment.to_dict()
+
+
+# Idle widgets kept per class; more than that are destroyed
+POOL_LIMIT = 32
+
+class WidgetPool:
+    """
+    Recycles CardWidget/TableWidget instances between notes.
+    Building the frame, header, buttons, Text/Entries and Menu is the
+    expensive part of showing an embed, so the editor detaches its widgets
+    from the Text before clearing it (deleting an embed would destroy its
+    window) and parks them here; acquire() rebinds one to a new segment.
+    """
+    def __init__(self, parent, limit=POOL_LIMIT):
+        self.parent = parent
+        self.limit = limit
+        self.free = {}  # Widget class -> idle widgets
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, seg):
+        """A widget showing seg: a recycled one if there is one of the right class, else a new one."""
+        free = self.free.get(widget_class_for(seg))
+        if free:
+            widget = free.pop()
+            widget.rebind(seg)
+            self.reused += 1
+            return widget
+        self.created += 1
+        return widget_for_segment(self.parent, seg)
+
+    def release(self, widget):
+        """Takes a widget that is no longer embedded anywhere."""
+        if isinstance(widget, VirtualTableWidget):
+            widget.close_editor(commit=False)
+        if isinstance(widget, ResizableFrame):
+            widget.hide_outline()
+            widget.resize_start = None
+        free = self.free.setdefault(type(widget), [])
+        if isinstance(widget, (CardWidget, TableWidget)) and len(free) < self.limit:
+            free.append(widget)
+        else:
+            widget.destroy()
+
+    def clear(self):
+        for free in self.free.values():
+            for widget in free:
+                widget.destroy()
+        self.free.clear()